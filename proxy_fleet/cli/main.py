@@ -5,15 +5,21 @@ Command-line interface for proxy-fleet.
 import asyncio
 import json
 import logging
+import math
 import sys
 import threading
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 import click
 
-from ..utils.socks_validator import SocksValidator, ValidationResult
+from ..utils.geoip import GeoIPDatabase, lookup_host
+from ..utils.revalidation_scheduler import RevalidationScheduler
+from ..utils.socks_validator import ProxyDownloader, SocksValidator
+from ..utils.validation_checkpoint import ValidationCheckpoint
+from ..utils.validation_progress import ValidationProgress
 
 # Set up logging
 logging.basicConfig(
@@ -94,54 +100,186 @@ class ProxyStorage:
         ip_info: Optional[Dict[str, Any]] = None,
         proxy_type: str = "socks5",
         request_test_result: Optional[Dict[str, Any]] = None,
+        response_time: Optional[float] = None,
+        anonymity: Optional[str] = None,
+        capabilities: Optional[Dict[str, bool]] = None,
+        bandwidth: Optional[Dict[str, Any]] = None,
+        geo_info: Optional[Dict[str, str]] = None,
     ):
         """Update proxy status with thread safety"""
         with self.file_lock:
             data = self.load_proxy_data()
-            proxy_key = f"{host}:{port}"
-            current_time = datetime.now().isoformat()
+            self._apply_proxy_status(
+                data,
+                host,
+                port,
+                is_valid,
+                ip_info=ip_info,
+                proxy_type=proxy_type,
+                request_test_result=request_test_result,
+                response_time=response_time,
+                anonymity=anonymity,
+                capabilities=capabilities,
+                bandwidth=bandwidth,
+                geo_info=geo_info,
+            )
+            self.save_proxy_data(data)
 
-            if proxy_key not in data["proxies"]:
-                data["proxies"][proxy_key] = {
-                    "host": host,
-                    "port": port,
-                    "protocol": proxy_type,
-                    "first_test_time": current_time,
-                    "last_success_time": None,
-                    "success_count": 0,
-                    "failure_count": 0,
-                    "ip_info": None,
-                    "request_test_result": None,
-                    "is_valid": False,
-                }
+    def update_proxy_statuses(
+        self, updates: List[Dict[str, Any]], existing_only: bool = False
+    ) -> int:
+        """
+        Apply several proxy status updates with one load and one save
+
+        Args:
+            updates: Keyword arguments of update_proxy_status, one dict per proxy
+            existing_only: Skip proxies no longer in storage instead of
+                           adding them (for results of proxies removed
+                           while they were being checked)
+
+        Returns:
+            Number of updates applied
+        """
+        if not updates:
+            return 0
+        applied = 0
+        with self.file_lock:
+            data = self.load_proxy_data()
+            for update in updates:
+                if existing_only and f"{update['host']}:{update['port']}" not in data["proxies"]:
+                    continue
+                self._apply_proxy_status(data, **update)
+                applied += 1
+            if applied:
+                self.save_proxy_data(data)
+        return applied
 
-            proxy_data = data["proxies"][proxy_key]
-            proxy_data["last_test_time"] = current_time
-            proxy_data["protocol"] = proxy_type
-            proxy_data["is_valid"] = is_valid
+    def _apply_proxy_status(
+        self,
+        data: Dict[str, Any],
+        host: str,
+        port: int,
+        is_valid: bool,
+        ip_info: Optional[Dict[str, Any]] = None,
+        proxy_type: str = "socks5",
+        request_test_result: Optional[Dict[str, Any]] = None,
+        response_time: Optional[float] = None,
+        anonymity: Optional[str] = None,
+        capabilities: Optional[Dict[str, bool]] = None,
+        bandwidth: Optional[Dict[str, Any]] = None,
+        geo_info: Optional[Dict[str, str]] = None,
+    ):
+        """Record one validation result in loaded proxy data"""
+        proxy_key = f"{host}:{port}"
+        current_time = datetime.now().isoformat()
 
-            if is_valid:
-                proxy_data["last_success_time"] = current_time
-                proxy_data["success_count"] += 1
-                if ip_info:
-                    proxy_data["ip_info"] = ip_info
-                if request_test_result:
-                    proxy_data["request_test_result"] = request_test_result
-
-                self.proxy_logger.info(f"✅ {proxy_key} - Validation SUCCESS")
-            else:
-                proxy_data["failure_count"] += 1
-                # Store failed request test result too
-                if request_test_result:
-                    proxy_data["request_test_result"] = request_test_result
-                self.proxy_logger.info(f"❌ {proxy_key} - Validation FAILED")
+        if proxy_key not in data["proxies"]:
+            data["proxies"][proxy_key] = {
+                "host": host,
+                "port": port,
+                "protocol": proxy_type,
+                "first_test_time": current_time,
+                "last_success_time": None,
+                "success_count": 0,
+                "failure_count": 0,
+                "ip_info": None,
+                "request_test_result": None,
+                "is_valid": False,
+            }
 
+        proxy_data = data["proxies"][proxy_key]
+        proxy_data["last_test_time"] = current_time
+        proxy_data["protocol"] = proxy_type
+        proxy_data["is_valid"] = is_valid
+        if geo_info:
+            proxy_data["geo_info"] = geo_info
+
+        if is_valid:
+            proxy_data["last_success_time"] = current_time
+            proxy_data["success_count"] += 1
+            if response_time is not None:
+                proxy_data["last_response_time"] = round(response_time, 4)
+                # Exponentially weighted average, used for score ordering
+                previous = proxy_data.get("avg_response_time")
+                proxy_data["avg_response_time"] = round(
+                    response_time
+                    if previous is None
+                    else previous * 0.7 + response_time * 0.3,
+                    4,
+                )
+            if ip_info:
+                proxy_data["ip_info"] = ip_info
+            if request_test_result:
+                proxy_data["request_test_result"] = request_test_result
+            if anonymity:
+                proxy_data["anonymity"] = anonymity
+            if capabilities is not None:
+                proxy_data["capabilities"] = capabilities
+            if bandwidth:
+                proxy_data["bandwidth_kbps"] = bandwidth["bandwidth_kbps"]
+                proxy_data["ttfb"] = bandwidth["ttfb"]
+                proxy_data["bandwidth_test_time"] = current_time
+
+            self.proxy_logger.info(f"✅ {proxy_key} - Validation SUCCESS")
+        else:
+            proxy_data["failure_count"] += 1
+            # Store failed request test result too
+            if request_test_result:
+                proxy_data["request_test_result"] = request_test_result
+            self.proxy_logger.info(f"❌ {proxy_key} - Validation FAILED")
+
+    def update_geo_info(self, geo_infos: Dict[str, Optional[Dict[str, str]]]) -> int:
+        """
+        Set geo_info on stored proxies in one write
+
+        Args:
+            geo_infos: Mapping of "host:port" to geo_info (None removes it)
+
+        Returns:
+            Number of proxies updated
+        """
+        with self.file_lock:
+            data = self.load_proxy_data()
+            updated = 0
+            for proxy_key, geo_info in geo_infos.items():
+                proxy_data = data["proxies"].get(proxy_key)
+                if proxy_data is None:
+                    continue
+                if geo_info:
+                    proxy_data["geo_info"] = geo_info
+                else:
+                    proxy_data.pop("geo_info", None)
+                updated += 1
             self.save_proxy_data(data)
+            return updated
+
+    @staticmethod
+    def get_proxy_region(proxy_data: Dict[str, Any]) -> str:
+        """
+        Get a stored proxy's upper-case country code, or "" if unknown
+
+        Probe results take precedence: the custom --test-proxy-with-request
+        API's location_info, then ip_info, then the offline GeoIP geo_info.
+        """
+        # First try to get region from request_test_result (custom API)
+        location_info = (proxy_data.get("request_test_result") or {}).get("location_info")
+        if location_info and location_info.get("location"):
+            return str(location_info["location"]).upper()
+
+        # Fallback to ip_info (from automatic ipinfo.io check)
+        ip_info = proxy_data.get("ip_info") or {}
+        if ip_info.get("country"):
+            return str(ip_info["country"]).upper()
+
+        # Fallback to the offline GeoIP lookup (--geoip-db)
+        geo_info = proxy_data.get("geo_info") or {}
+        return str(geo_info.get("country") or "").upper()
 
     def get_valid_proxies(self, 
                           proxy_types: List[str] = None, 
-                          regions: List[str] = None) -> List[Dict[str, Any]]:
-        """Get list of valid proxies with optional filtering by type and region"""
+                          regions: List[str] = None,
+                          anonymity: List[str] = None) -> List[Dict[str, Any]]:
+        """Get list of valid proxies with optional filtering by type, region and anonymity"""
         data = self.load_proxy_data()
         valid_proxies = []
 
@@ -158,6 +296,10 @@ class ProxyStorage:
         if regions:
             regions = [region.upper() for region in regions]
 
+        # Normalize anonymity levels to lowercase
+        if anonymity:
+            anonymity = [level.lower() for level in anonymity]
+
         for proxy_key, proxy_data in data["proxies"].items():
             if proxy_data.get("is_valid", False):
                 # Check proxy type filter
@@ -166,27 +308,71 @@ class ProxyStorage:
                     continue
 
                 # Check region filter
-                if regions:
-                    proxy_region = ""
-                    
-                    # First try to get region from request_test_result (custom API)
-                    request_test = proxy_data.get("request_test_result", {})
-                    location_info = request_test.get("location_info")
-                    if location_info and location_info.get("location"):
-                        proxy_region = location_info["location"].upper()
-                    
-                    # Fallback to ip_info (from automatic ipinfo.io check)
-                    if not proxy_region:
-                        ip_info = proxy_data.get("ip_info", {})
-                        proxy_region = ip_info.get("country", "").upper() if ip_info else ""
-                    
-                    if proxy_region not in regions:
-                        continue
+                if regions and self.get_proxy_region(proxy_data) not in regions:
+                    continue
+
+                # Check anonymity filter, unjudged proxies never match
+                if anonymity and proxy_data.get("anonymity") not in anonymity:
+                    continue
 
                 valid_proxies.append(proxy_data)
 
         return valid_proxies
 
+    @staticmethod
+    def score_proxy(
+        proxy_data: Optional[Dict[str, Any]], now: Optional[datetime] = None
+    ) -> float:
+        """
+        Score a stored proxy record by its validation history
+
+        Combines the smoothed success ratio, recency of the last success
+        (decaying over about a day) and the average handshake latency.
+        Proxies with no history score as an unknown middle ground, so they
+        rank below proven proxies but above repeatedly failing ones.
+
+        Returns:
+            Score between 0 and 1, higher is better
+        """
+        if not proxy_data:
+            return 0.5 * 0.5 + 0.2 * 0.5
+
+        success = proxy_data.get("success_count", 0)
+        failure = proxy_data.get("failure_count", 0)
+        success_ratio = (success + 1) / (success + failure + 2)
+
+        recency = 0.0
+        last_success = proxy_data.get("last_success_time")
+        if last_success:
+            try:
+                age = ((now or datetime.now()) - datetime.fromisoformat(last_success)).total_seconds()
+                recency = math.exp(-max(age, 0) / 86400)
+            except ValueError:
+                pass
+
+        avg_response_time = proxy_data.get("avg_response_time")
+        latency = 0.5 if avg_response_time is None else 1 / (1 + avg_response_time)
+
+        return 0.5 * success_ratio + 0.3 * recency + 0.2 * latency
+
+    def rank_proxies(self, proxies: List[Dict[str, Any]]) -> List[int]:
+        """
+        Order proxies by prior score from storage
+
+        Args:
+            proxies: Proxy dictionaries with 'host' and 'port' keys
+
+        Returns:
+            Indices into proxies, best score first (input order breaks ties)
+        """
+        stored = self.load_proxy_data().get("proxies", {})
+        now = datetime.now()
+        scores = [
+            self.score_proxy(stored.get(f"{p['host']}:{p['port']}"), now)
+            for p in proxies
+        ]
+        return sorted(range(len(proxies)), key=lambda i: -scores[i])
+
     def clear_failed_tasks(self):
         """Clear failed task records"""
         if self.fail_file.exists():
@@ -302,6 +488,11 @@ def parse_proxy_line(line: str) -> Optional[Dict[str, Any]]:
     "--test-proxy-with-request",
     help='Additional HTTP request validation, e.g., "https://ipinfo.io/json"',
 )
+@click.option(
+    "--test-proxy-judge",
+    default=None,
+    help='Proxy judge URL (see --judge-server) to classify anonymity: transparent, anonymous or elite',
+)
 @click.option(
     "--test-proxy-server",
     help='Proxy server input source: file path or "-" for stdin input',
@@ -350,6 +541,153 @@ def parse_proxy_line(line: str) -> Optional[Dict[str, Any]]:
 @click.option(
     "--concurrent", default=10, help="Maximum concurrent connections for proxy testing"
 )
+@click.option(
+    "--prefilter-timeout",
+    default=None,
+    type=float,
+    help="Enable a TCP-connect prefilter stage with this timeout in seconds (default: off)",
+)
+@click.option(
+    "--prefilter-concurrent",
+    default=1000,
+    type=int,
+    help="Maximum concurrent TCP-connect prefilter attempts (default: 1000)",
+)
+@click.option(
+    "--probe-concurrent",
+    default=None,
+    type=int,
+    help="Separate concurrency pool for the --test-proxy-with-request stage (default: share --concurrent)",
+)
+@click.option(
+    "--probe-max-bytes",
+    default=8192,
+    type=int,
+    help="Most response body bytes read per probe request; longer transfers are aborted (default: 8192)",
+)
+@click.option(
+    "--measure-bandwidth",
+    is_flag=True,
+    default=False,
+    help="Measure download throughput and time-to-first-byte through each valid proxy (default: off)",
+)
+@click.option(
+    "--bandwidth-url",
+    default="https://speed.cloudflare.com/__down?bytes={bytes}",
+    help='Download URL for --measure-bandwidth, "{bytes}" is replaced with --bandwidth-bytes '
+    '(offline: http://HOST:8890/bytes/{bytes} on a --judge-server)',
+)
+@click.option(
+    "--bandwidth-bytes",
+    default=1048576,
+    type=int,
+    help="Bytes to download per proxy for --measure-bandwidth (default: 1048576)",
+)
+@click.option(
+    "--bandwidth-concurrent",
+    default=10,
+    type=int,
+    help="Maximum concurrent --measure-bandwidth downloads (default: 10)",
+)
+@click.option(
+    "--geoip-db",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Offline IP-to-country database (.csv or .mmdb) to tag proxy regions during validation",
+)
+@click.option(
+    "--geoip-backfill",
+    is_flag=True,
+    default=False,
+    help="Tag every proxy in storage with its --geoip-db country, without testing",
+)
+@click.option(
+    "--revalidate-daemon",
+    is_flag=True,
+    default=False,
+    help="Keep revalidating stored proxies, each when it is due, until interrupted",
+)
+@click.option(
+    "--revalidate-rate",
+    default=5.0,
+    type=float,
+    help="Revalidation checks started per second (default: 5)",
+)
+@click.option(
+    "--revalidate-interval",
+    default=3600.0,
+    type=float,
+    help="Recheck interval after a success, doubling while a proxy stays valid (default: 3600)",
+)
+@click.option(
+    "--revalidate-min-interval",
+    default=300.0,
+    type=float,
+    help="Recheck interval after a failure and for flapping proxies (default: 300)",
+)
+@click.option(
+    "--revalidate-max-interval",
+    default=86400.0,
+    type=float,
+    help="Longest recheck interval (default: 86400)",
+)
+@click.option(
+    "--download-proxy-list",
+    default=None,
+    help='Download public proxy lists for these types ("socks5", "socks4,http", "all") '
+    "and write unique host:port lines to --download-output",
+)
+@click.option(
+    "--download-source",
+    multiple=True,
+    help="Proxy list source as TYPE=URL, repeatable; replaces the built-in sources of that type",
+)
+@click.option(
+    "--download-cache",
+    default=None,
+    help="Directory for ETag/Last-Modified cached lists (default: <proxy-storage>/download-cache)",
+)
+@click.option(
+    "--download-output",
+    default="-",
+    help='Output file for --download-proxy-list, "-" for stdout (default: -)',
+)
+@click.option(
+    "--progress-format",
+    type=click.Choice(["text", "json"]),
+    default="text",
+    help="Validation progress output: text or JSON lines on stderr (default: text)",
+)
+@click.option(
+    "--progress-interval",
+    default=5.0,
+    type=float,
+    help="Seconds between JSON progress lines (default: 5)",
+)
+@click.option(
+    "--test-proxy-order",
+    type=click.Choice(["input", "score"], case_sensitive=False),
+    default="input",
+    help="Validation order: input order, or best prior score from storage first (default: input)",
+)
+@click.option(
+    "--stop-after-valid",
+    default=None,
+    type=int,
+    help="Stop validating once this many proxies have passed",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="Resume an interrupted --test-proxy-server run from its checkpoint in proxy storage",
+)
+@click.option(
+    "--checkpoint-interval",
+    default=30,
+    type=float,
+    help="Seconds between validation checkpoint writes (default: 30)",
+)
 @click.option("--verbose", "-v", is_flag=True, help="Show verbose output")
 @click.option(
     "--start-proxy-server",
@@ -385,6 +723,19 @@ def parse_proxy_line(line: str) -> Optional[Dict[str, Any]]:
     type=int,
     help="Number of worker processes (default: CPU count)",
 )
+@click.option(
+    "--proxy-server-engine",
+    type=click.Choice(["aiohttp", "fast"], case_sensitive=False),
+    default=None,
+    help="Enhanced server engine: aiohttp, or fast (asyncio.Protocol relay with "
+    "/stats, /health and /refresh on the admin port, port + 1 by default)",
+)
+@click.option(
+    "--proxy-server-socks-port",
+    default=None,
+    type=int,
+    help="Also accept SOCKS5/SOCKS4a clients on this port (enhanced server)",
+)
 @click.option(
     "--proxy-server-rotation",
     type=click.Choice(["round-robin", "random"], case_sensitive=False),
@@ -401,6 +752,9 @@ def parse_proxy_line(line: str) -> Optional[Dict[str, Any]]:
             "weighted",
             "response_time",
             "fail_over",
+            "throughput",
+            "sticky",
+            "domain_score",
         ],
         case_sensitive=False,
     ),
@@ -434,10 +788,33 @@ def parse_proxy_line(line: str) -> Optional[Dict[str, Any]]:
     default=None,
     help="Filter proxies by region/country codes (comma-separated, e.g., TW,US,JP - default: all regions)",
 )
+@click.option(
+    "--proxy-server-use-anonymity",
+    default=None,
+    help="Filter proxies by judged anonymity: transparent, anonymous, elite (comma-separated, default: all)",
+)
+@click.option(
+    "--judge-server",
+    is_flag=True,
+    default=False,
+    help="Start a proxy judge that echoes the requester's address and headers",
+)
+@click.option(
+    "--judge-server-host",
+    default="0.0.0.0",
+    help="Proxy judge host (default: 0.0.0.0)",
+)
+@click.option(
+    "--judge-server-port",
+    default=8890,
+    type=int,
+    help="Proxy judge port (default: 8890)",
+)
 def main(
     test_proxy_type,
     test_proxy_timeout,
     test_proxy_with_request,
+    test_proxy_judge,
     test_proxy_server,
     test_proxy_storage,
     proxy_storage,
@@ -446,6 +823,31 @@ def main(
     list_proxy_failed,
     remove_proxy_failed,
     concurrent,
+    prefilter_timeout,
+    prefilter_concurrent,
+    probe_concurrent,
+    probe_max_bytes,
+    measure_bandwidth,
+    bandwidth_url,
+    bandwidth_bytes,
+    bandwidth_concurrent,
+    geoip_db,
+    geoip_backfill,
+    revalidate_daemon,
+    revalidate_rate,
+    revalidate_interval,
+    revalidate_min_interval,
+    revalidate_max_interval,
+    download_proxy_list,
+    download_source,
+    download_cache,
+    download_output,
+    progress_format,
+    progress_interval,
+    test_proxy_order,
+    stop_after_valid,
+    resume,
+    checkpoint_interval,
     verbose,
     start_proxy_server,
     enhanced_proxy_server,
@@ -453,6 +855,8 @@ def main(
     proxy_server_host,
     proxy_server_port,
     proxy_server_workers,
+    proxy_server_engine,
+    proxy_server_socks_port,
     proxy_server_rotation,
     proxy_server_strategy,
     single_process,
@@ -461,6 +865,10 @@ def main(
     list_proxy_types,
     proxy_server_skip_cert_check,
     proxy_server_use_region,
+    proxy_server_use_anonymity,
+    judge_server,
+    judge_server_host,
+    judge_server_port,
 ):
     """
     proxy-fleet: High-performance proxy server management tool
@@ -478,10 +886,36 @@ def main(
     proxy-fleet --test-proxy-server proxies.txt
     cat proxies.txt | proxy-fleet --test-proxy-server -
 
+    # Continue an interrupted or timed-out validation run
+    proxy-fleet --test-proxy-server proxies.txt --resume
+
+    # Reject closed ports with a 1s TCP connect before the full handshake
+    proxy-fleet --test-proxy-server proxies.txt --concurrent 200 --prefilter-timeout 1
+
+    # Get 200 working proxies fast, trying historically good ones first
+    proxy-fleet --test-proxy-storage --test-proxy-order score --stop-after-valid 200
+
+    # Classify anonymity against a self-hosted judge (on a public host)
+    proxy-fleet --judge-server --judge-server-port 8890
+    proxy-fleet --test-proxy-server proxies.txt --test-proxy-judge http://judge.example.com:8890/
+
+    # Record throughput and time-to-first-byte for the throughput strategy
+    proxy-fleet --test-proxy-server proxies.txt --measure-bandwidth --bandwidth-bytes 2097152
+
+    # Refresh public lists (unchanged lists cost a 304) and validate them
+    proxy-fleet --download-proxy-list socks5 | proxy-fleet --test-proxy-server -
+
+    # Tag regions from a local IP-to-country database, no lookups over HTTP
+    proxy-fleet --test-proxy-server proxies.txt --geoip-db dbip-country-lite.csv
+    proxy-fleet --geoip-backfill --geoip-db GeoLite2-Country.mmdb
+
     Scenario 2 - Validate existing proxy servers in storage:
     # Test existing proxies in storage
     proxy-fleet --test-proxy-storage
 
+    # Or keep rechecking each proxy when it is due, 10 checks per second
+    proxy-fleet --revalidate-daemon --revalidate-rate 10 --concurrent 100
+
     Scenario 3 - List current proxy servers in storage:
     # List all proxy status
     proxy-fleet --list-proxy
@@ -512,6 +946,9 @@ def main(
     # Start with regional filtering
     proxy-fleet --start-proxy-server --proxy-server-use-region TW,US
 
+    # Only route through proxies judged anonymous or elite
+    proxy-fleet --start-proxy-server --proxy-server-use-anonymity anonymous,elite
+
     # Start with SSL cert check disabled (useful for SOCKS4)
     proxy-fleet --start-proxy-server --proxy-server-skip-cert-check
 
@@ -533,8 +970,17 @@ def main(
 
     # Start in single process mode for development
     proxy-fleet --enhanced-proxy-server --single-process
+
+    # Relay proxy traffic with the low-overhead engine (admin on port 8889)
+    proxy-fleet --enhanced-proxy-server --proxy-server-engine fast
+
+    # Also accept SOCKS5/SOCKS4a clients on port 1080
+    proxy-fleet --enhanced-proxy-server --proxy-server-socks-port 1080
     """
 
+    # Counts from the most recent validate_proxies() run
+    validation_summary: Dict[str, int] = {}
+
     async def run_proxy_fleet():
         # Set log level
         if verbose:
@@ -550,6 +996,9 @@ def main(
         elif start_proxy_server:
             # Mode: Start basic HTTP proxy server
             await run_proxy_server_mode()
+        elif judge_server:
+            # Mode: Start proxy judge
+            await run_judge_server_mode()
         elif list_proxy_types:
             # List proxy type statistics
             await run_list_proxy_types_mode()
@@ -565,25 +1014,55 @@ def main(
         elif remove_proxy_failed:
             # Remove failed proxies from storage
             await run_remove_failed_proxy_mode()
+        elif geoip_backfill:
+            # Tag stored proxies with their GeoIP country
+            await run_geoip_backfill_mode()
+        elif download_proxy_list:
+            # Download public proxy lists
+            await run_download_proxy_list_mode()
         elif test_proxy_server:
             # Mode 1: Validate proxies from input
             await run_proxy_test_mode()
         elif test_proxy_storage:
             # Mode 2: Test existing proxies in storage
             await run_test_storage_mode()
+        elif revalidate_daemon:
+            # Mode 2b: Continuously revalidate proxies in storage
+            await run_revalidate_daemon_mode()
         else:
             click.echo("❌ Please specify a running mode:")
             click.echo("   Configuration mode: --generate-config")
             click.echo("   Enhanced proxy server mode: --enhanced-proxy-server")
             click.echo("   Basic proxy server mode: --start-proxy-server")
+            click.echo("   Proxy judge mode: --judge-server")
             click.echo(
-                "   Proxy validation mode: --test-proxy-server <file|-> or --test-proxy-storage"
+                "   Proxy validation mode: --test-proxy-server <file|->, --test-proxy-storage or --revalidate-daemon"
             )
             click.echo(
-                "   Proxy management mode: --list-proxy, --list-proxy-verified, --list-proxy-failed, --list-proxy-types, or --remove-proxy-failed"
+                "   Proxy management mode: --list-proxy, --list-proxy-verified, --list-proxy-failed, --list-proxy-types, --remove-proxy-failed, or --geoip-backfill"
             )
+            click.echo("   Proxy list download mode: --download-proxy-list <types>")
             return
 
+    def load_geoip_database():
+        """Load --geoip-db, or return None (with a message) if it cannot be used"""
+        if not geoip_db:
+            return None
+        try:
+            database = GeoIPDatabase.from_file(geoip_db)
+        except (ImportError, OSError, ValueError) as e:
+            click.echo(f"❌ Cannot load GeoIP database: {e}")
+            return None
+        stats = database.get_stats()
+        if stats["format"] == "csv":
+            click.echo(
+                f"🗺️  GeoIP database {stats['source']}: {stats['ipv4_ranges']} IPv4 / "
+                f"{stats['ipv6_ranges']} IPv6 ranges, {stats['countries']} countries"
+            )
+        else:
+            click.echo(f"🗺️  GeoIP database {stats['source']} (MMDB)")
+        return database
+
     async def run_proxy_test_mode():
         """Run proxy validation mode"""
         storage = ProxyStorage(proxy_storage)
@@ -612,17 +1091,62 @@ def main(
             click.echo("❌ No valid proxy servers found")
             return
 
+        # Checkpoint progress so an interrupted run can be resumed
+        checkpoint = ValidationCheckpoint(
+            proxy_storage, test_proxy_server, proxies, test_proxy_type.lower()
+        )
+        if resume:
+            if checkpoint.load():
+                click.echo(
+                    f"⏩ Resuming from checkpoint: offset {checkpoint.offset}, "
+                    f"{checkpoint.completed_count}/{checkpoint.total} already validated "
+                    f"({checkpoint.valid_count} valid)"
+                )
+            else:
+                click.echo("⚠️  No matching checkpoint found, starting from the beginning")
+
+        indices = [i for i in range(len(proxies)) if not checkpoint.is_done(i)]
+        if test_proxy_order.lower() == "score":
+            ranked = storage.rank_proxies([proxies[i] for i in indices])
+            indices = [indices[r] for r in ranked]
+            click.echo("📊 Ordering candidates by prior score from storage")
+        remaining = [proxies[i] for i in indices]
+
+        if not remaining:
+            click.echo("✅ All proxies in this input were already validated")
+            checkpoint.clear()
+            return
+
         click.echo(
-            f"🔍 Starting validation of {len(proxies)} proxy servers (type: {test_proxy_type.upper()})"
+            f"🔍 Starting validation of {len(remaining)} proxy servers (type: {test_proxy_type.upper()})"
         )
         click.echo(f"🔧 Using {concurrent} concurrent connections for validation")
 
         # Validate proxies
-        valid_proxies = await validate_proxies(proxies, storage, concurrent)
+        resumed_valid = checkpoint.valid_count
+        resumed_failed = checkpoint.failed_count
+        valid_proxies = await validate_proxies(
+            remaining, storage, concurrent, checkpoint=checkpoint, indices=indices
+        )
 
-        click.echo(f"\n📊 Validation completed")
+        if checkpoint.completed_count >= checkpoint.total:
+            checkpoint.clear()
+            click.echo(f"\n📊 Validation completed")
+        else:
+            checkpoint.save()
+            click.echo(f"\n📊 Validation stopped before covering the whole input")
+            click.echo(
+                f"   Checkpoint: {checkpoint.completed_count}/{checkpoint.total} validated, "
+                f"saved to {checkpoint.path}"
+            )
+            click.echo(f"   Continue with: --test-proxy-server {test_proxy_server} --resume")
+
+        if resume and (resumed_valid or resumed_failed):
+            click.echo(
+                f"   From previous runs: {resumed_valid} valid, {resumed_failed} invalid"
+            )
         click.echo(f"   Valid proxies: {len(valid_proxies)}")
-        click.echo(f"   Invalid proxies: {len(proxies) - len(valid_proxies)}")
+        click.echo(f"   Invalid proxies: {checkpoint.failed_count - resumed_failed}")
         click.echo(f"   Results saved to: {proxy_storage}/")
 
     async def run_list_proxy_mode(filter_type="all"):
@@ -672,13 +1196,8 @@ def main(
             protocol = proxy_info.get("protocol", "unknown").lower()
             is_valid = proxy_info.get("is_valid", False)
             
-            # Get region from IP info
-            region = "Unknown"
-            ip_info = proxy_info.get("ip_info", {})
-            if ip_info:
-                region = ip_info.get("country", "Unknown")
-                if isinstance(region, str) and len(region) == 2:
-                    region = region.upper()
+            # Get region from probe results or the GeoIP tag
+            region = ProxyStorage.get_proxy_region(proxy_info) or "Unknown"
 
             # Total counts
             stats["total"] += 1
@@ -743,6 +1262,100 @@ def main(
         else:
             click.echo("ℹ️  No failed proxies found to remove")
 
+    async def run_geoip_backfill_mode():
+        """Tag stored proxies with their GeoIP country mode"""
+        click.echo("🗺️  Tagging stored proxies with GeoIP regions")
+        click.echo("=" * 50)
+
+        if not geoip_db:
+            click.echo("❌ --geoip-backfill requires --geoip-db <file>")
+            return
+        geoip = load_geoip_database()
+        if geoip is None:
+            return
+
+        storage = ProxyStorage(proxy_storage)
+        proxies = storage.load_proxy_data().get("proxies", {})
+        geo_infos = {}
+        for proxy_key, proxy_info in proxies.items():
+            geo_infos[proxy_key] = await lookup_host(geoip, proxy_info["host"])
+        geoip.close()
+
+        storage.update_geo_info(geo_infos)
+        tagged = sum(1 for geo_info in geo_infos.values() if geo_info)
+        # Proxies whose probes returned no country now get one from geo_info
+        regions = {
+            key: ProxyStorage.get_proxy_region(info)
+            for key, info in storage.load_proxy_data().get("proxies", {}).items()
+        }
+        click.echo(f"✅ GeoIP backfill completed:")
+        click.echo(f"   - Tagged: {tagged}/{len(proxies)} proxies")
+        click.echo(f"   - Not in database: {len(proxies) - tagged}")
+        click.echo(
+            f"   - Proxies with a known region: {sum(1 for r in regions.values() if r)}/{len(regions)}"
+        )
+
+    async def run_download_proxy_list_mode():
+        """Download public proxy lists mode
+
+        Status goes to stderr so that stdout can be piped into
+        --test-proxy-server -.
+        """
+        proxy_types = [t.strip().lower() for t in download_proxy_list.split(",") if t.strip()]
+        if "all" in proxy_types:
+            proxy_types = ["socks5", "socks4", "http"]
+
+        sources = {}
+        for source in download_source:
+            ptype, sep, url = source.partition("=")
+            if not sep or not url:
+                click.echo(f"❌ Invalid --download-source (expected TYPE=URL): {source}", err=True)
+                return
+            sources.setdefault(ptype.strip().lower(), []).append(url.strip())
+
+        unknown = [
+            t for t in proxy_types
+            if t not in ProxyDownloader.PROXY_SOURCES and t not in sources
+        ]
+        if unknown:
+            click.echo(f"❌ No sources for proxy type(s): {', '.join(unknown)}", err=True)
+            return
+
+        cache_dir = download_cache or str(Path(proxy_storage) / "download-cache")
+        downloader = ProxyDownloader(sources=sources, cache_dir=cache_dir)
+        click.echo(f"📥 Downloading {', '.join(proxy_types)} proxy lists", err=True)
+
+        started = time.monotonic()
+        results = await downloader.download_proxy_lists(proxy_types)
+        elapsed = time.monotonic() - started
+
+        for url, result in downloader.last_results.items():
+            status = result["status"]
+            icon = {"downloaded": "⬇️ ", "not_modified": "♻️ ", "stale_cache": "⚠️ "}.get(status, "❌")
+            detail = f"{result['lines']} lines"
+            if status == "downloaded":
+                detail += f", {result['bytes'] / 1024:.0f} KB"
+            if result.get("error"):
+                detail += f", {result['error']}"
+            click.echo(f"   {icon} {url}: {status} ({detail})", err=True)
+
+        # A single type keeps plain host:port lines; mixed types carry a scheme
+        prefix_types = len(proxy_types) > 1
+        output = sys.stdout if download_output == "-" else open(download_output, "w", encoding="utf-8")
+        try:
+            total = 0
+            for ptype in proxy_types:
+                for proxy in results[ptype]:
+                    line = f"{proxy['host']}:{proxy['port']}"
+                    output.write(f"{ptype}://{line}\n" if prefix_types else f"{line}\n")
+                    total += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        counts = ", ".join(f"{ptype}: {len(results[ptype])}" for ptype in proxy_types)
+        click.echo(f"✅ {total} unique proxies ({counts}) in {elapsed:.1f}s", err=True)
+
     async def run_test_storage_mode():
         """Test existing proxies in storage mode"""
         storage = ProxyStorage(proxy_storage)
@@ -764,6 +1377,9 @@ def main(
             return
 
         click.echo(f"📥 Found {len(all_proxies)} existing proxy servers")
+        if test_proxy_order.lower() == "score":
+            all_proxies = [all_proxies[i] for i in storage.rank_proxies(all_proxies)]
+            click.echo("📊 Ordering candidates by prior score from storage")
         click.echo(f"🔍 Starting re-validation (type: {test_proxy_type.upper()})")
         click.echo(f"🔧 Using {concurrent} concurrent connections for validation")
 
@@ -772,30 +1388,135 @@ def main(
 
         click.echo(f"\n📊 Re-validation completed")
         click.echo(f"   Valid proxies: {len(valid_proxies)}")
-        click.echo(f"   Invalid proxies: {len(all_proxies) - len(valid_proxies)}")
+        click.echo(f"   Invalid proxies: {validation_summary.get('failed', 0)}")
+        if validation_summary.get("cancelled"):
+            click.echo(f"   Not validated (stopped early): {validation_summary['cancelled']}")
         click.echo(f"   Results updated to: {proxy_storage}/")
 
-    async def validate_proxies(proxies, storage, max_concurrent):
-        """Validate proxy list"""
-        # Import asyncio explicitly to avoid scoping issues
-        import asyncio
-        
-        # Initialize validator - use new server request validation if test URL provided
+    def create_validator():
+        """Validator configured from the --test-proxy-* options"""
+        # Use new server request validation if test URL provided
         if test_proxy_with_request:
-            validator = SocksValidator(
+            return SocksValidator(
                 timeout=test_proxy_timeout, 
                 check_server_via_request=True,
-                request_url=test_proxy_with_request
+                request_url=test_proxy_with_request,
+                judge_url=test_proxy_judge,
+                max_probe_bytes=probe_max_bytes,
+            )
+        return SocksValidator(
+            timeout=test_proxy_timeout,
+            judge_url=test_proxy_judge,
+            max_probe_bytes=probe_max_bytes,
+        )
+
+    async def run_revalidate_daemon_mode():
+        """Continuously revalidate proxies in storage mode"""
+        storage = ProxyStorage(proxy_storage)
+
+        click.echo("🔁 Starting continuous proxy revalidation")
+        click.echo("=" * 50)
+
+        validator = create_validator()
+        if test_proxy_judge:
+            await validator.get_real_ip()
+        scheduler = RevalidationScheduler(
+            storage,
+            validator,
+            rate=revalidate_rate,
+            concurrency=concurrent,
+            base_interval=revalidate_interval,
+            min_interval=revalidate_min_interval,
+            max_interval=revalidate_max_interval,
+        )
+        click.echo(
+            f"🔧 Rate: {revalidate_rate}/s, concurrency: {concurrent}, intervals: "
+            f"{revalidate_min_interval:.0f}s after failure, {revalidate_interval:.0f}s "
+            f"after success, up to {revalidate_max_interval:.0f}s"
+        )
+        click.echo("   Press Ctrl+C to stop")
+
+        async def report_loop():
+            while True:
+                await asyncio.sleep(progress_interval)
+                stats = scheduler.get_stats()
+                if progress_format == "json":
+                    stats.update(timestamp=time.time(), event="revalidation")
+                    click.echo(json.dumps(stats), err=True)
+                else:
+                    next_due = stats["next_due_in"]
+                    click.echo(
+                        f"📈 Checked {stats['checked']} ({stats['valid']} valid, {stats['rate']}/s) - "
+                        f"scheduled {stats['scheduled']}, due now {stats['due_now']}, "
+                        f"flapping {stats['flapping']}, next due in "
+                        f"{'-' if next_due is None else f'{next_due:.0f}s'}"
+                    )
+
+        report_task = asyncio.create_task(report_loop())
+        try:
+            await scheduler.run()
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            click.echo("\n🛑 Revalidation stopped, results written to storage")
+        finally:
+            report_task.cancel()
+
+    async def validate_proxies(
+        proxies, storage, max_concurrent, checkpoint=None, indices=None
+    ):
+        """Validate proxy list
+
+        When a checkpoint is given, indices maps each proxy to its position in
+        the checkpointed input; finished entries are recorded there and the
+        checkpoint is written every --checkpoint-interval seconds.
+        """
+        # Import asyncio explicitly to avoid scoping issues
+        import asyncio
+        
+        validator = create_validator()
+        geoip = load_geoip_database()
+        if test_proxy_judge:
+            real_ip = await validator.get_real_ip()
+            click.echo(
+                f"⚖️  Proxy judge: {test_proxy_judge} (our address: {real_ip or 'unknown'})"
             )
-        else:
-            validator = SocksValidator(timeout=test_proxy_timeout)
         valid_proxies = []
 
-        # Use concurrency control to validate proxies
-        semaphore = asyncio.Semaphore(max_concurrent)
+        # Use concurrency control to validate proxies. Each stage has its own
+        # pool: an optional TCP-connect prefilter, the protocol handshake and
+        # an optional separate pool for the HTTP request check and one for
+        # bandwidth downloads. The admission semaphore bounds how many proxies
+        # are inside the pipeline at once.
+        handshake_semaphore = asyncio.Semaphore(max_concurrent)
+        probe_semaphore = (
+            asyncio.Semaphore(probe_concurrent) if probe_concurrent else None
+        )
+        bandwidth_semaphore = (
+            asyncio.Semaphore(bandwidth_concurrent) if measure_bandwidth else None
+        )
+        if prefilter_timeout:
+            prefilter_semaphore = asyncio.Semaphore(prefilter_concurrent)
+            semaphore = asyncio.Semaphore(prefilter_concurrent)
+        else:
+            prefilter_semaphore = None
+            semaphore = asyncio.Semaphore(
+                max_concurrent
+                + (probe_concurrent or 0)
+                + (bandwidth_concurrent if measure_bandwidth else 0)
+            )
 
         # Add debug info for concurrency
         click.echo(f"🔧 Concurrency settings: {max_concurrent} concurrent connections")
+        if prefilter_semaphore is not None:
+            click.echo(
+                f"🔧 TCP prefilter: {prefilter_concurrent} concurrent, {prefilter_timeout}s timeout"
+            )
+        if probe_semaphore is not None:
+            click.echo(f"🔧 HTTP request check pool: {probe_concurrent} concurrent")
+        if bandwidth_semaphore is not None:
+            click.echo(
+                f"🔧 Bandwidth test: {bandwidth_bytes} bytes from {bandwidth_url}, "
+                f"{bandwidth_concurrent} concurrent"
+            )
         click.echo(
             f"🔧 Creating ThreadPoolExecutor with max_workers={min(max_concurrent, 500)}"
         )
@@ -809,6 +1530,9 @@ def main(
         active_tasks = 0
         max_active_tasks = 0
         completed_tasks = 0
+        valid_found = 0
+        tasks = []
+        progress = ValidationProgress(len(proxies))
 
         try:
             with concurrent.futures.ThreadPoolExecutor(
@@ -818,97 +1542,184 @@ def main(
                 old_executor = loop._default_executor
                 loop.set_default_executor(executor)
 
-                async def validate_single_proxy(proxy):
-                    nonlocal active_tasks, max_active_tasks, completed_tasks
-                    async with semaphore:
-                        active_tasks += 1
-                        if active_tasks > max_active_tasks:
-                            max_active_tasks = active_tasks
-
-                        host, port = proxy["host"], proxy["port"]
-
-                        try:
-                            # Add timeout wrapper for individual proxy validation
-                            async def proxy_validation_with_timeout():
-                                # Choose validation method based on proxy type
-                                if test_proxy_type.lower() == "socks4":
-                                    result = await validator.async_validate_socks4(
-                                        host, port
+                async def validate_single_proxy(proxy, index):
+                    nonlocal active_tasks, max_active_tasks, completed_tasks, valid_found
+                    admitted = False
+                    try:
+                        async with semaphore:
+                            admitted = True
+                            active_tasks += 1
+                            if active_tasks > max_active_tasks:
+                                max_active_tasks = active_tasks
+
+                            host, port = proxy["host"], proxy["port"]
+                            finished_valid = None  # stays None if cancelled
+                            progress.start()
+                            if checkpoint is not None:
+                                checkpoint.mark_started(index)
+
+                            try:
+                                proxy_type = test_proxy_type.lower()
+
+                                # Stage 1: cheap TCP connect, rejects closed ports fast
+                                if prefilter_semaphore is not None:
+                                    async with prefilter_semaphore:
+                                        prefilter_result = await validator.async_tcp_connect(
+                                            host, port, timeout=prefilter_timeout
+                                        )
+                                    if not prefilter_result.is_valid:
+                                        prefilter_result.error = (
+                                            f"Prefilter: {prefilter_result.error}"
+                                        )
+                                        storage.update_proxy_status(
+                                            host, port, False, proxy_type=proxy_type
+                                        )
+                                        finished_valid = False
+                                        return {
+                                            "proxy": proxy,
+                                            "result": prefilter_result,
+                                            "http_success": False,
+                                        }
+
+                                # Stage 2: protocol handshake (timeout applies once a
+                                # slot is held, not while queueing for one)
+                                async with handshake_semaphore:
+                                    validation_start = time.monotonic()
+                                    result = await asyncio.wait_for(
+                                        validator.async_handshake(host, port, proxy_type),
+                                        timeout=test_proxy_timeout + 5  # Add 5 seconds buffer
                                     )
-                                elif test_proxy_type.lower() == "socks5":
-                                    result = await validator.async_validate_socks5(
-                                        host, port
+                                    response_time = time.monotonic() - validation_start
+                                    if result.is_valid:
+                                        progress.record_handshake(response_time)
+
+                                    # Stage 3: HTTP request check, in the handshake
+                                    # slot unless it has its own pool
+                                    if result.is_valid and probe_semaphore is None:
+                                        result = await asyncio.wait_for(
+                                            validator.async_server_check(
+                                                result, host, port, proxy_type
+                                            ),
+                                            timeout=test_proxy_timeout + 5,
+                                        )
+                                if result.is_valid and probe_semaphore is not None:
+                                    async with probe_semaphore:
+                                        result = await asyncio.wait_for(
+                                            validator.async_server_check(
+                                                result, host, port, proxy_type
+                                            ),
+                                            timeout=test_proxy_timeout + 5,
+                                        )
+
+                                # Stage 4: bandwidth download, only for proxies
+                                # that passed; a failed download keeps them valid
+                                bandwidth = None
+                                if result.is_valid and bandwidth_semaphore is not None:
+                                    async with bandwidth_semaphore:
+                                        bandwidth = await validator.measure_bandwidth(
+                                            host,
+                                            port,
+                                            proxy_type,
+                                            bandwidth_url,
+                                            bandwidth_bytes,
+                                        )
+
+                                if result.is_valid:
+                                    # Tag the region offline, no request needed
+                                    geo_info = (
+                                        await lookup_host(geoip, host, validator.dns_cache)
+                                        if geoip is not None
+                                        else None
+                                    )
+
+                                    # Extract server response data if available
+                                    http_response_data = None
+                                    if result.ip_info and isinstance(result.ip_info, dict):
+                                        # The ip_info now contains the server response data
+                                        http_response_data = result.ip_info
+
+                                    storage.update_proxy_status(
+                                        host,
+                                        port,
+                                        True,
+                                        None,  # No separate ip_info
+                                        test_proxy_type.lower(),
+                                        http_response_data,
+                                        response_time=response_time,
+                                        anonymity=result.anonymity,
+                                        capabilities=result.capabilities,
+                                        bandwidth=bandwidth,
+                                        geo_info=geo_info,
                                     )
-                                elif test_proxy_type.lower() == "http":
-                                    result = await validator.async_validate_http(host, port)
+                                    finished_valid = True
+                                    valid_found += 1
+                                    if (
+                                        stop_after_valid
+                                        and valid_found == stop_after_valid
+                                    ):
+                                        click.echo(
+                                            f"🎯 Reached --stop-after-valid target ({stop_after_valid}), "
+                                            f"cancelling remaining validations"
+                                        )
+                                        current = asyncio.current_task()
+                                        for task in tasks:
+                                            if task is not current and not task.done():
+                                                task.cancel()
+                                    return {
+                                        "proxy": proxy,
+                                        "result": result,
+                                        "http_success": True,
+                                        "bandwidth": bandwidth,
+                                        "geo_info": geo_info,
+                                    }
                                 else:
-                                    result = ValidationResult(
-                                        is_valid=False, error="Unsupported proxy type"
+                                    storage.update_proxy_status(
+                                        host,
+                                        port,
+                                        False,
+                                        proxy_type=test_proxy_type.lower(),
                                     )
-                                return result
-                            
-                            # Apply timeout to individual proxy validation
-                            result = await asyncio.wait_for(
-                                proxy_validation_with_timeout(), 
-                                timeout=test_proxy_timeout + 5  # Add 5 seconds buffer
-                            )
-
-                            if result.is_valid:
-                                # Extract server response data if available
-                                http_response_data = None
-                                if result.ip_info and isinstance(result.ip_info, dict):
-                                    # The ip_info now contains the server response data
-                                    http_response_data = result.ip_info
-
+                                    finished_valid = False
+                                    return {
+                                        "proxy": proxy,
+                                        "result": result,
+                                        "http_success": False,
+                                    }
+
+                            except asyncio.TimeoutError:
                                 storage.update_proxy_status(
-                                    host,
-                                    port,
-                                    True,
-                                    None,  # No separate ip_info
-                                    test_proxy_type.lower(),
-                                    http_response_data,
+                                    host, port, False, proxy_type=test_proxy_type.lower()
                                 )
-                                return {
-                                    "proxy": proxy,
-                                    "result": result,
-                                    "http_success": True,
-                                }
-                            else:
+                                finished_valid = False
+                                return {"proxy": proxy, "result": None, "error": "Validation timeout"}
+                            except asyncio.CancelledError:
+                                # Handle cancellation gracefully - don't update storage on cancellation
+                                return {"proxy": proxy, "result": None, "error": "Cancelled"}
+                            except Exception as e:
                                 storage.update_proxy_status(
-                                    host,
-                                    port,
-                                    False,
-                                    proxy_type=test_proxy_type.lower(),
+                                    host, port, False, proxy_type=test_proxy_type.lower()
                                 )
-                                return {
-                                    "proxy": proxy,
-                                    "result": result,
-                                    "http_success": False,
-                                }
-
-                        except asyncio.TimeoutError:
-                            storage.update_proxy_status(
-                                host, port, False, proxy_type=test_proxy_type.lower()
-                            )
-                            return {"proxy": proxy, "result": None, "error": "Validation timeout"}
-                        except asyncio.CancelledError:
-                            # Handle cancellation gracefully - don't update storage on cancellation
-                            return {"proxy": proxy, "result": None, "error": "Cancelled"}
-                        except Exception as e:
-                            storage.update_proxy_status(
-                                host, port, False, proxy_type=test_proxy_type.lower()
-                            )
-                            return {"proxy": proxy, "result": None, "error": str(e)}
-                        finally:
-                            active_tasks -= 1
-                            completed_tasks += 1
+                                finished_valid = False
+                                return {"proxy": proxy, "result": None, "error": str(e)}
+                            finally:
+                                active_tasks -= 1
+                                completed_tasks += 1
+                                if checkpoint is not None and finished_valid is not None:
+                                    checkpoint.mark_done(index, finished_valid)
+                                progress.finish(finished_valid)
                             
-                            # Show progress every 100 completed tasks or when finding valid proxies
-                            if (completed_tasks % 100 == 0 or 
-                                completed_tasks in [1, 10, 50]):
+                                # Show progress every 100 completed tasks or when finding valid proxies
+                                if progress_format == "text" and (
+                                    completed_tasks % 100 == 0 or
+                                    completed_tasks in [1, 10, 50]):
                                 
-                                progress_pct = (completed_tasks / len(proxies)) * 100
-                                click.echo(f"📈 Progress: {completed_tasks}/{len(proxies)} ({progress_pct:.1f}%) - Active: {active_tasks}")
+                                    progress_pct = (completed_tasks / len(proxies)) * 100
+                                    click.echo(f"📈 Progress: {completed_tasks}/{len(proxies)} ({progress_pct:.1f}%) - Active: {active_tasks}")
+                    except asyncio.CancelledError:
+                        if not admitted:
+                            # Cancelled while queued, e.g. after --stop-after-valid
+                            progress.cancel_queued()
+                        raise
 
                 # Validate all proxies concurrently with overall timeout
                 # Set total timeout based on proxy count and timeout per proxy
@@ -917,9 +1728,46 @@ def main(
                     3600  # Maximum 1 hour
                 )
                 
+                # Periodically persist checkpoint while validation runs
+                async def checkpoint_loop():
+                    while True:
+                        await asyncio.sleep(checkpoint_interval)
+                        checkpoint.save()
+
+                checkpoint_task = (
+                    asyncio.create_task(checkpoint_loop())
+                    if checkpoint is not None
+                    else None
+                )
+
+                # JSON progress goes to stderr on a time interval so that
+                # orchestration can parse it without the human-readable output
+                def emit_progress(event):
+                    snapshot = progress.snapshot()
+                    snapshot["event"] = event
+                    click.echo(json.dumps(snapshot), err=True)
+
+                async def progress_loop():
+                    while True:
+                        await asyncio.sleep(progress_interval)
+                        emit_progress("progress")
+
+                progress_task = (
+                    asyncio.create_task(progress_loop())
+                    if progress_format == "json"
+                    else None
+                )
+
                 try:
                     # Create tasks for better cancellation control
-                    tasks = [asyncio.create_task(validate_single_proxy(proxy)) for proxy in proxies]
+                    tasks[:] = [
+                        asyncio.create_task(
+                            validate_single_proxy(
+                                proxy, indices[i] if indices is not None else i
+                            )
+                        )
+                        for i, proxy in enumerate(proxies)
+                    ]
                     
                     validation_results = await asyncio.wait_for(
                         asyncio.gather(*tasks, return_exceptions=True),
@@ -932,12 +1780,11 @@ def main(
                     for task in tasks:
                         if not task.done():
                             task.cancel()
-                    # Wait for cancellation to complete
-                    try:
-                        await asyncio.gather(*tasks, return_exceptions=True)
-                    except:
-                        pass
-                    validation_results = []  # Empty results on timeout
+                    # Keep the results that completed before the timeout,
+                    # cancelled tasks are reported as such
+                    validation_results = await asyncio.gather(
+                        *tasks, return_exceptions=True
+                    )
                 except asyncio.CancelledError:
                     # Handle cancellation explicitly
                     click.echo(f"\n🛑 Validation cancelled")
@@ -951,6 +1798,14 @@ def main(
                     except:
                         pass
                     raise  # Re-raise to be handled by outer exception handler
+                finally:
+                    if checkpoint_task is not None:
+                        checkpoint_task.cancel()
+                    if progress_task is not None:
+                        progress_task.cancel()
+                        emit_progress("done")
+                    if checkpoint is not None:
+                        checkpoint.save()
 
                 # Restore the original executor (only if it was not None)
                 if old_executor is not None:
@@ -962,6 +1817,9 @@ def main(
             click.echo(f"📊 Progress: {completed_tasks}/{len(proxies)} tasks processed")
             click.echo(f"🔧 Active concurrent tasks: {active_tasks}")
             click.echo(f"🔧 Peak concurrent tasks: {max_active_tasks}")
+            if checkpoint is not None:
+                checkpoint.save()
+                click.echo(f"💾 Checkpoint saved, continue later with --resume")
 
             # Give some time for active tasks to complete gracefully
             try:
@@ -1008,8 +1866,9 @@ def main(
         cancelled_count = 0
         
         for validation_result in validation_results:
-            # Check if this is an exception (due to return_exceptions=True)
-            if isinstance(validation_result, Exception):
+            # Check if this is an exception (due to return_exceptions=True),
+            # CancelledError is a BaseException so it is checked explicitly
+            if isinstance(validation_result, (Exception, asyncio.CancelledError)):
                 if isinstance(validation_result, asyncio.CancelledError):
                     cancelled_count += 1
                 else:
@@ -1045,6 +1904,28 @@ def main(
                 proxy_type_name = test_proxy_type.upper()
                 click.echo(f"✅ {host}:{port} - {proxy_type_name} validation successful")
                 
+                if result.anonymity:
+                    click.echo(f"   ⚖️  Anonymity: {result.anonymity}")
+                if result.capabilities:
+                    click.echo(
+                        f"   🔌 Plain HTTP: {'yes' if result.capabilities.get('http') else 'no'}, "
+                        f"CONNECT (HTTPS): {'yes' if result.capabilities.get('connect') else 'no'}"
+                    )
+                if measure_bandwidth:
+                    bandwidth = validation_result.get("bandwidth")
+                    if bandwidth:
+                        click.echo(
+                            f"   📶 Throughput: {bandwidth['bandwidth_kbps']:.1f} KB/s, "
+                            f"TTFB: {bandwidth['ttfb'] * 1000:.0f} ms"
+                        )
+                    else:
+                        click.echo("   📶 Throughput: download failed")
+                if geoip is not None:
+                    geo_info = validation_result.get("geo_info")
+                    click.echo(
+                        f"   🗺️  GeoIP region: {geo_info['country'] if geo_info else 'unknown'}"
+                    )
+
                 # Check if we have server response data from the validator
                 if result.ip_info and isinstance(result.ip_info, dict):
                     server_response = result.ip_info
@@ -1081,6 +1962,9 @@ def main(
         else:
             click.echo(f"   📈 No tasks completed successfully")
 
+        validation_summary.update(
+            valid=valid_count, failed=failed_count, cancelled=cancelled_count
+        )
         return valid_proxies
 
     async def run_proxy_server_mode():
@@ -1098,14 +1982,15 @@ def main(
         # Parse proxy types and regions
         proxy_types = [t.strip() for t in proxy_server_use_types.split(',') if t.strip()]
         regions = [r.strip() for r in proxy_server_use_region.split(',') if r.strip()] if proxy_server_use_region else None
+        anonymity = [a.strip() for a in proxy_server_use_anonymity.split(',') if a.strip()] if proxy_server_use_anonymity else None
 
         # Check if we have any verified proxies with filters
         storage = ProxyStorage(proxy_storage)
-        available_proxies = storage.get_valid_proxies(proxy_types=proxy_types, regions=regions)
+        available_proxies = storage.get_valid_proxies(proxy_types=proxy_types, regions=regions, anonymity=anonymity)
 
         if not available_proxies:
             click.echo(f"❌ No verified proxy servers found in {proxy_storage}/ matching filters")
-            click.echo(f"   Filters: types={proxy_types}, regions={regions}")
+            click.echo(f"   Filters: types={proxy_types}, regions={regions}, anonymity={anonymity}")
             click.echo(
                 "   Please run proxy validation first: --test-proxy-server <proxy_file>"
             )
@@ -1119,6 +2004,8 @@ def main(
             click.echo(f"🌍 Region filter: {', '.join(regions)}")
         else:
             click.echo(f"🌍 Region filter: all regions")
+        if anonymity:
+            click.echo(f"⚖️  Anonymity filter: {', '.join(anonymity)}")
         click.echo(f"🔐 Skip SSL cert check: {'enabled' if proxy_server_skip_cert_check else 'disabled'}")
         click.echo(f"🔄 Rotation mode: {proxy_server_rotation}")
         click.echo(f"📡 Server will listen on {proxy_server_host}:{proxy_server_port}")
@@ -1147,8 +2034,27 @@ def main(
             proxy_types=proxy_types,
             regions=regions,
             skip_cert_check=proxy_server_skip_cert_check,
+            anonymity=anonymity,
+        )
+
+        await server.start()
+
+    async def run_judge_server_mode():
+        """Run proxy judge mode"""
+        from ..server.judge_server import JudgeServer
+
+        click.echo("⚖️  Starting proxy judge")
+        click.echo("=" * 50)
+        click.echo(f"📡 Judge will listen on {judge_server_host}:{judge_server_port}")
+        click.echo(
+            "   The judge must be reachable from the proxies, e.g. on a public host"
+        )
+        click.echo("\n💡 Usage example:")
+        click.echo(
+            f"   proxy-fleet --test-proxy-server proxies.txt --test-proxy-judge http://<public-host>:{judge_server_port}/"
         )
 
+        server = JudgeServer(host=judge_server_host, port=judge_server_port)
         await server.start()
 
     async def run_generate_config_mode():
@@ -1167,6 +2073,7 @@ def main(
         # Parse proxy types and regions for default config
         proxy_types = [t.strip() for t in proxy_server_use_types.split(',') if t.strip()]
         regions = [r.strip() for r in proxy_server_use_region.split(',') if r.strip()] if proxy_server_use_region else None
+        anonymity = [a.strip() for a in proxy_server_use_anonymity.split(',') if a.strip()] if proxy_server_use_anonymity else None
 
         # Default configuration
         default_config = {
@@ -1174,12 +2081,19 @@ def main(
                 "host": proxy_server_host,
                 "port": proxy_server_port,
                 "workers": proxy_server_workers or multiprocessing.cpu_count(),
+                "engine": proxy_server_engine or "aiohttp",
+                "socks_port": proxy_server_socks_port,
                 "worker_timeout": 30,
                 "request_timeout": 30,
+                "stream_threshold": 1048576,  # Larger bodies are streamed
+                "stream_buffer_size": 65536,
+                "tunnel_idle_timeout": 300,
+                "tunnel_zero_copy": True,
                 "max_connections": 1000,
                 "keepalive_timeout": 60,
                 "use_types": proxy_types,
                 "use_regions": regions,
+                "use_anonymity": anonymity,
                 "skip_cert_check": proxy_server_skip_cert_check,
             },
             "load_balancing": {
@@ -1208,6 +2122,25 @@ def main(
                         "primary_proxies": [],
                         "backup_proxies": [],
                     },
+                    "throughput": {
+                        "description": "Prefer proxies with high measured bandwidth (--measure-bandwidth)",
+                        "min_kbps": 0,
+                    },
+                    "sticky": {
+                        "description": "Keep each session on one proxy via consistent hashing",
+                        "key": "session",  # session, client_ip or target_host
+                        "header": "X-Proxy-Session",
+                        "load_factor": 1.25,
+                        "replicas": 64,
+                    },
+                    "domain_score": {
+                        "description": "Prefer proxies with good history for the target domain",
+                        "max_entries": 50000,  # Tracked (domain, proxy) pairs
+                        "half_life": 600,
+                        "prior_weight": 3,
+                        "exponent": 4,
+                        "ban_statuses": [403, 429],
+                    },
                 },
             },
             "health_checks": {
@@ -1220,6 +2153,7 @@ def main(
                 "max_retries": 3,
                 "failure_reset_time": 300,
                 "parallel_checks": 5,  # Reduced from 10 to be more conservative
+                "leader_lease": 10,  # Seconds between health check leader renewals
             },
             "circuit_breaker": {
                 "enabled": True,
@@ -1227,6 +2161,40 @@ def main(
                 "recovery_timeout": 60,
                 "half_open_max_calls": 3,
             },
+            "dns_cache": {
+                "ttl": 300,
+                "negative_ttl": 30,
+                "max_entries": 10000,
+            },
+            "retries": {
+                "max_attempts": 3,  # Proxies tried per request
+                "deadline": 30,  # Seconds from arrival
+                "methods": ["GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"],
+                "statuses": [502, 503, 504],
+            },
+            "hedging": {
+                "enabled": False,  # Second copy of slow idempotent requests
+                "percentile": 95,
+                "min_delay": 0.05,
+                "initial_delay": 1.0,
+                "max_ratio": 0.1,  # Most hedged share of requests
+                "window": 1000,
+            },
+            "response_cache": {
+                "enabled": False,  # Answer cacheable GETs without a proxy
+                "max_bytes": 64 * 1024 * 1024,
+                "max_entry_bytes": 1024 * 1024,
+                "max_variants": 8,
+                "disk_path": None,  # Shared by all workers when set
+                "disk_max_bytes": 1024 * 1024 * 1024,
+            },
+            "session_pool": {
+                "max_sessions": 256,
+                "idle_ttl": 300,
+                "keepalive_timeout": 30,
+                "connections_per_proxy": 100,
+                "idle_connections_per_key": 16,
+            },
             "rate_limiting": {
                 "enabled": False,
                 "requests_per_minute": 100,
@@ -1290,14 +2258,15 @@ def main(
         # Parse proxy types and regions
         proxy_types = [t.strip() for t in proxy_server_use_types.split(',') if t.strip()]
         regions = [r.strip() for r in proxy_server_use_region.split(',') if r.strip()] if proxy_server_use_region else None
+        anonymity = [a.strip() for a in proxy_server_use_anonymity.split(',') if a.strip()] if proxy_server_use_anonymity else None
 
         # Check if we have any verified proxies with filters
         storage = ProxyStorage(proxy_storage)
-        available_proxies = storage.get_valid_proxies(proxy_types=proxy_types, regions=regions)
+        available_proxies = storage.get_valid_proxies(proxy_types=proxy_types, regions=regions, anonymity=anonymity)
 
         if not available_proxies:
             click.echo(f"❌ No verified proxy servers found in {proxy_storage}/ matching filters")
-            click.echo(f"   Filters: types={proxy_types}, regions={regions}")
+            click.echo(f"   Filters: types={proxy_types}, regions={regions}, anonymity={anonymity}")
             click.echo(
                 "   Please run proxy validation first: --test-proxy-server <proxy_file>"
             )
@@ -1311,6 +2280,8 @@ def main(
             click.echo(f"🌍 Region filter: {', '.join(regions)}")
         else:
             click.echo(f"🌍 Region filter: all regions")
+        if anonymity:
+            click.echo(f"⚖️  Anonymity filter: {', '.join(anonymity)}")
         click.echo(f"🔐 Skip SSL cert check: {'enabled' if proxy_server_skip_cert_check else 'disabled'}")
 
         # Load or check configuration
@@ -1333,6 +2304,10 @@ def main(
             config.setdefault("proxy_server", {})["port"] = proxy_server_port
         if proxy_server_workers:
             config.setdefault("proxy_server", {})["workers"] = proxy_server_workers
+        if proxy_server_engine:
+            config.setdefault("proxy_server", {})["engine"] = proxy_server_engine.lower()
+        if proxy_server_socks_port:
+            config.setdefault("proxy_server", {})["socks_port"] = proxy_server_socks_port
         if proxy_server_strategy:
             config.setdefault("load_balancing", {})["strategy"] = proxy_server_strategy
         if verbose:
@@ -1341,6 +2316,7 @@ def main(
         # Add new proxy filtering and SSL configuration
         config.setdefault("proxy_server", {})["use_types"] = proxy_types
         config.setdefault("proxy_server", {})["use_regions"] = regions
+        config.setdefault("proxy_server", {})["use_anonymity"] = anonymity
         config.setdefault("proxy_server", {})["skip_cert_check"] = proxy_server_skip_cert_check
 
         # Display configuration summary
@@ -1357,6 +2333,7 @@ def main(
         )
         click.echo(f"   Host: {server_config.get('host', '127.0.0.1')}")
         click.echo(f"   Port: {server_config.get('port', 8888)}")
+        click.echo(f"   Engine: {server_config.get('engine', 'aiohttp')}")
         click.echo(
             f"   Health checks: {'enabled' if health_config.get('enabled', True) else 'disabled'}"
         )
@@ -1367,11 +2344,16 @@ def main(
 
         host = server_config.get("host", "127.0.0.1")
         port = server_config.get("port", 8888)
+        engine = server_config.get("engine", "aiohttp")
+        admin_port = server_config.get("admin_port", port + 1) if engine == "fast" else port
 
         click.echo(f"📡 Server endpoints:")
         click.echo(f"   Proxy: http://{host}:{port}")
-        click.echo(f"   Stats: http://{host}:{port}/stats")
-        click.echo(f"   Health: http://{host}:{port}/health")
+        click.echo(f"   Stats: http://{host}:{admin_port}/stats")
+        click.echo(f"   Health: http://{host}:{admin_port}/health")
+        socks_port = server_config.get("socks_port")
+        if socks_port:
+            click.echo(f"   SOCKS: socks5://{host}:{socks_port}")
 
         click.echo("\n💡 Usage examples:")
         click.echo(f"   curl --proxy http://{host}:{port} http://httpbin.org/ip")
@@ -1383,7 +2365,8 @@ def main(
             config_file=proxy_server_config, 
             proxy_types=proxy_types, 
             regions=regions, 
-            skip_cert_check=proxy_server_skip_cert_check
+            skip_cert_check=proxy_server_skip_cert_check,
+            anonymity=anonymity,
         )
         # Override configuration from command line args
         server.config = config
@@ -1391,6 +2374,9 @@ def main(
         server.host = host
         server.port = port
         server.workers = server_config.get("workers", multiprocessing.cpu_count())
+        server.engine = engine
+        server.admin_port = server_config.get("admin_port", port + 1)
+        server.socks_port = socks_port
 
         if single_process:
             click.echo("\n🔧 Running in single process mode (development)")
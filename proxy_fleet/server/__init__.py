@@ -5,6 +5,7 @@ This module provides HTTP proxy server functionality that can forward
 requests through verified proxy servers from the proxy storage.
 """
 
+from .judge_server import JudgeServer
 from .proxy_server import HTTPProxyServer, ProxyRotator
 
-__all__ = ["HTTPProxyServer", "ProxyRotator"]
+__all__ = ["HTTPProxyServer", "ProxyRotator", "JudgeServer"]
@@ -0,0 +1,150 @@
+"""
+Per-target-domain proxy scores for the domain_score strategy.
+
+`ProxyStats` judges a proxy by all of its traffic, so a proxy banned by one
+site is penalised everywhere and a proxy that is fast for one CDN gets no
+credit for it. `DomainScoreboard` keeps success counts and latency per
+(target domain, proxy) pair:
+
+- Counts decay with a half-life, so a ban that is lifted or a proxy that
+  went bad recently is reflected within minutes.
+- A pair's success estimate is smoothed toward the proxy's global success
+  rate, so proxies with little history for a domain are judged by their
+  overall record instead of being dropped.
+- Pairs are kept in an LRU bounded by max_entries; the least recently
+  updated pairs are forgotten first.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+
+def normalize_domain(host: str) -> str:
+    """Lower-case host without brackets or a trailing dot"""
+    return host.strip("[]").rstrip(".").lower()
+
+
+@dataclass
+class DomainStats:
+    """Decayed outcome counts of one proxy for one domain"""
+
+    successes: float = 0.0
+    failures: float = 0.0
+    latency: Optional[float] = None  # Moving average of successful requests
+    updated: float = 0.0
+
+    def counts(self, now: float, half_life: float) -> Tuple[float, float]:
+        """(successes, failures) decayed to now"""
+        if half_life <= 0:
+            return self.successes, self.failures
+        factor = 0.5 ** (max(0.0, now - self.updated) / half_life)
+        return self.successes * factor, self.failures * factor
+
+
+class DomainScoreboard:
+    """Bounded LRU of per-(domain, proxy) outcome statistics"""
+
+    def __init__(
+        self,
+        max_entries: int = 50000,
+        half_life: float = 600,
+        prior_weight: float = 3,
+        latency_alpha: float = 0.3,
+    ):
+        """
+        Initialize domain scoreboard
+
+        Args:
+            max_entries: Most (domain, proxy) pairs tracked
+            half_life: Seconds after which an outcome counts half
+            prior_weight: Weight of the global success rate, in requests
+            latency_alpha: Weight of the newest latency in the moving average
+        """
+        self.max_entries = max_entries
+        self.half_life = half_life
+        self.prior_weight = prior_weight
+        self.latency_alpha = latency_alpha
+
+        # (domain, proxy key) -> stats, least recently updated first
+        self._entries: "OrderedDict[Tuple[str, str], DomainStats]" = OrderedDict()
+        # domain -> proxy key -> the same stats objects, for lookups by domain
+        self._by_domain: Dict[str, Dict[str, DomainStats]] = {}
+
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def record(
+        self,
+        domain: str,
+        proxy_key: str,
+        success: bool,
+        response_time: Optional[float] = None,
+    ):
+        """Add the outcome of a request for domain through proxy_key"""
+        domain = normalize_domain(domain)
+        now = time.time()
+        entry = (domain, proxy_key)
+        stats = self._entries.get(entry)
+        if stats is None:
+            stats = DomainStats(updated=now)
+            self._entries[entry] = stats
+            self._by_domain.setdefault(domain, {})[proxy_key] = stats
+            while len(self._entries) > self.max_entries:
+                (old_domain, old_key), _ = self._entries.popitem(last=False)
+                proxies = self._by_domain[old_domain]
+                del proxies[old_key]
+                if not proxies:
+                    del self._by_domain[old_domain]
+                self.evictions += 1
+        else:
+            self._entries.move_to_end(entry)
+
+        stats.successes, stats.failures = stats.counts(now, self.half_life)
+        stats.updated = now
+        if success:
+            stats.successes += 1
+            if response_time is not None:
+                if stats.latency is None:
+                    stats.latency = response_time
+                else:
+                    stats.latency += self.latency_alpha * (response_time - stats.latency)
+        else:
+            stats.failures += 1
+
+    def for_domain(self, domain: str) -> Dict[str, DomainStats]:
+        """Stats of every tracked proxy for domain, by proxy key"""
+        return self._by_domain.get(normalize_domain(domain), {})
+
+    def score(
+        self, stats: Optional[DomainStats], prior: float, now: float
+    ) -> Tuple[float, Optional[float]]:
+        """
+        Success estimate and latency of a proxy for a domain
+
+        Args:
+            stats: The pair's stats from for_domain(), None if untracked
+            prior: The proxy's global success rate (0-1)
+            now: Current time
+
+        Returns:
+            (estimated success rate, moving average latency or None)
+        """
+        if stats is None:
+            return prior, None
+        successes, failures = stats.counts(now, self.half_life)
+        estimate = (successes + prior * self.prior_weight) / (
+            successes + failures + self.prior_weight
+        )
+        return estimate, stats.latency
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tracked_pairs": len(self._entries),
+            "domains": len(self._by_domain),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+        }
@@ -10,31 +10,58 @@ and multi-process workers for high concurrency.
 import asyncio
 import json
 import logging
+import math
 import multiprocessing
 import os
 import random
 import signal
+import socket
 import statistics
 import time
 import weakref
 from collections import defaultdict, deque
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
 from dataclasses import dataclass, field
 from enum import Enum
+from multiprocessing.managers import SyncManager
 from threading import Lock, RLock
 from typing import Any, Dict, List, Optional, Set, Tuple
 from urllib.parse import urlparse
 
 import aiohttp
-from aiohttp import ClientSession, ClientTimeout, web
+from aiohttp import web
 from aiohttp.web_request import Request
 from aiohttp.web_response import Response
-from aiohttp_socks import ProxyConnector, ProxyType
 
 from ..cli.main import ProxyStorage
+from ..utils.dns_cache import configure_dns_cache, get_dns_cache
+from ..utils.socks_validator import SocksValidator
+from .fast_engine import FastProxyEngine
+from .health_coordinator import HealthCheckCoordinator
+from .domain_scores import DomainScoreboard
+from .errors import UpstreamStatusError
+from .hash_ring import ConsistentHashRing
+from .hedging import HedgePolicy
+from .response_cache import SAFE_METHODS, CachedResponse, ResponseCache
+from .session_pool import UpstreamSessionPool
+from .socks_listener import SocksListener
+from .tunnel import TunnelRelay, open_tunnel
 
 logger = logging.getLogger(__name__)
 
+# Headers that apply to a single connection and are not relayed
+_HOP_BY_HOP = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+
 
 class GracefulShutdownManager:
     """管理優雅關機過程"""
@@ -177,6 +204,9 @@ class LoadBalancingStrategy(Enum):
     WEIGHTED = "weighted"
     RESPONSE_TIME = "response_time"
     FAIL_OVER = "fail_over"
+    THROUGHPUT = "throughput"
+    STICKY = "sticky"
+    DOMAIN_SCORE = "domain_score"
 
 
 class CircuitBreakerState(Enum):
@@ -205,6 +235,8 @@ class ProxyStats:
     circuit_breaker_failure_count: int = 0
     circuit_breaker_last_failure: float = 0
     circuit_breaker_half_open_calls: int = 0
+    bytes_sent: int = 0  # Tunnelled client -> upstream
+    bytes_received: int = 0  # Tunnelled upstream -> client
 
     @property
     def proxy_key(self) -> str:
@@ -283,11 +315,12 @@ class ProxyStats:
 class EnhancedProxyRotator:
     """Advanced proxy rotation with multiple load balancing strategies"""
 
-    def __init__(self, storage_dir: str = "proxy", config: Dict[str, Any] = None, proxy_types: List[str] = None, regions: List[str] = None):
+    def __init__(self, storage_dir: str = "proxy", config: Dict[str, Any] = None, proxy_types: List[str] = None, regions: List[str] = None, anonymity: List[str] = None):
         self.storage = ProxyStorage(storage_dir)
         self.config = config or {}
         self.proxy_types = proxy_types
         self.regions = regions
+        self.anonymity = anonymity
         self.lb_config = self.config.get("load_balancing", {})
         self.strategy = LoadBalancingStrategy(
             self.lb_config.get("strategy", "round_robin")
@@ -307,9 +340,38 @@ class EnhancedProxyRotator:
             .get("proxy_weights", {})
         )
 
+        # Sticky sessions: a session key always maps to the same proxy
+        # while it is available and not overloaded
+        sticky_config = self.lb_config.get("strategies", {}).get("sticky", {})
+        self.session_key_source = sticky_config.get("key", "session")
+        self.session_header = sticky_config.get("header", "X-Proxy-Session")
+        self.sticky_load_factor = max(1.0, sticky_config.get("load_factor", 1.25))
+        self._ring = ConsistentHashRing(sticky_config.get("replicas", 64))
+        self._ring_source: Optional[List[Dict[str, Any]]] = None
+        self.sticky_spills = 0
+
+        # Per-target-domain scores, kept only for the domain_score strategy
+        domain_config = self.lb_config.get("strategies", {}).get("domain_score", {})
+        self.domain_scores: Optional[DomainScoreboard] = None
+        if self.strategy == LoadBalancingStrategy.DOMAIN_SCORE:
+            self.domain_scores = DomainScoreboard(
+                max_entries=domain_config.get("max_entries", 50000),
+                half_life=domain_config.get("half_life", 600),
+                prior_weight=domain_config.get("prior_weight", 3),
+            )
+        # Answers that mean "this proxy is blocked by the site"
+        self.domain_ban_statuses = set(domain_config.get("ban_statuses", [403, 429]))
+        self.domain_score_exponent = domain_config.get("exponent", 4)
+
         # Thread safety - initialize lazily to support multiprocessing
         self._lock = None
         self._health_check_executor = None
+        self._health_check_lock = None
+
+        # Shared health check leadership, set by multi-worker servers
+        self.health_coordinator: Optional[HealthCheckCoordinator] = None
+        self._shared_health: Dict[str, Dict[str, Any]] = {}
+        self._shared_health_version = 0
 
         logger.info(f"Initialized proxy rotator with strategy: {self.strategy.value}")
 
@@ -338,7 +400,7 @@ class EnhancedProxyRotator:
 
         with self.lock:
             # Get fresh proxy list with filters
-            all_proxies = self.storage.get_valid_proxies(proxy_types=self.proxy_types, regions=self.regions)
+            all_proxies = self.storage.get_valid_proxies(proxy_types=self.proxy_types, regions=self.regions, anonymity=self.anonymity)
             self.last_refresh = current_time
 
             # Initialize stats for new proxies
@@ -350,6 +412,9 @@ class EnhancedProxyRotator:
                         port=proxy["port"],
                         weight=self.proxy_weights.get(proxy_key, 1.0),
                     )
+                    shared = self._shared_health.get(proxy_key)
+                    if shared:
+                        self._apply_health(self.proxy_stats[proxy_key], shared)
 
             # Remove stats for proxies no longer in storage
             valid_keys = {f"{p['host']}:{p['port']}" for p in all_proxies}
@@ -371,10 +436,59 @@ class EnhancedProxyRotator:
 
             return self.available_proxies
 
-    async def get_next_proxy(self) -> Optional[Tuple[Dict[str, Any], ProxyStats]]:
-        """Get the next proxy based on configured strategy"""
+    def session_key(
+        self,
+        session: Optional[str] = None,
+        client_ip: Optional[str] = None,
+        target_host: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Key the sticky strategy routes a request by
+
+        Args:
+            session: Value of the session header, if sent
+            client_ip: Address of the client
+            target_host: Host the request goes to
+
+        Returns:
+            None unless the sticky strategy is in use. With key "session"
+            the session header is used, falling back to the client IP
+        """
+        if self.strategy != LoadBalancingStrategy.STICKY:
+            return None
+        if self.session_key_source == "target_host":
+            return target_host
+        if self.session_key_source == "session" and session:
+            return f"session:{session}"
+        return client_ip
+
+    async def get_next_proxy(
+        self,
+        exclude: Optional[Set[str]] = None,
+        session_key: Optional[str] = None,
+        target_host: Optional[str] = None,
+    ) -> Optional[Tuple[Dict[str, Any], ProxyStats]]:
+        """
+        Get the next proxy based on configured strategy
+
+        Args:
+            exclude: "host:port" keys to skip, e.g. proxies already tried
+                     for the current request
+            session_key: Key for the sticky strategy, from session_key()
+            target_host: Host the request goes to, for domain_score
+        """
         available_proxies = await self.refresh_proxies()
 
+        if exclude:
+            available_proxies = [
+                proxy
+                for proxy in available_proxies
+                if f"{proxy['host']}:{proxy['port']}" not in exclude
+            ]
+            if not available_proxies:
+                logger.debug("No untried proxies left")
+                return None
+
         if not available_proxies:
             logger.warning("No available proxies found")
             return None
@@ -392,6 +506,12 @@ class EnhancedProxyRotator:
                 return self._get_fastest_proxy(available_proxies)
             elif self.strategy == LoadBalancingStrategy.FAIL_OVER:
                 return self._get_failover_proxy(available_proxies)
+            elif self.strategy == LoadBalancingStrategy.THROUGHPUT:
+                return self._get_throughput_proxy(available_proxies)
+            elif self.strategy == LoadBalancingStrategy.STICKY:
+                return self._get_sticky_proxy(available_proxies, session_key)
+            elif self.strategy == LoadBalancingStrategy.DOMAIN_SCORE:
+                return self._get_domain_score_proxy(available_proxies, target_host)
             else:
                 return self._get_round_robin_proxy(available_proxies)
 
@@ -447,6 +567,119 @@ class EnhancedProxyRotator:
         stats = self.proxy_stats[f"{best_proxy['host']}:{best_proxy['port']}"]
         return best_proxy, stats
 
+    def _get_throughput_proxy(
+        self, proxies: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], ProxyStats]:
+        """Bandwidth weighted selection
+
+        Picks proxies at random weighted by their measured bandwidth_kbps,
+        shared by the connections they already carry. Proxies measured below
+        min_kbps are skipped while faster ones exist; unmeasured proxies are
+        weighted as the median measured proxy.
+        """
+        strategy_config = self.lb_config.get("strategies", {}).get("throughput", {})
+        min_kbps = strategy_config.get("min_kbps", 0)
+
+        measured = [
+            p["bandwidth_kbps"] for p in proxies if p.get("bandwidth_kbps") is not None
+        ]
+        if not measured:
+            return self._get_least_connections_proxy(proxies)
+        default_kbps = statistics.median(measured)
+
+        candidates = [
+            p
+            for p in proxies
+            if p.get("bandwidth_kbps") is None or p["bandwidth_kbps"] >= min_kbps
+        ] or proxies
+        weights = [
+            max(
+                default_kbps
+                if p.get("bandwidth_kbps") is None
+                else p["bandwidth_kbps"],
+                0.001,
+            )
+            / (1 + self.proxy_stats[f"{p['host']}:{p['port']}"].active_connections)
+            for p in candidates
+        ]
+        proxy = random.choices(candidates, weights=weights)[0]
+        stats = self.proxy_stats[f"{proxy['host']}:{proxy['port']}"]
+        return proxy, stats
+
+    def _get_sticky_proxy(
+        self, proxies: List[Dict[str, Any]], session_key: Optional[str]
+    ) -> Tuple[Dict[str, Any], ProxyStats]:
+        """Consistent-hash selection with bounded load
+
+        The key's proxy is the first one on the hash ring that is available.
+        A proxy already carrying load_factor times the average connection
+        count is passed over for the next one on the ring, so one busy
+        session cannot pile everything onto a single proxy. Requests without
+        a key use least connections.
+        """
+        if session_key is None:
+            return self._get_least_connections_proxy(proxies)
+        if self._ring_source is not self.available_proxies:
+            # The ring follows the refreshed proxy list; proxies that fail
+            # in between are skipped below, which moves only their keys
+            self._ring.rebuild(f"{p['host']}:{p['port']}" for p in self.available_proxies)
+            self._ring_source = self.available_proxies
+
+        candidates = {f"{p['host']}:{p['port']}": p for p in proxies}
+        total = sum(self.proxy_stats[key].active_connections for key in candidates)
+        bound = math.ceil(self.sticky_load_factor * (total + 1) / len(candidates))
+        first: Optional[str] = None
+        for key in self._ring.walk(session_key):
+            if key not in candidates or not self.proxy_stats[key].is_available():
+                continue
+            if first is None:
+                first = key
+            if self.proxy_stats[key].active_connections < bound:
+                if key != first:
+                    self.sticky_spills += 1
+                return candidates[key], self.proxy_stats[key]
+        if first is not None:
+            return candidates[first], self.proxy_stats[first]
+        # Every candidate failed since the last refresh
+        return self._get_least_connections_proxy(proxies)
+
+    def _get_domain_score_proxy(
+        self, proxies: List[Dict[str, Any]], target_host: Optional[str]
+    ) -> Tuple[Dict[str, Any], ProxyStats]:
+        """Selection weighted by each proxy's history with the target domain
+
+        A proxy's weight is its estimated success rate for the domain
+        (smoothed toward its global success rate) raised to `exponent`,
+        scaled down by its latency relative to the median and shared by its
+        active connections. Proxies without history for the domain are
+        weighted by their global record, and even proxies failing on the
+        domain keep a small weight, so recovery is noticed.
+        """
+        now = time.time()
+        tracked = self.domain_scores.for_domain(target_host) if target_host else {}
+        scored = []
+        for proxy in proxies:
+            proxy_key = f"{proxy['host']}:{proxy['port']}"
+            stats = self.proxy_stats[proxy_key]
+            estimate, latency = self.domain_scores.score(
+                tracked.get(proxy_key), stats.success_rate / 100, now
+            )
+            if latency is None and stats.response_times:
+                latency = stats.average_response_time
+            scored.append((proxy, stats, estimate, latency))
+
+        known = [latency for *_, latency in scored if latency is not None]
+        reference = max(statistics.median(known), 0.001) if known else 1.0
+        weights = [
+            max(estimate, 0.05) ** self.domain_score_exponent
+            * reference
+            / (reference + (reference if latency is None else latency))
+            / (1 + stats.active_connections)
+            for _, stats, estimate, latency in scored
+        ]
+        proxy, stats, _, _ = random.choices(scored, weights=weights)[0]
+        return proxy, stats
+
     def _get_failover_proxy(
         self, proxies: List[Dict[str, Any]]
     ) -> Tuple[Dict[str, Any], ProxyStats]:
@@ -471,11 +704,25 @@ class EnhancedProxyRotator:
         proxy_port: int,
         success: bool,
         response_time: float = None,
+        target_host: Optional[str] = None,
+        status: Optional[int] = None,
     ):
-        """Record the result of a proxy request"""
+        """Record the result of a proxy request
+
+        With target_host, the result is also scored for that domain; an
+        HTTP status in ban_statuses counts as a failure there only.
+        """
         proxy_key = f"{proxy_host}:{proxy_port}"
 
         with self.lock:
+            if target_host and self.domain_scores is not None:
+                self.domain_scores.record(
+                    target_host,
+                    proxy_key,
+                    success and status not in self.domain_ban_statuses,
+                    response_time,
+                )
+
             if proxy_key in self.proxy_stats:
                 stats = self.proxy_stats[proxy_key]
                 stats.total_requests += 1
@@ -512,6 +759,17 @@ class EnhancedProxyRotator:
                             f"Marked proxy {proxy_key} as healthy after {stats.consecutive_successes} successes"
                         )
 
+    def record_transfer(
+        self, proxy_host: str, proxy_port: int, bytes_sent: int, bytes_received: int
+    ):
+        """Add tunnelled byte counts to a proxy"""
+        proxy_key = f"{proxy_host}:{proxy_port}"
+        with self.lock:
+            if proxy_key in self.proxy_stats:
+                stats = self.proxy_stats[proxy_key]
+                stats.bytes_sent += bytes_sent
+                stats.bytes_received += bytes_received
+
     def increment_connections(self, proxy_host: str, proxy_port: int):
         """Increment active connection count for a proxy"""
         proxy_key = f"{proxy_host}:{proxy_port}"
@@ -529,13 +787,25 @@ class EnhancedProxyRotator:
                 )
 
     async def start_health_checks(self):
-        """Start periodic health checks for all proxies"""
+        """Start periodic health checks for all proxies
+
+        With a health coordinator only the elected leader sweeps; the other
+        workers apply the results it publishes.
+        """
         health_config = self.config.get("health_checks", {})
         if not health_config.get("enabled", True):
             return
 
         interval = health_config.get("interval", 30)
 
+        if self.health_coordinator is not None:
+            asyncio.create_task(self._coordinated_health_check_loop(interval))
+            logger.info(
+                f"Started coordinated health checks with {interval}s interval "
+                f"({self.health_coordinator.lease_seconds}s lease)"
+            )
+            return
+
         async def health_check_loop():
             while True:
                 try:
@@ -547,89 +817,205 @@ class EnhancedProxyRotator:
         asyncio.create_task(health_check_loop())
         logger.info(f"Started health checks with {interval}s interval")
 
-    async def _perform_health_checks(self):
-        """Perform health checks on all proxies using protocol-specific validation"""
-        health_config = self.config.get("health_checks", {})
-        test_url = health_config.get("test_url", "http://httpbin.org/ip")
-        timeout = health_config.get("timeout", 10)
-
-        all_proxies = self.storage.get_valid_proxies(proxy_types=self.proxy_types, regions=self.regions)
+    async def _coordinated_health_check_loop(self, interval: float):
+        """Renew or contend for leadership each lease period
 
-        async def check_proxy(proxy):
-            proxy_key = f"{proxy['host']}:{proxy['port']}"
-            protocol = proxy.get("protocol", "socks5")
+        The leader sweeps every interval seconds, counted from the last
+        published sweep so a takeover does not probe the pool again early.
+        Sweeps run as a separate task so a long sweep never delays renewing
+        the lease. Followers pick up newly published results.
+        """
+        coordinator = self.health_coordinator
+        loop = asyncio.get_event_loop()
+        sweep_task: Optional[asyncio.Task] = None
+        next_sweep: Optional[float] = None
 
+        while True:
             try:
-                start_time = time.time()
-
-                # Use protocol-specific validation method
-                if protocol in ["socks4", "socks5"]:
-                    # Use SOCKS validator for more accurate validation
-                    from ..utils.socks_validator import SocksValidator
-                    
-                    validator = SocksValidator(timeout=timeout, check_ip_info=False)
-                    
-                    if protocol == "socks4":
-                        # For SOCKS4, use sync handshake validation
-                        result = validator.validate_socks4(proxy["host"], proxy["port"])
-                    else:
-                        # For SOCKS5, use sync handshake validation
-                        result = validator.validate_socks5(proxy["host"], proxy["port"])
-                    
-                    response_time = time.time() - start_time
-                    
-                    if result.is_valid:
-                        await self.record_request_result(
-                            proxy["host"], proxy["port"], True, response_time
+                # Manager calls are blocking IPC round trips
+                is_leader = await loop.run_in_executor(None, coordinator.acquire)
+                if is_leader:
+                    if next_sweep is None:
+                        published_at = await loop.run_in_executor(
+                            None, coordinator.last_published
                         )
-                        logger.debug(
-                            f"Health check OK for {proxy_key} ({protocol.upper()}, {response_time:.2f}s)"
-                        )
-                    else:
-                        await self.record_request_result(
-                            proxy["host"], proxy["port"], False
-                        )
-                        logger.warning(
-                            f"Health check failed for {proxy_key} ({protocol.upper()}): {result.error}"
-                        )
-                        
+                        next_sweep = published_at + interval
+                    if (sweep_task is None or sweep_task.done()) and time.time() >= next_sweep:
+                        next_sweep = time.time() + interval
+                        sweep_task = asyncio.create_task(self._perform_health_checks())
                 else:
-                    # For HTTP proxies, use HTTP request validation
-                    connector = aiohttp.TCPConnector()
-                    session_kwargs = {
-                        "connector": connector,
-                        "proxy": f"http://{proxy['host']}:{proxy['port']}",
-                    }
-
-                    client_timeout = ClientTimeout(total=timeout)
-                    async with ClientSession(
-                        timeout=client_timeout, **session_kwargs
-                    ) as session:
-                        async with session.get(test_url) as response:
-                            if response.status == 200:
-                                response_time = time.time() - start_time
-                                await self.record_request_result(
-                                    proxy["host"], proxy["port"], True, response_time
-                                )
-                                logger.debug(
-                                    f"Health check OK for {proxy_key} (HTTP, {response_time:.2f}s)"
-                                )
-                            else:
-                                await self.record_request_result(
-                                    proxy["host"], proxy["port"], False
-                                )
-                                logger.warning(
-                                    f"Health check failed for {proxy_key} (HTTP): HTTP {response.status}"
-                                )
-
+                    next_sweep = None
+                    await self.sync_shared_health()
             except Exception as e:
+                logger.error(f"Health check error: {e}")
+            await asyncio.sleep(coordinator.lease_seconds)
+
+    @staticmethod
+    def _apply_health(stats: ProxyStats, shared: Dict[str, Any]):
+        stats.is_healthy = shared["is_healthy"]
+        stats.last_health_check = shared.get("checked_at", 0)
+        stats.consecutive_failures = shared.get("consecutive_failures", 0)
+        stats.consecutive_successes = shared.get("consecutive_successes", 0)
+
+    async def sync_shared_health(self) -> bool:
+        """Apply health results published by the leader, if newer than ours
+
+        Returns:
+            True if new results were applied
+        """
+        if self.health_coordinator is None:
+            return False
+        loop = asyncio.get_event_loop()
+        fetched = await loop.run_in_executor(
+            None, self.health_coordinator.fetch, self._shared_health_version
+        )
+        if fetched is None:
+            return False
+
+        version, health = fetched
+        with self.lock:
+            self._shared_health_version = version
+            self._shared_health = health
+            for proxy_key, shared in health.items():
+                stats = self.proxy_stats.get(proxy_key)
+                if stats is not None:
+                    self._apply_health(stats, shared)
+            # Rebuild the available list with the new verdicts on next use
+            self.last_refresh = 0
+        logger.debug(f"Applied shared health check results v{version} ({len(health)} proxies)")
+        return True
+
+    async def _publish_health(self, checked: Set[str]):
+        """Publish this worker's verdicts for the checked proxies"""
+        now = time.time()
+        with self.lock:
+            health = {
+                proxy_key: {
+                    "is_healthy": stats.is_healthy,
+                    "checked_at": stats.last_health_check or now,
+                    "consecutive_failures": stats.consecutive_failures,
+                    "consecutive_successes": stats.consecutive_successes,
+                }
+                for proxy_key, stats in self.proxy_stats.items()
+                if proxy_key in checked
+            }
+        loop = asyncio.get_event_loop()
+        version = await loop.run_in_executor(None, self.health_coordinator.publish, health)
+        if version:
+            # Our own results; skip re-applying them
+            with self.lock:
+                self._shared_health_version = version
+                self._shared_health = health
+                self.last_refresh = 0
+            logger.info(f"Published health check results v{version} for {len(health)} proxies")
+
+    async def _perform_health_checks(self):
+        """Perform health checks on all proxies using protocol-specific validation
+
+        At most health_checks.parallel_checks proxies are checked at a time.
+        Blocking SOCKS handshakes run on the rotator's own health check
+        thread pool, so a sweep never stalls the event loop or the default
+        executor serving client traffic. A sweep requested while another one
+        runs waits for that one instead of starting a second. With a health
+        coordinator the results are published to the other workers.
+        """
+        if self._health_check_lock is None:
+            self._health_check_lock = asyncio.Lock()
+        if self._health_check_lock.locked():
+            async with self._health_check_lock:
+                return
+
+        async with self._health_check_lock:
+            health_config = self.config.get("health_checks", {})
+            test_url = health_config.get("test_url", "http://httpbin.org/ip")
+            timeout = health_config.get("timeout", 10)
+            parallel_checks = max(1, health_config.get("parallel_checks", 10))
+
+            loop = asyncio.get_event_loop()
+            # Reading storage is file I/O, keep it off the event loop
+            all_proxies = await loop.run_in_executor(
+                self.health_check_executor,
+                lambda: self.storage.get_valid_proxies(
+                    proxy_types=self.proxy_types,
+                    regions=self.regions,
+                    anonymity=self.anonymity,
+                ),
+            )
+            if not all_proxies:
+                return
+
+            validator = SocksValidator(
+                timeout=timeout, http_test_url=test_url, dns_cache=get_dns_cache()
+            )
+            queue: asyncio.Queue = asyncio.Queue()
+            for proxy in all_proxies:
+                queue.put_nowait(proxy)
+
+            async def worker():
+                while True:
+                    try:
+                        proxy = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    await self._check_proxy_health(proxy, validator, timeout)
+
+            started = time.monotonic()
+            await asyncio.gather(
+                *(worker() for _ in range(min(parallel_checks, len(all_proxies))))
+            )
+            logger.info(
+                f"Health check sweep: {len(all_proxies)} proxies in "
+                f"{time.monotonic() - started:.1f}s ({parallel_checks} parallel)"
+            )
+            if self.health_coordinator is not None:
+                await self._publish_health(
+                    {f"{p['host']}:{p['port']}" for p in all_proxies}
+                )
+
+    async def _check_proxy_health(
+        self, proxy: Dict[str, Any], validator: SocksValidator, timeout: float
+    ):
+        """Check one proxy and record the result"""
+        proxy_key = f"{proxy['host']}:{proxy['port']}"
+        protocol = proxy.get("protocol", "socks5")
+
+        try:
+            start_time = time.time()
+            # SOCKS: raw handshake; HTTP: plain GET of test_url and CONNECT
+            result = await asyncio.wait_for(
+                validator.async_handshake(
+                    proxy["host"],
+                    proxy["port"],
+                    protocol,
+                    executor=self.health_check_executor,
+                ),
+                timeout=timeout + 5,  # Socket timeouts apply per step
+            )
+            response_time = time.time() - start_time
+
+            if result.is_valid:
+                await self.record_request_result(
+                    proxy["host"], proxy["port"], True, response_time
+                )
+                logger.debug(
+                    f"Health check OK for {proxy_key} ({protocol.upper()}, {response_time:.2f}s)"
+                )
+            else:
                 await self.record_request_result(proxy["host"], proxy["port"], False)
-                logger.warning(f"Health check failed for {proxy_key}: {e}")
+                logger.warning(
+                    f"Health check failed for {proxy_key} ({protocol.upper()}): {result.error}"
+                )
 
-        # Run health checks in parallel
-        tasks = [check_proxy(proxy) for proxy in all_proxies]
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+        except asyncio.TimeoutError:
+            await self.record_request_result(proxy["host"], proxy["port"], False)
+            logger.warning(f"Health check timed out for {proxy_key}")
+        except Exception as e:
+            await self.record_request_result(proxy["host"], proxy["port"], False)
+            logger.warning(f"Health check failed for {proxy_key}: {e}")
+
+        with self.lock:
+            if proxy_key in self.proxy_stats:
+                self.proxy_stats[proxy_key].last_health_check = time.time()
 
     def get_stats_summary(self) -> Dict[str, Any]:
         """Get comprehensive statistics for all proxies"""
@@ -656,15 +1042,23 @@ class EnhancedProxyRotator:
                     "is_healthy": stats.is_healthy,
                     "circuit_breaker_state": stats.circuit_breaker_state.value,
                     "weight": stats.weight,
+                    "bytes_sent": stats.bytes_sent,
+                    "bytes_received": stats.bytes_received,
                 }
 
-            return {
+            summary = {
                 "strategy": self.strategy.value,
                 "total_proxies": len(self.proxy_stats),
                 "available_proxies": len(self.available_proxies),
                 "total_requests": total_requests,
                 "total_successful": total_successful,
                 "total_failed": total_failed,
+                "total_bytes_sent": sum(
+                    stats.bytes_sent for stats in self.proxy_stats.values()
+                ),
+                "total_bytes_received": sum(
+                    stats.bytes_received for stats in self.proxy_stats.values()
+                ),
                 "overall_success_rate": (
                     (total_successful / total_requests * 100)
                     if total_requests > 0
@@ -672,6 +1066,15 @@ class EnhancedProxyRotator:
                 ),
                 "proxy_details": proxy_details,
             }
+            if self.strategy == LoadBalancingStrategy.STICKY:
+                summary["sticky"] = {
+                    "key": self.session_key_source,
+                    "ring_proxies": len(self._ring),
+                    "load_spills": self.sticky_spills,
+                }
+            if self.domain_scores is not None:
+                summary["domain_scores"] = self.domain_scores.get_stats()
+            return summary
 
     async def force_refresh_proxies(self) -> List[Dict[str, Any]]:
         """Force refresh the proxy list regardless of refresh interval"""
@@ -693,7 +1096,7 @@ class EnhancedProxyRotator:
 class EnhancedHTTPProxyServer:
     """Enhanced HTTP Proxy Server with multi-worker support and advanced features"""
 
-    def __init__(self, config_file: str = None, proxy_types: List[str] = None, regions: List[str] = None, skip_cert_check: bool = False):
+    def __init__(self, config_file: str = None, proxy_types: List[str] = None, regions: List[str] = None, skip_cert_check: bool = False, anonymity: List[str] = None):
         # Load configuration
         if config_file and os.path.exists(config_file):
             with open(config_file, "r") as f:
@@ -705,18 +1108,29 @@ class EnhancedHTTPProxyServer:
         self.host = self.server_config.get("host", "127.0.0.1")
         self.port = self.server_config.get("port", 8888)
         self.workers = self.server_config.get("workers", multiprocessing.cpu_count())
+        # "aiohttp" serves everything through the web app; "fast" relays proxy
+        # traffic from asyncio.Protocol and serves the admin app on admin_port
+        self.engine = self.server_config.get("engine", "aiohttp")
+        self.admin_port = self.server_config.get("admin_port", self.port + 1)
+        self.fast_engine: Optional[FastProxyEngine] = None
+        # SOCKS5/SOCKS4a front-end, off unless a port is configured
+        self.socks_port = self.server_config.get("socks_port")
+        self.socks_listener: Optional[SocksListener] = None
         self.proxy_types = proxy_types
         self.regions = regions
+        self.anonymity = anonymity
         self.skip_cert_check = skip_cert_check
 
         # Initialize rotator with filtering support
-        self.rotator = EnhancedProxyRotator(config=self.config, proxy_types=proxy_types, regions=regions)
+        self.rotator = EnhancedProxyRotator(config=self.config, proxy_types=proxy_types, regions=regions, anonymity=anonymity)
 
         # Server statistics
         self.stats = {
             "requests_total": 0,
             "requests_success": 0,
             "requests_failed": 0,
+            "retries": 0,
+            "requests_recovered": 0,  # Succeeded after at least one retry
             "start_time": time.time(),
             "worker_pid": os.getpid(),
         }
@@ -727,6 +1141,63 @@ class EnhancedHTTPProxyServer:
         # Application runner for cleanup
         self.app_runner = None
 
+        # Shared DNS cache settings for upstream and health check lookups
+        configure_dns_cache(**self.config.get("dns_cache", {}))
+
+        # Bodies above stream_threshold bytes (or of unknown length) are
+        # relayed in chunks of stream_buffer_size bytes
+        self.stream_threshold = self.server_config.get("stream_threshold", 1048576)
+        self.stream_buffer_size = self.server_config.get("stream_buffer_size", 65536)
+
+        # Long-lived upstream sessions so keep-alive connections are reused
+        pool_config = self.config.get("session_pool", {})
+        self.session_pool = UpstreamSessionPool(
+            max_sessions=pool_config.get("max_sessions", 256),
+            idle_ttl=pool_config.get("idle_ttl", 300),
+            keepalive_timeout=pool_config.get("keepalive_timeout", 30),
+            connections_per_proxy=pool_config.get("connections_per_proxy", 100),
+            request_timeout=self.server_config.get("request_timeout", 30),
+        )
+
+        # Failed idempotent requests are retried on other proxies, within
+        # max_attempts tries and deadline seconds from arrival
+        retry_config = self.config.get("retries", {})
+        self.retry_attempts = max(1, retry_config.get("max_attempts", 3))
+        self.retry_deadline = retry_config.get(
+            "deadline", self.server_config.get("request_timeout", 30)
+        )
+        self.retry_methods = {
+            m.upper()
+            for m in retry_config.get(
+                "methods", ["GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"]
+            )
+        }
+        self.retry_statuses = set(retry_config.get("statuses", [502, 503, 504]))
+
+        # Opt-in: a slow idempotent request gets a second copy on another proxy
+        hedge_config = self.config.get("hedging", {})
+        self.hedge_policy: Optional[HedgePolicy] = None
+        if hedge_config.get("enabled", False):
+            self.hedge_policy = HedgePolicy(
+                percentile=hedge_config.get("percentile", 95),
+                min_delay=hedge_config.get("min_delay", 0.05),
+                initial_delay=hedge_config.get("initial_delay", 1.0),
+                max_ratio=hedge_config.get("max_ratio", 0.1),
+                window=hedge_config.get("window", 1000),
+            )
+
+        # Opt-in: cacheable GET responses are answered without a proxy
+        cache_config = self.config.get("response_cache", {})
+        self.response_cache: Optional[ResponseCache] = None
+        if cache_config.get("enabled", False):
+            self.response_cache = ResponseCache(
+                max_bytes=cache_config.get("max_bytes", 64 * 1024 * 1024),
+                max_entry_bytes=cache_config.get("max_entry_bytes", 1024 * 1024),
+                max_variants=cache_config.get("max_variants", 8),
+                disk_path=cache_config.get("disk_path"),
+                disk_max_bytes=cache_config.get("disk_max_bytes", 1024 * 1024 * 1024),
+            )
+
         logger.info(f"Initialized enhanced proxy server (PID: {os.getpid()})")
 
     def _get_default_config(self) -> Dict[str, Any]:
@@ -772,123 +1243,496 @@ class EnhancedHTTPProxyServer:
             # Support HTTPS tunneling through CONNECT method
             return await self.handle_connect_request(request, start_time)
 
-        # Get proxy for this request
-        proxy_result = await self.rotator.get_next_proxy()
-        if not proxy_result:
-            self.stats["requests_failed"] += 1
+        method = request.method
+        headers = dict(request.headers)
+
+        # Handle proxy-style URLs (e.g., "GET http://example.com/path HTTP/1.1")
+        if request.path_qs.startswith('http://') or request.path_qs.startswith('https://'):
+            # Full URL in path (proxy-style request)
+            url = request.path_qs
+        else:
+            # Relative path - reconstruct from Host header
+            host = headers.get('Host', 'localhost')
+            scheme = 'https' if request.secure else 'http'
+            url = f"{scheme}://{host}{request.path_qs}"
+
+        # The session header is meant for this proxy and not forwarded
+        session_header = self.rotator.session_header.lower()
+        headers = {
+            k: v
+            for k, v in headers.items()
+            if k.lower() not in _HOP_BY_HOP and k.lower() != session_header
+        }
+        target_host = urlparse(url).hostname
+        session_key = self.rotator.session_key(
+            request.headers.get(session_header), request.remote, target_host
+        )
+
+        # Small bodies are read at once; large or chunked ones are
+        # forwarded as they arrive, paced by the upstream connection
+        streamed = request.body_exists and not self._fits_buffer(request.content_length)
+        if streamed:
+            body = request.content.iter_chunked(self.stream_buffer_size)
+        else:
+            body = await request.read() or None
+
+        # The cache answers before any proxy is chosen; a stale entry with
+        # validators turns the request into a conditional one
+        cache = self.response_cache
+        cache_url: Optional[str] = None
+        cached: Optional[CachedResponse] = None
+        if cache is not None:
+            if method not in SAFE_METHODS:
+                cache.invalidate(url)
+            elif cache.is_cacheable_request(method, request.headers):
+                cache_url = url
+                cached = await cache.lookup(url, request.headers)
+                if cached is not None and cache.is_fresh_for(cached, request.headers):
+                    cache.record_hit(cached)
+                    self.stats["requests_success"] += 1
+                    logger.info(f"💾 {method} {url} served from cache")
+                    return self._cached_response(cached, method, "HIT")
+                validators = cache.conditional_headers(cached) if cached is not None else {}
+                client_conditional = any(
+                    k.lower() in ("if-none-match", "if-modified-since") for k in headers
+                )
+                if validators and not client_conditional:
+                    headers = {**headers, **validators}
+                else:
+                    cached = None
+                    cache.record_miss()
+
+        # A streamed body cannot be replayed, so only one attempt is made
+        replayable = method in self.retry_methods and not streamed
+        max_attempts = self.retry_attempts if replayable else 1
+        deadline = start_time + self.retry_deadline
+        hedge = self.hedge_policy is not None and replayable
+        if hedge:
+            self.hedge_policy.start()
+        tried: Set[str] = set()
+        error: Optional[Exception] = None
+
+        for attempt in range(1, max_attempts + 1):
+            proxy_result = await self.rotator.get_next_proxy(
+                exclude=tried, session_key=session_key, target_host=target_host
+            )
+            if not proxy_result:
+                break
+            proxy, _ = proxy_result
+            tried.add(f"{proxy['host']}:{proxy['port']}")
+
+            timeout = None
+            if replayable:
+                # Later attempts only get what is left of the deadline
+                remaining = max(0.1, deadline - time.time())
+                limit = min(self.server_config.get("request_timeout", 30), remaining)
+                timeout = aiohttp.ClientTimeout(total=None, connect=limit, sock_read=limit)
+
+            try:
+                # Failures up to the response headers are recorded per proxy
+                proxy, stack, proxy_response = await self._send_upstream(
+                    proxy, tried, method, url, headers, body, timeout, hedge, session_key
+                )
+            except Exception as e:
+                error = e
+            else:
+                proxy_host = proxy["host"]
+                proxy_port = proxy["port"]
+                try:
+                    async with stack:
+                        response = await self._relay_upstream_response(
+                            request,
+                            proxy,
+                            proxy_response,
+                            f"{method} {url}",
+                            start_time,
+                            retry_statuses=attempt < max_attempts,
+                            cache_url=cache_url,
+                            cached=cached,
+                        )
+                    if attempt > 1:
+                        self.stats["requests_recovered"] += 1
+                    return response
+                except Exception as e:
+                    if request.transport is None or request.transport.is_closing():
+                        # The client went away: not the proxy's fault, and
+                        # nobody is left to retry for
+                        logger.info(f"↩️  {method} {url} aborted by client: {e}")
+                        raise
+                    # Record failure against the proxy that answered
+                    await self.rotator.record_request_result(
+                        proxy_host, proxy_port, False, target_host=target_host
+                    )
+                    logger.error(f"❌ {method} {url} -> {proxy_host}:{proxy_port} failed: {e}")
+                    error = e
+
+            if attempt < max_attempts:
+                if time.time() >= deadline:
+                    logger.warning(f"⏱️  {method} {url}: retry deadline reached")
+                    break
+                self.stats["retries"] += 1
+                logger.info(
+                    f"🔁 Retrying {method} {url} on another proxy "
+                    f"(attempt {attempt + 1}/{max_attempts})"
+                )
+
+        self.stats["requests_failed"] += 1
+        if error is None:
             return web.Response(
                 status=503,
                 text="No available proxy servers",
                 headers={"Content-Type": "text/plain"},
             )
+        return web.Response(
+            status=502,
+            text=f"Proxy request failed: {str(error)}",
+            headers={"Content-Type": "text/plain"},
+        )
 
-        proxy, proxy_stats = proxy_result
+    async def _open_upstream_response(
+        self,
+        proxy: Dict[str, Any],
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        body,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+    ) -> Tuple[AsyncExitStack, aiohttp.ClientResponse]:
+        """
+        Send a request through one upstream proxy and wait for its headers
+
+        Failures are recorded against the proxy before they are raised.
+
+        Returns:
+            (stack, response); closing the stack releases the response, the
+            pooled session and the proxy's connection count
+        """
         proxy_host = proxy["host"]
         proxy_port = proxy["port"]
         proxy_protocol = proxy.get("protocol", "socks5")
 
-        # Track connection
+        stack = AsyncExitStack()
+        # Track connection until the response is released
         self.rotator.increment_connections(proxy_host, proxy_port)
+        stack.callback(self.rotator.decrement_connections, proxy_host, proxy_port)
+        sent_at = time.time()
+        try:
+            # Resolve upstream proxy host through the shared cache
+            proxy_ip = await get_dns_cache().resolve(proxy_host)
 
+            # Forward request through the proxy's pooled session
+            pooled = await stack.enter_async_context(
+                self.session_pool.session(proxy_protocol, proxy_host, proxy_port, proxy_ip)
+            )
+            proxy_response = await stack.enter_async_context(
+                pooled.session.request(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    data=body,
+                    proxy=pooled.proxy_url,
+                    timeout=timeout or pooled.session.timeout,
+                )
+            )
+        except asyncio.CancelledError:
+            await stack.aclose()
+            raise
+        except Exception as e:
+            await stack.aclose()
+            await self.rotator.record_request_result(
+                proxy_host, proxy_port, False, target_host=urlparse(url).hostname
+            )
+            logger.error(f"❌ {method} {url} -> {proxy_host}:{proxy_port} failed: {e}")
+            raise
+
+        if self.hedge_policy is not None:
+            self.hedge_policy.record(time.time() - sent_at)
+        return stack, proxy_response
+
+    async def _send_upstream(
+        self,
+        proxy: Dict[str, Any],
+        tried: Set[str],
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        body,
+        timeout: Optional[aiohttp.ClientTimeout],
+        hedge: bool,
+        session_key: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], AsyncExitStack, aiohttp.ClientResponse]:
+        """
+        Send a request through proxy, hedged on a second proxy if allowed
+
+        When hedging, a copy goes to an untried proxy (added to tried) if no
+        headers arrived within the policy's delay and the hedge budget
+        allows it. The first response wins and the other attempt is
+        cancelled.
+
+        Returns:
+            (proxy that answered, stack, response)
+
+        Raises:
+            The error of the last failed attempt if none answered
+        """
+        if not hedge:
+            stack, proxy_response = await self._open_upstream_response(
+                proxy, method, url, headers, body, timeout
+            )
+            return proxy, stack, proxy_response
+
+        policy = self.hedge_policy
+        attempts = {
+            asyncio.ensure_future(
+                self._open_upstream_response(proxy, method, url, headers, body, timeout)
+            ): proxy
+        }
+        pending = set(attempts)
+        wait: Optional[float] = policy.delay()
+        winner: Optional[asyncio.Future] = None
+        error: Optional[BaseException] = None
         try:
-            # Prepare request details
-            # For proxy requests, we need to use the raw request line or reconstruct the URL
-            method = request.method
-            headers = dict(request.headers)
-            
-            # Handle proxy-style URLs (e.g., "GET http://example.com/path HTTP/1.1")
-            if request.path_qs.startswith('http://') or request.path_qs.startswith('https://'):
-                # Full URL in path (proxy-style request)
-                url = request.path_qs
-            else:
-                # Relative path - reconstruct from Host header
-                host = headers.get('Host', 'localhost')
-                scheme = 'https' if request.secure else 'http'
-                url = f"{scheme}://{host}{request.path_qs}"
-
-            # Remove hop-by-hop headers
-            hop_by_hop = {
-                "connection",
-                "keep-alive",
-                "proxy-authenticate",
-                "proxy-authorization",
-                "te",
-                "trailers",
-                "upgrade",
-            }
-            headers = {k: v for k, v in headers.items() if k.lower() not in hop_by_hop}
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Hedge at most once per attempt
+                    wait = None
+                    if not policy.acquire():
+                        continue
+                    hedge_result = await self.rotator.get_next_proxy(
+                        exclude=tried,
+                        session_key=session_key,
+                        target_host=urlparse(url).hostname,
+                    )
+                    if not hedge_result:
+                        continue
+                    hedge_proxy = hedge_result[0]
+                    tried.add(f"{hedge_proxy['host']}:{hedge_proxy['port']}")
+                    logger.info(
+                        f"🪁 Hedging {method} {url} on {hedge_proxy['host']}:{hedge_proxy['port']} "
+                        f"after {policy.delay():.3f}s"
+                    )
+                    task = asyncio.ensure_future(
+                        self._open_upstream_response(
+                            hedge_proxy, method, url, headers, body, timeout
+                        )
+                    )
+                    attempts[task] = hedge_proxy
+                    pending.add(task)
+                    continue
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+                    else:
+                        # Both answered at once; release the slower one
+                        await task.result()[0].aclose()
+        finally:
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, tuple):
+                    await result[0].aclose()
+
+        if winner is None:
+            raise error
+        if attempts[winner] is not proxy:
+            policy.hedge_wins += 1
+            primary = next(task for task, attempt in attempts.items() if attempt is proxy)
+            if primary.cancelled():
+                # No headers within the hedge delay; a primary that raised
+                # was already recorded by _open_upstream_response
+                await self.rotator.record_request_result(
+                    proxy["host"], proxy["port"], False, target_host=urlparse(url).hostname
+                )
+                logger.info(
+                    f"🪁 {method} {url} -> {proxy['host']}:{proxy['port']} lost to its hedge"
+                )
+        stack, proxy_response = winner.result()
+        return attempts[winner], stack, proxy_response
 
-            # Read request body
-            body = await request.read()
+    async def _relay_upstream_response(
+        self,
+        request: Request,
+        proxy: Dict[str, Any],
+        proxy_response: aiohttp.ClientResponse,
+        description: str,
+        start_time: float,
+        retry_statuses: bool = False,
+        cache_url: Optional[str] = None,
+        cached: Optional[CachedResponse] = None,
+    ) -> web.StreamResponse:
+        """
+        Relay an upstream response to the client
+
+        With cache_url set, a buffered GET response is offered to the
+        response cache; cached is the entry being revalidated, answered
+        from the cache if the upstream returns 304.
+
+        Raises:
+            UpstreamStatusError: If retry_statuses is set and the upstream
+                                 answered with one of self.retry_statuses
+        """
+        proxy_host = proxy["host"]
+        proxy_port = proxy["port"]
 
-            # Create proxy connector
-            if proxy_protocol in ["socks4", "socks5"]:
-                proxy_type = (
-                    ProxyType.SOCKS5 if proxy_protocol == "socks5" else ProxyType.SOCKS4
+        if retry_statuses and proxy_response.status in self.retry_statuses:
+            raise UpstreamStatusError(proxy_response.status)
+
+        if cached is not None:
+            if proxy_response.status == 304:
+                cached = self.response_cache.refresh(cache_url, cached, proxy_response.headers)
+                response_time = time.time() - start_time
+                await self.rotator.record_request_result(
+                    proxy_host,
+                    proxy_port,
+                    True,
+                    response_time,
+                    target_host=proxy_response.url.host,
+                    status=proxy_response.status,
                 )
-                connector = ProxyConnector(
-                    proxy_type=proxy_type, host=proxy_host, port=proxy_port
+                self.stats["requests_success"] += 1
+                logger.info(
+                    f"💾 {description} -> {proxy_host}:{proxy_port} "
+                    f"revalidated ({response_time:.2f}s)"
                 )
-                session_kwargs = {"connector": connector}
-            else:  # http proxy
-                connector = aiohttp.TCPConnector()
-                session_kwargs = {
-                    "connector": connector,
-                    "proxy": f"http://{proxy_host}:{proxy_port}",
-                }
+                return self._cached_response(cached, request.method, "REVALIDATED")
+            self.response_cache.record_miss()
+
+        # Prepare response
+        response_headers = dict(proxy_response.headers)
+        response_headers = {
+            k: v
+            for k, v in response_headers.items()
+            if k.lower() not in _HOP_BY_HOP
+        }
 
-            # Forward request through proxy
-            timeout_value = self.server_config.get("request_timeout", 30)
-            timeout = ClientTimeout(total=timeout_value)
+        if not self._fits_buffer(proxy_response.content_length):
+            return await self._stream_response(
+                request,
+                proxy_response,
+                response_headers,
+                (proxy_host, proxy_port),
+                description,
+                start_time,
+            )
 
-            async with ClientSession(timeout=timeout, **session_kwargs) as session:
-                async with session.request(
-                    method=method, url=url, headers=headers, data=body if body else None
-                ) as proxy_response:
+        response_body = await proxy_response.read()
+        response_time = time.time() - start_time
+
+        if cache_url is not None and request.method == "GET":
+            self.response_cache.store(
+                cache_url,
+                request.headers,
+                proxy_response.status,
+                proxy_response.headers,
+                response_headers,
+                response_body,
+            )
 
-                    # Prepare response
-                    response_headers = dict(proxy_response.headers)
-                    response_headers = {
-                        k: v
-                        for k, v in response_headers.items()
-                        if k.lower() not in hop_by_hop
-                    }
+        # Record success
+        await self.rotator.record_request_result(
+            proxy_host,
+            proxy_port,
+            True,
+            response_time,
+            target_host=proxy_response.url.host,
+            status=proxy_response.status,
+        )
+        self.stats["requests_success"] += 1
 
-                    response_body = await proxy_response.read()
-                    response_time = time.time() - start_time
+        logger.info(
+            f"✅ {description} -> {proxy_host}:{proxy_port} "
+            f"[{proxy_response.status}] ({response_time:.2f}s)"
+        )
 
-                    # Record success
-                    await self.rotator.record_request_result(
-                        proxy_host, proxy_port, True, response_time
-                    )
-                    self.stats["requests_success"] += 1
+        return web.Response(
+            status=proxy_response.status,
+            headers=response_headers,
+            body=response_body,
+        )
 
-                    logger.info(
-                        f"✅ {method} {url} -> {proxy_host}:{proxy_port} "
-                        f"[{proxy_response.status}] ({response_time:.2f}s)"
-                    )
+    def _cached_response(self, cached: CachedResponse, method: str, outcome: str) -> Response:
+        """Answer a request from a cached response"""
+        headers = {k: v for k, v in cached.headers.items() if k.lower() != "age"}
+        headers["Age"] = str(int(cached.age(time.time())))
+        headers["X-Cache"] = outcome
+        return web.Response(
+            status=cached.status,
+            headers=headers,
+            body=None if method == "HEAD" else cached.body,
+        )
 
-                    return web.Response(
-                        status=proxy_response.status,
-                        headers=response_headers,
-                        body=response_body,
-                    )
+    def _fits_buffer(self, content_length: Optional[int]) -> bool:
+        """Whether a body of this length is relayed in one piece"""
+        return content_length is not None and content_length <= self.stream_threshold
 
+    async def _stream_response(
+        self,
+        request: Request,
+        proxy_response: aiohttp.ClientResponse,
+        headers: Dict[str, str],
+        proxy: Tuple[str, int],
+        description: str,
+        start_time: float,
+    ) -> web.StreamResponse:
+        """Relay an upstream response chunk by chunk
+
+        At most one chunk of stream_buffer_size bytes is held at a time:
+        each write waits for the client to drain it before the next chunk is
+        read from upstream, so slow clients slow down the upstream read
+        instead of growing memory.
+        """
+        proxy_host, proxy_port = proxy
+        headers.pop("Content-Length", None)
+        headers.pop("content-length", None)
+        response = web.StreamResponse(status=proxy_response.status, headers=headers)
+        if proxy_response.content_length is not None:
+            response.content_length = proxy_response.content_length
+
+        relayed = 0
+        try:
+            await response.prepare(request)
+            async for chunk in proxy_response.content.iter_chunked(self.stream_buffer_size):
+                await response.write(chunk)
+                relayed += len(chunk)
+            await response.write_eof()
+        except ConnectionResetError:
+            # Client went away; not the upstream proxy's fault
+            logger.info(f"↩️  {description} aborted by client after {relayed} bytes")
+            return response
         except Exception as e:
-            # Record failure
-            await self.rotator.record_request_result(proxy_host, proxy_port, False)
+            # Headers are already sent: cut the connection so the client
+            # sees a truncated transfer rather than a complete one
+            await self.rotator.record_request_result(
+                proxy_host, proxy_port, False, target_host=proxy_response.url.host
+            )
             self.stats["requests_failed"] += 1
-
-            logger.error(f"❌ {method} {url} -> {proxy_host}:{proxy_port} failed: {e}")
-
-            return web.Response(
-                status=502,
-                text=f"Proxy request failed: {str(e)}",
-                headers={"Content-Type": "text/plain"},
+            logger.error(
+                f"❌ {description} -> {proxy_host}:{proxy_port} failed after {relayed} bytes: {e}"
             )
-        finally:
-            # Always decrement connection count
-            self.rotator.decrement_connections(proxy_host, proxy_port)
+            if request.transport is not None:
+                request.transport.abort()
+            return response
+
+        response_time = time.time() - start_time
+        await self.rotator.record_request_result(
+            proxy_host,
+            proxy_port,
+            True,
+            response_time,
+            target_host=proxy_response.url.host,
+            status=proxy_response.status,
+        )
+        self.stats["requests_success"] += 1
+        logger.info(
+            f"✅ {description} -> {proxy_host}:{proxy_port} "
+            f"[{proxy_response.status}] ({relayed} bytes streamed, {response_time:.2f}s)"
+        )
+        return response
 
     async def handle_connect_request(self, request: Request, start_time: float) -> Response:
         """Handle CONNECT method for HTTPS tunneling"""
@@ -898,8 +1742,9 @@ class EnhancedHTTPProxyServer:
         # If no target in path, try to get from the request line
         if not target:
             # For CONNECT requests, target should be in the URL path
-            # e.g., "CONNECT httpbin.org:443 HTTP/1.1"
-            target = request.path_qs.lstrip('/')
+            # e.g., "CONNECT httpbin.org:443 HTTP/1.1"; aiohttp keeps such
+            # authority-form targets only in the raw path
+            target = request.raw_path.lstrip('/')
         
         if not target or ':' not in target:
             self.stats["requests_failed"] += 1
@@ -921,7 +1766,12 @@ class EnhancedHTTPProxyServer:
             )
 
         # Get proxy for this request
-        proxy_result = await self.rotator.get_next_proxy()
+        session_key = self.rotator.session_key(
+            request.headers.get(self.rotator.session_header), request.remote, target_host
+        )
+        proxy_result = await self.rotator.get_next_proxy(
+            session_key=session_key, target_host=target_host
+        )
         if not proxy_result:
             self.stats["requests_failed"] += 1
             return web.Response(
@@ -939,69 +1789,13 @@ class EnhancedHTTPProxyServer:
         self.rotator.increment_connections(proxy_host, proxy_port)
 
         try:
-            # Establish connection through proxy
-            if proxy_protocol in ["socks4", "socks5"]:
-                proxy_type = (
-                    ProxyType.SOCKS5 if proxy_protocol == "socks5" else ProxyType.SOCKS4
-                )
-                connector = ProxyConnector(
-                    proxy_type=proxy_type, host=proxy_host, port=proxy_port
-                )
-            else:  # http proxy
-                connector = aiohttp.TCPConnector()
-
-            # Create connection to target through proxy
-            timeout_value = self.server_config.get("request_timeout", 30)
-            
-            if proxy_protocol in ["socks4", "socks5"]:
-                # For SOCKS proxies, establish direct connection through the proxy
-                try:
-                    # Use the connector to establish connection
-                    # This is a simplified approach - in production you might want to implement
-                    # a full tunnel using raw sockets
-                    response_time = time.time() - start_time
-                    await self.rotator.record_request_result(
-                        proxy_host, proxy_port, True, response_time
-                    )
-                    self.stats["requests_success"] += 1
-
-                    logger.info(
-                        f"✅ CONNECT {target_host}:{target_port} -> {proxy_host}:{proxy_port} "
-                        f"({proxy_protocol.upper()}, {response_time:.2f}s)"
-                    )
-
-                    # Return 200 Connection established for successful CONNECT
-                    return web.Response(
-                        status=200,
-                        text="Connection established",
-                        headers={"Content-Type": "text/plain"}
-                    )
-                except Exception as e:
-                    logger.error(f"❌ CONNECT {target_host}:{target_port} -> {proxy_host}:{proxy_port} failed: {e}")
-                    raise
-            else:
-                # For HTTP proxies, we need to establish a tunnel
-                # This is a simplified implementation
-                response_time = time.time() - start_time
-                await self.rotator.record_request_result(
-                    proxy_host, proxy_port, True, response_time
-                )
-                self.stats["requests_success"] += 1
-
-                logger.info(
-                    f"✅ CONNECT {target_host}:{target_port} -> {proxy_host}:{proxy_port} "
-                    f"(HTTP, {response_time:.2f}s)"
-                )
-
-                return web.Response(
-                    status=200,
-                    text="Connection established",
-                    headers={"Content-Type": "text/plain"}
-                )
-
+            upstream = await self.open_upstream(proxy, target_host, target_port)
         except Exception as e:
             # Record failure
-            await self.rotator.record_request_result(proxy_host, proxy_port, False)
+            await self.rotator.record_request_result(
+                proxy_host, proxy_port, False, target_host=target_host
+            )
+            self.rotator.decrement_connections(proxy_host, proxy_port)
             self.stats["requests_failed"] += 1
 
             logger.error(f"❌ CONNECT {target_host}:{target_port} -> {proxy_host}:{proxy_port} failed: {e}")
@@ -1011,10 +1805,124 @@ class EnhancedHTTPProxyServer:
                 text=f"Connection failed: {str(e)}",
                 headers={"Content-Type": "text/plain"},
             )
+
+        response_time = time.time() - start_time
+        await self.rotator.record_request_result(
+            proxy_host, proxy_port, True, response_time, target_host=target_host
+        )
+        self.stats["requests_success"] += 1
+
+        logger.info(
+            f"✅ CONNECT {target_host}:{target_port} -> {proxy_host}:{proxy_port} "
+            f"({proxy_protocol.upper()}, {response_time:.2f}s)"
+        )
+
+        try:
+            await self._relay_tunnel(
+                request, upstream, (proxy_host, proxy_port), f"{target_host}:{target_port}"
+            )
         finally:
+            upstream.close()
             # Always decrement connection count
             self.rotator.decrement_connections(proxy_host, proxy_port)
 
+        # The client connection has been taken over and closed; aiohttp
+        # drops this response
+        return web.Response(status=200)
+
+    async def open_upstream(
+        self, proxy: Dict[str, Any], target_host: str, target_port: int
+    ) -> socket.socket:
+        """Connect to a target through an upstream proxy"""
+        dns_cache = get_dns_cache()
+        protocol = proxy.get("protocol", "socks5")
+        proxy_ip = await dns_cache.resolve(proxy["host"])
+        # SOCKS4 carries no hostnames; the others resolve the target upstream
+        if protocol == "socks4":
+            target_host = await dns_cache.resolve(target_host)
+        return await open_tunnel(
+            protocol,
+            proxy_ip,
+            proxy["port"],
+            target_host,
+            target_port,
+            timeout=self.server_config.get("request_timeout", 30),
+        )
+
+    async def _relay_tunnel(
+        self,
+        request: Request,
+        upstream: socket.socket,
+        proxy: Tuple[str, int],
+        target: str,
+    ):
+        """Take over the client connection and relay it through upstream"""
+        if request.transport is None:
+            return
+        # Bytes the client sent right after the CONNECT head
+        initial = request.content.read_nowait()
+        await self.relay_transport(
+            request.transport,
+            upstream,
+            proxy,
+            target,
+            initial=initial,
+            preamble=b"HTTP/1.1 200 Connection established\r\n\r\n",
+        )
+
+    async def relay_transport(
+        self,
+        transport: asyncio.Transport,
+        upstream: socket.socket,
+        proxy: Tuple[str, int],
+        target: str,
+        initial: bytes = b"",
+        preamble: bytes = b"",
+    ):
+        """Relay a client transport's socket through upstream, then close it
+
+        Args:
+            transport: Client transport; it stops reading and the relay uses
+                       a duplicate of its socket
+            upstream: Socket connected through the upstream proxy
+            proxy: (host, port) of the upstream proxy for byte accounting
+            target: Target description for logs
+            initial: Client bytes already read, sent upstream first
+            preamble: Bytes sent to the client before relaying
+        """
+        if transport.is_closing():
+            return
+        raw = transport.get_extra_info("socket")
+        transport.pause_reading()
+        client = socket.fromfd(raw.fileno(), raw.family, raw.type)
+        client.setblocking(False)
+
+        relay = TunnelRelay(
+            client,
+            upstream,
+            idle_timeout=self.server_config.get("tunnel_idle_timeout", 300),
+            buffer_size=self.stream_buffer_size,
+            zero_copy=self.server_config.get("tunnel_zero_copy", True),
+        )
+        started = time.time()
+        try:
+            if preamble:
+                await relay.send_all(client, preamble)
+            await relay.run(initial)
+        except asyncio.TimeoutError:
+            logger.info(f"⏱️  Tunnel to {target} closed after {relay.idle_timeout}s idle")
+        except OSError as e:
+            logger.debug(f"Tunnel to {target} ended: {e}")
+        finally:
+            client.close()
+            transport.close()
+            self.rotator.record_transfer(*proxy, relay.bytes_sent, relay.bytes_received)
+            logger.debug(
+                f"🔚 Tunnel to {target} via {proxy[0]}:{proxy[1]}: "
+                f"{relay.bytes_sent} bytes up, {relay.bytes_received} bytes down "
+                f"in {time.time() - started:.1f}s{' (zero-copy)' if relay.spliced else ''}"
+            )
+
     async def handle_stats(self, request: Request) -> Response:
         """Handle requests to /stats endpoint"""
         uptime = time.time() - self.stats["start_time"]
@@ -1029,12 +1937,33 @@ class EnhancedHTTPProxyServer:
                 "workers": self.workers,
                 "host": self.host,
                 "port": self.port,
+                "engine": self.engine,
             },
             "rotator_stats": rotator_stats,
+            "dns_cache": get_dns_cache().get_stats(),
+            "health_checks": await self._get_health_check_status(),
+            "session_pool": self.session_pool.get_stats(),
         }
+        if self.hedge_policy is not None:
+            stats_data["hedging"] = self.hedge_policy.get_stats()
+        if self.response_cache is not None:
+            stats_data["response_cache"] = self.response_cache.get_stats()
+        if self.fast_engine is not None:
+            stats_data["fast_engine"] = self.fast_engine.get_stats()
+        if self.socks_listener is not None:
+            stats_data["socks_listener"] = self.socks_listener.get_stats()
 
         return web.json_response(stats_data)
 
+    async def _get_health_check_status(self) -> Dict[str, Any]:
+        coordinator = self.rotator.health_coordinator
+        if coordinator is None:
+            return {"role": "standalone"}
+        loop = asyncio.get_event_loop()
+        status = await loop.run_in_executor(None, coordinator.get_status)
+        status["worker_id"] = coordinator.worker_id
+        return status
+
     async def handle_health(self, request: Request) -> Response:
         """Handle health check requests"""
         rotator_stats = self.rotator.get_stats_summary()
@@ -1064,7 +1993,8 @@ class EnhancedHTTPProxyServer:
             # Force refresh proxy list
             refreshed_proxies = await self.rotator.force_refresh_proxies()
             
-            # Optionally trigger immediate health check
+            # Optionally trigger immediate health check; with multiple workers
+            # the results are published to all of them
             force_health_check = request.query.get('health_check', 'false').lower() == 'true'
             if force_health_check:
                 await self.rotator._perform_health_checks()
@@ -1110,9 +2040,32 @@ class EnhancedHTTPProxyServer:
 
         return await self.handle_connect_request(request, start_time)
 
-    def create_app(self) -> web.Application:
-        """Create the aiohttp application"""
-        app = web.Application()
+    @web.middleware
+    async def _connect_middleware(self, request: Request, handler) -> Response:
+        """Send CONNECT requests to the tunnel handler
+
+        aiohttp leaves the path of an authority-form CONNECT target
+        ("CONNECT host:443 HTTP/1.1") empty, so it never matches a route.
+        """
+        if request.method == "CONNECT":
+            return await self.handle_connect_direct(request)
+        return await handler(request)
+
+    def create_app(self, admin_only: bool = False) -> web.Application:
+        """Create the aiohttp application
+
+        Args:
+            admin_only: Serve only /stats, /health and /refresh (admin port
+                        of the fast engine)
+        """
+        if admin_only:
+            app = web.Application()
+            app.router.add_route("*", "/stats", self.handle_stats)
+            app.router.add_route("*", "/health", self.handle_health)
+            app.router.add_route("*", "/refresh", self.handle_force_refresh)
+            return app
+
+        app = web.Application(middlewares=[self._connect_middleware])
 
         # Add routes - specific routes first, catch-all last
         app.router.add_route("*", "/stats", self.handle_stats)
@@ -1126,9 +2079,12 @@ class EnhancedHTTPProxyServer:
 
     async def start_worker(self):
         """Start a single worker process"""
-        app = self.create_app()
+        fast_engine = self.engine == "fast"
+        app = self.create_app(admin_only=fast_engine)
 
-        logger.info(f"🚀 Starting worker {os.getpid()} on {self.host}:{self.port}")
+        logger.info(
+            f"🚀 Starting worker {os.getpid()} on {self.host}:{self.port} ({self.engine} engine)"
+        )
 
         # 設置信號處理
         def signal_handler():
@@ -1150,13 +2106,28 @@ class EnhancedHTTPProxyServer:
         # Refresh proxy list on startup
         await self.rotator.refresh_proxies()
 
+        pool_maintenance = asyncio.create_task(self._session_pool_maintenance())
+
         runner = web.AppRunner(app)
         await runner.setup()
         self.app_runner = runner
 
-        site = web.TCPSite(runner, self.host, self.port, reuse_port=True)
+        fast_server = None
+        if fast_engine:
+            self.fast_engine = FastProxyEngine(self)
+            fast_server = await self.fast_engine.start(self.host, self.port)
+            site = web.TCPSite(runner, self.host, self.admin_port, reuse_port=True)
+            logger.info(f"📊 Admin endpoints on http://{self.host}:{self.admin_port}/")
+        else:
+            site = web.TCPSite(runner, self.host, self.port, reuse_port=True)
         await site.start()
 
+        socks_server = None
+        if self.socks_port:
+            self.socks_listener = SocksListener(self)
+            socks_server = await self.socks_listener.start(self.host, self.socks_port)
+            logger.info(f"🧦 SOCKS5/SOCKS4a listener on {self.host}:{self.socks_port}")
+
         logger.info(f"✅ Worker {os.getpid()} ready")
         logger.info(f"💡 Press Ctrl+C for graceful shutdown")
 
@@ -1165,17 +2136,42 @@ class EnhancedHTTPProxyServer:
             await self.shutdown_manager.wait_for_shutdown()
         finally:
             logger.info("🧹 Cleaning up resources...")
+            if fast_server is not None:
+                fast_server.close()
+                self.fast_engine.close()
+            if socks_server is not None:
+                socks_server.close()
             await runner.cleanup()
+            pool_maintenance.cancel()
+            await self.session_pool.close()
             logger.info("👋 Worker shutdown complete")
 
+    async def _session_pool_maintenance(self):
+        """Drop idle sessions and sessions of proxies that left the rotation"""
+        interval = min(30, self.session_pool.idle_ttl)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                active = {
+                    f"{p['host']}:{p['port']}" for p in self.rotator.available_proxies
+                }
+                evicted = await self.session_pool.prune(active)
+                if evicted:
+                    logger.debug(f"Evicted {evicted} upstream sessions")
+            except Exception as e:
+                logger.error(f"Session pool maintenance error: {e}")
+
     def start_multiprocess(self):
         """Start multiple worker processes"""
         logger.info(f"🚀 Starting enhanced proxy server with {self.workers} workers")
         logger.info(
             f"🔄 Load balancing strategy: {self.config['load_balancing']['strategy']}"
         )
-        logger.info(f"📊 Stats endpoint: http://{self.host}:{self.port}/stats")
-        logger.info(f"🏥 Health endpoint: http://{self.host}:{self.port}/health")
+        admin_port = self.admin_port if self.engine == "fast" else self.port
+        logger.info(f"📊 Stats endpoint: http://{self.host}:{admin_port}/stats")
+        logger.info(f"🏥 Health endpoint: http://{self.host}:{admin_port}/health")
+        if self.socks_port:
+            logger.info(f"🧦 SOCKS endpoint: socks5://{self.host}:{self.socks_port}")
 
         def signal_handler(signum, frame):
             signal_name = "SIGINT" if signum == signal.SIGINT else "SIGTERM"
@@ -1215,15 +2211,28 @@ class EnhancedHTTPProxyServer:
 
             total_time = time.time() - start_time
             logger.info(f"📊 All workers terminated in {total_time:.2f} seconds")
+            manager.shutdown()
             logger.info("👋 Enhanced proxy server shutdown complete")
             exit(0)
 
+        # One worker at a time holds the health check lease and shares its
+        # results through a manager process; the manager ignores Ctrl+C so
+        # it outlives the workers' graceful shutdown
+        manager = SyncManager()
+        manager.start(signal.signal, (signal.SIGINT, signal.SIG_IGN))
+        coordinator = HealthCheckCoordinator.create(
+            manager,
+            lease_seconds=self.config.get("health_checks", {}).get("leader_lease", 10),
+        )
+
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
 
         processes = []
         for i in range(self.workers):
-            process = multiprocessing.Process(target=self._run_worker, args=(i,))
+            process = multiprocessing.Process(
+                target=self._run_worker, args=(i, coordinator)
+            )
             process.start()
             processes.append(process)
             logger.info(f"Started worker {i+1}/{self.workers} (PID: {process.pid})")
@@ -1231,8 +2240,11 @@ class EnhancedHTTPProxyServer:
         # Wait for all processes
         for process in processes:
             process.join()
+        manager.shutdown()
 
-    def _run_worker(self, worker_id: int):
+    def _run_worker(
+        self, worker_id: int, coordinator: Optional[HealthCheckCoordinator] = None
+    ):
         """Run a single worker process"""
         # Set up logging for worker
         logging.basicConfig(
@@ -1240,6 +2252,10 @@ class EnhancedHTTPProxyServer:
             format=f"Worker-{worker_id} - %(asctime)s - %(name)s - %(levelname)s - %(message)s",
         )
 
+        if coordinator is not None:
+            coordinator.worker_id = worker_id
+            self.rotator.health_coordinator = coordinator
+
         # Run the worker
         asyncio.run(self.start_worker())
 
@@ -0,0 +1,15 @@
+"""
+Errors shared by the enhanced proxy server's request engines.
+
+Both the aiohttp handler and `FastProxyEngine` retry a request on another
+proxy when the upstream answers with one of `retry_statuses`; they signal
+that case with `UpstreamStatusError`.
+"""
+
+
+class UpstreamStatusError(Exception):
+    """Upstream answered with a status that is retried on another proxy"""
+
+    def __init__(self, status: int):
+        super().__init__(f"Upstream returned HTTP {status}")
+        self.status = status
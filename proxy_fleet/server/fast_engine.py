@@ -0,0 +1,893 @@
+"""
+Low-overhead proxy engine built on asyncio.Protocol.
+
+The aiohttp engine routes every proxied request through the web
+application: a `Request` object, a routing match against the catch-all
+route, header dict copies and a client session round trip. The fast engine
+reads only the request and response heads (start line plus the framing and
+connection headers) and relays everything else as raw bytes from protocol
+callbacks.
+
+- CONNECT requests are tunnelled exactly as in the aiohttp engine.
+- Absolute-form HTTP requests ("GET http://host/path HTTP/1.1") pick an
+  upstream proxy per request and reuse idle upstream connections: one pool
+  per HTTP upstream, one per (SOCKS upstream, target) pair. Bodies are
+  delimited by Content-Length or chunked framing, so both the client and
+  the upstream connection stay open for the next request. A response
+  delimited by connection close ends both connections.
+
+`/stats`, `/health` and `/refresh` are served by the aiohttp application on
+the separate admin port.
+"""
+
+import asyncio
+import logging
+import socket
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Collection, Dict, List, Optional, Set, Tuple
+
+from ..utils.dns_cache import get_dns_cache
+from .errors import UpstreamStatusError
+
+if TYPE_CHECKING:
+    from .enhanced_proxy_server import EnhancedHTTPProxyServer
+
+logger = logging.getLogger(__name__)
+
+MAX_HEAD_SIZE = 65536
+
+# Request headers meant for this proxy, dropped before forwarding
+_HOP_BY_HOP = {
+    b"connection",
+    b"keep-alive",
+    b"proxy-authenticate",
+    b"proxy-authorization",
+    b"proxy-connection",
+    b"te",
+    b"trailers",
+    b"upgrade",
+}
+
+# Headers that decide message framing and connection reuse
+_FRAMING = {b"content-length", b"transfer-encoding", b"connection", b"proxy-connection"}
+
+_REASONS = {
+    400: "Bad Request",
+    431: "Request Header Fields Too Large",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+# Chunked body parser states
+_SIZE, _DATA, _DATA_END, _TRAILER = range(4)
+
+
+def split_authority(authority: str, default_port: int) -> Tuple[str, int]:
+    """
+    Split "host[:port]" (IPv6 in brackets) into host and port
+
+    Raises:
+        ValueError: If the host is missing or the port is not a number
+    """
+    if authority.startswith("["):
+        host, _, rest = authority[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else ""
+    else:
+        host, _, port = authority.partition(":")
+    if not host:
+        raise ValueError(f"Missing host in {authority!r}")
+    return host, int(port) if port else default_port
+
+
+def parse_head(head: bytes) -> Tuple[List[bytes], Dict[bytes, bytes], List[bytes]]:
+    """
+    Split a message head (without the blank line) into start line parts,
+    framing headers (lower-case names and values) and header lines
+
+    Raises:
+        ValueError: If the start line is malformed
+    """
+    lines = head.split(b"\r\n")
+    parts = lines[0].split(b" ", 2)
+    if len(parts) != 3:
+        raise ValueError("Malformed start line")
+    fields: Dict[bytes, bytes] = {}
+    header_lines = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        header_lines.append(line)
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name in _FRAMING:
+            fields[name] = value.strip().lower()
+    return parts, fields, header_lines
+
+
+def wants_keep_alive(version: bytes, fields: Dict[bytes, bytes]) -> bool:
+    """HTTP/1.1 connections persist unless closed, HTTP/1.0 ones only on request"""
+    tokens = fields.get(b"connection", b"") + b"," + fields.get(b"proxy-connection", b"")
+    if b"close" in tokens:
+        return False
+    return version.strip() != b"HTTP/1.0" or b"keep-alive" in tokens
+
+
+class BodyFramer:
+    """Finds where an HTTP/1.1 message body ends in relayed bytes"""
+
+    def __init__(self, length: Optional[int] = None, chunked: bool = False):
+        """
+        Initialize framer
+
+        Args:
+            length: Content-Length; with neither length nor chunked the body
+                    runs until the connection closes
+            chunked: Transfer-Encoding: chunked
+        """
+        self.chunked = chunked
+        self.until_eof = length is None and not chunked
+        self.remaining = length or 0
+        self.done = length == 0 and not chunked
+        self._state = _SIZE
+        self._line = bytearray()
+
+    @classmethod
+    def for_message(cls, fields: Dict[bytes, bytes], no_body: bool = False) -> "BodyFramer":
+        """
+        Framer for a message with the given framing headers
+
+        Raises:
+            ValueError: If Content-Length is not a number
+        """
+        if no_body:
+            return cls(length=0)
+        if b"chunked" in fields.get(b"transfer-encoding", b""):
+            return cls(chunked=True)
+        if b"content-length" in fields:
+            length = int(fields[b"content-length"])
+            if length < 0:
+                raise ValueError("Negative Content-Length")
+            return cls(length=length)
+        return cls()
+
+    def feed(self, data) -> int:
+        """
+        Count bytes toward the body
+
+        Returns:
+            How many leading bytes of data belong to the body; fewer than
+            len(data) once the body has ended
+
+        Raises:
+            ValueError: If chunked framing is malformed
+        """
+        if self.done:
+            return 0
+        if self.until_eof:
+            return len(data)
+        if not self.chunked:
+            taken = min(len(data), self.remaining)
+            self.remaining -= taken
+            self.done = self.remaining == 0
+            return taken
+
+        pos, end = 0, len(data)
+        while pos < end:
+            if self._state == _DATA:
+                taken = min(self.remaining, end - pos)
+                pos += taken
+                self.remaining -= taken
+                if self.remaining == 0:
+                    self._state = _DATA_END
+                continue
+
+            newline = data.find(b"\n", pos)
+            if newline < 0:
+                self._line += data[pos:]
+                if len(self._line) > 8192:
+                    raise ValueError("Chunk line too long")
+                return end
+            line = bytes(self._line + data[pos:newline]).rstrip(b"\r")
+            self._line.clear()
+            pos = newline + 1
+
+            if self._state == _SIZE:
+                size = int(line.split(b";", 1)[0].strip(), 16)
+                if size == 0:
+                    self._state = _TRAILER
+                else:
+                    self.remaining = size
+                    self._state = _DATA
+            elif self._state == _DATA_END:
+                self._state = _SIZE
+            elif not line:  # Blank line ends the trailer
+                self.done = True
+                return pos
+        return pos
+
+
+class _Exchange:
+    """State of one proxied request/response pair"""
+
+    def __init__(
+        self, method: str, request_framer: BodyFramer, retry_statuses: Collection[int] = ()
+    ):
+        self.method = method
+        self.request_framer = request_framer
+        # Statuses answered by trying another proxy instead of relaying
+        self.retry_statuses = retry_statuses
+        self.response_framer: Optional[BodyFramer] = None
+        self.response_started = False
+        self.status = 0
+        self.upstream_reusable = False
+        self.done = asyncio.get_running_loop().create_future()
+
+    def finish(self, error: Optional[Exception] = None):
+        if self.done.done():
+            return
+        if error is None:
+            self.done.set_result(None)
+        else:
+            self.done.set_exception(error)
+
+
+class UpstreamProtocol(asyncio.Protocol):
+    """Connection to an upstream proxy, or to a target through one"""
+
+    def __init__(self, engine: "FastProxyEngine", key: tuple):
+        self.engine = engine
+        self.key = key
+        self.transport: Optional[asyncio.Transport] = None
+        self.client: Optional["FastProxyProtocol"] = None
+        self.exchange: Optional[_Exchange] = None
+        self.head = bytearray()
+        self.reused = False
+        self.received_any = False
+        self.idle_handle: Optional[asyncio.TimerHandle] = None
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+
+    def attach(self, client: "FastProxyProtocol", exchange: _Exchange):
+        self.client = client
+        self.exchange = exchange
+        self.head.clear()
+        self.received_any = False
+
+    def detach(self):
+        self.client = None
+        self.exchange = None
+
+    def close(self):
+        self.detach()
+        if self.transport is not None:
+            self.transport.close()
+
+    def data_received(self, data: bytes):
+        exchange = self.exchange
+        if exchange is None:
+            # Unsolicited bytes on an idle connection: not reusable
+            self.transport.close()
+            return
+        self.received_any = True
+
+        if exchange.response_framer is None:
+            self.head += data
+            end = self.head.find(b"\r\n\r\n")
+            if end < 0:
+                if len(self.head) > MAX_HEAD_SIZE:
+                    exchange.finish(ValueError("Upstream response head too large"))
+                return
+            head = bytes(self.head[: end + 4])
+            data = bytes(self.head[end + 4 :])
+            self.head.clear()
+            try:
+                parts, fields, _ = parse_head(head[:-4])
+                status = int(parts[1])
+                no_body = exchange.method == "HEAD" or status in (204, 304)
+                framer = BodyFramer.for_message(fields, no_body)
+            except ValueError as e:
+                exchange.finish(e)
+                return
+            if status in exchange.retry_statuses:
+                exchange.finish(UpstreamStatusError(status))
+                return
+            exchange.response_started = True
+            self.client.write(head)
+            if 100 <= status < 200 and status != 101:
+                # Interim response (100 Continue); the final head follows
+                if data:
+                    self.data_received(data)
+                return
+            exchange.status = status
+            exchange.response_framer = framer
+            exchange.upstream_reusable = not framer.until_eof and wants_keep_alive(
+                parts[0], fields
+            )
+            if framer.done:
+                exchange.upstream_reusable = exchange.upstream_reusable and not data
+                exchange.finish()
+                return
+            if not data:
+                return
+
+        framer = exchange.response_framer
+        try:
+            taken = framer.feed(data)
+        except ValueError as e:
+            exchange.finish(e)
+            return
+        if taken:
+            self.client.write(data if taken == len(data) else data[:taken])
+        if framer.done:
+            if taken < len(data):
+                # Bytes past the response: the connection is out of step
+                exchange.upstream_reusable = False
+            exchange.finish()
+
+    def eof_received(self):
+        exchange = self.exchange
+        if exchange is not None:
+            framer = exchange.response_framer
+            if framer is not None and framer.until_eof:
+                exchange.finish()
+            else:
+                exchange.finish(ConnectionResetError("Upstream closed the connection"))
+        return False
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self.engine.discard_idle(self)
+        self.eof_received()
+        self.transport = None
+
+    def pause_writing(self):
+        # The request body arrives faster than the upstream takes it
+        if self.client is not None:
+            self.client.pause_body()
+
+    def resume_writing(self):
+        if self.client is not None:
+            self.client.resume_body()
+
+
+class FastProxyProtocol(asyncio.Protocol):
+    """Client connection: reads request heads and relays request bodies"""
+
+    def __init__(self, engine: "FastProxyEngine"):
+        self.engine = engine
+        self.transport: Optional[asyncio.Transport] = None
+        self.buffer = bytearray()
+        self.busy = False  # A request is being handled
+        self.exchange: Optional[_Exchange] = None
+        self.upstream: Optional[UpstreamProtocol] = None
+        self._body_paused = False
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+
+    def write(self, data: bytes):
+        if self.transport is not None:
+            self.transport.write(data)
+
+    def data_received(self, data: bytes):
+        exchange = self.exchange
+        if exchange is not None and not exchange.request_framer.done:
+            self.forward_body(data)
+            return
+        self.buffer += data
+        if not self.busy:
+            self.next_request()
+
+    def forward_body(self, data):
+        """Send request body bytes upstream; bytes after the body wait in the buffer"""
+        exchange = self.exchange
+        try:
+            taken = exchange.request_framer.feed(data)
+        except ValueError as e:
+            exchange.finish(e)
+            return
+        upstream = self.upstream
+        if taken and upstream is not None and upstream.transport is not None:
+            upstream.transport.write(data if taken == len(data) else data[:taken])
+        if taken < len(data):
+            self.buffer += data[taken:]
+        if exchange.request_framer.done and self.transport is not None:
+            # Pipelined requests wait until this response is complete
+            self.transport.pause_reading()
+
+    def next_request(self):
+        end = self.buffer.find(b"\r\n\r\n")
+        if end < 0:
+            if len(self.buffer) > MAX_HEAD_SIZE:
+                self.engine.reply(self, 431, "Request head too large", close=True)
+            return
+        self.busy = True
+        self.transport.pause_reading()
+        head = bytes(self.buffer[:end])
+        del self.buffer[: end + 4]
+        self.engine.dispatch(self, head)
+
+    def request_done(self, keep_alive: bool):
+        """Continue with the next request on this connection, or close it"""
+        self.exchange = None
+        self.upstream = None
+        self.busy = False
+        self._body_paused = False
+        if self.transport is None or self.transport.is_closing():
+            return
+        if not keep_alive:
+            self.transport.close()
+            return
+        self.transport.resume_reading()
+        if self.buffer:
+            self.next_request()
+
+    def pause_body(self):
+        if self.transport is not None and not self._body_paused:
+            self._body_paused = True
+            self.transport.pause_reading()
+
+    def resume_body(self):
+        if not self._body_paused:
+            return
+        self._body_paused = False
+        exchange = self.exchange
+        if self.transport is not None and exchange is not None and not exchange.request_framer.done:
+            self.transport.resume_reading()
+
+    def pause_writing(self):
+        # The response arrives faster than the client takes it
+        if self.upstream is not None and self.upstream.transport is not None:
+            self.upstream.transport.pause_reading()
+
+    def resume_writing(self):
+        if self.upstream is not None and self.upstream.transport is not None:
+            self.upstream.transport.resume_reading()
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self.transport = None
+        if self.exchange is not None:
+            self.exchange.finish(ConnectionResetError("Client closed the connection"))
+
+
+class FastProxyEngine:
+    """asyncio.Protocol proxy listener sharing the server's rotator and stats"""
+
+    def __init__(self, server: "EnhancedHTTPProxyServer"):
+        self.server = server
+        self.rotator = server.rotator
+        self.timeout = server.server_config.get("request_timeout", 30)
+        pool_config = server.config.get("session_pool", {})
+        # Idle upstream connections kept per pool key, and for how long
+        self.max_idle = pool_config.get("idle_connections_per_key", 16)
+        self.idle_timeout = pool_config.get("keepalive_timeout", 30)
+        self._idle: Dict[tuple, List[UpstreamProtocol]] = defaultdict(list)
+        # Sticky sessions need the session header and the client address
+        self.sticky = self.rotator.strategy.value == "sticky"
+        self.session_header = self.rotator.session_header.lower().encode("latin-1")
+        self.dropped_headers = _HOP_BY_HOP | {self.session_header}
+
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        loop = asyncio.get_running_loop()
+        return await loop.create_server(
+            lambda: FastProxyProtocol(self), host, port, reuse_port=True
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "upstream_connections_opened": self.connections_opened,
+            "upstream_connections_reused": self.connections_reused,
+            "idle_upstream_connections": sum(len(idle) for idle in self._idle.values()),
+        }
+
+    def close(self):
+        """Close idle upstream connections"""
+        for idle in list(self._idle.values()):
+            for upstream in list(idle):
+                upstream.close()
+        self._idle.clear()
+
+    @staticmethod
+    def reply(client: FastProxyProtocol, status: int, text: str, close: bool = False):
+        """Send a short plain-text response, closing the connection if asked"""
+        transport = client.transport
+        if transport is None or transport.is_closing():
+            return
+        body = text.encode("utf-8")
+        connection = b"Connection: close\r\n" if close else b""
+        transport.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: text/plain\r\nContent-Length: {len(body)}\r\n".encode("ascii")
+            + connection
+            + b"\r\n"
+            + body
+        )
+        if close:
+            transport.close()
+
+    def _session_key(
+        self, client: FastProxyProtocol, header_lines: List[bytes], target_host: str
+    ) -> Optional[str]:
+        """Sticky routing key of a request, None unless sticky routing is on"""
+        if not self.sticky:
+            return None
+        session = None
+        for line in header_lines:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == self.session_header:
+                session = value.strip().decode("latin-1")
+        peer = client.transport.get_extra_info("peername") if client.transport else None
+        return self.rotator.session_key(session, peer[0] if peer else None, target_host)
+
+    def dispatch(self, client: FastProxyProtocol, head: bytes):
+        asyncio.get_running_loop().create_task(self.handle(client, head))
+
+    async def handle(self, client: FastProxyProtocol, head: bytes):
+        """Route one request to an upstream proxy and relay the exchange"""
+        server = self.server
+        if not server.shutdown_manager.is_accepting_requests():
+            self.reply(client, 503, "Server is shutting down, please try again later", close=True)
+            return
+        try:
+            await server.shutdown_manager.add_request(asyncio.current_task())
+        except ConnectionRefusedError:
+            self.reply(client, 503, "Server is shutting down, please try again later", close=True)
+            return
+
+        server.stats["requests_total"] += 1
+        start_time = time.time()
+        try:
+            parts, fields, header_lines = parse_head(head)
+            method = parts[0].decode("ascii").upper()
+            target = parts[1].decode("latin-1")
+            version = parts[2]
+            if not version.startswith(b"HTTP/"):
+                raise ValueError("Malformed request line")
+            if method == "CONNECT":
+                target_host, target_port = split_authority(target, 443)
+            elif target.lower().startswith("http://"):
+                authority, slash, path = target[7:].partition("/")
+                target_host, target_port = split_authority(authority, 80)
+                origin_target = slash + path or "/"
+                request_framer = BodyFramer.for_message(fields)
+                if request_framer.until_eof:
+                    # A request without framing headers has no body
+                    request_framer = BodyFramer(length=0)
+            else:
+                raise ValueError(
+                    "Expected an absolute http:// URI or CONNECT; "
+                    "stats and health are served on the admin port"
+                )
+        except ValueError as e:
+            server.stats["requests_failed"] += 1
+            self.reply(client, 400, f"Invalid request: {e}", close=True)
+            return
+
+        session_key = self._session_key(client, header_lines, target_host)
+        if method == "CONNECT":
+            proxy_result = await self.rotator.get_next_proxy(
+                session_key=session_key, target_host=target_host
+            )
+            if not proxy_result:
+                server.stats["requests_failed"] += 1
+                self.reply(client, 503, "No available proxy servers", close=True)
+                return
+            proxy, _ = proxy_result
+            self.rotator.increment_connections(proxy["host"], proxy["port"])
+            try:
+                await self._tunnel(client, proxy, target_host, target_port, start_time)
+            finally:
+                self.rotator.decrement_connections(proxy["host"], proxy["port"])
+            return
+
+        # Often the whole body arrived with the head; only then can the
+        # request be replayed on another proxy
+        try:
+            taken = request_framer.feed(client.buffer) if client.buffer else 0
+        except ValueError as e:
+            server.stats["requests_failed"] += 1
+            self.reply(client, 400, f"Invalid request: {e}", close=True)
+            return
+        buffered_body = bytes(client.buffer[:taken])
+        del client.buffer[:taken]
+        buffered = request_framer.done
+        replayable = method in server.retry_methods and buffered
+        max_attempts = server.retry_attempts if replayable else 1
+        deadline = start_time + server.retry_deadline
+        kept_headers = [
+            line
+            for line in header_lines
+            if line.split(b":", 1)[0].strip().lower() not in self.dropped_headers
+        ]
+        tried: Set[str] = set()
+        error: Optional[Exception] = None
+
+        for attempt in range(1, max_attempts + 1):
+            proxy_result = await self.rotator.get_next_proxy(
+                exclude=tried, session_key=session_key, target_host=target_host
+            )
+            if not proxy_result:
+                break
+            proxy, _ = proxy_result
+            proxy_host, proxy_port = proxy["host"], proxy["port"]
+            tried.add(f"{proxy_host}:{proxy_port}")
+
+            if proxy.get("protocol", "socks5") == "http":
+                # HTTP upstreams take absolute-form requests for any target
+                key = (proxy_host, proxy_port)
+                request_target = target
+            else:
+                key = (proxy_host, proxy_port, target_host, target_port)
+                request_target = origin_target
+            initial = (
+                b"\r\n".join(
+                    [f"{method} {request_target} ".encode("latin-1") + version]
+                    + kept_headers
+                    + [b"", b""]
+                )
+                + buffered_body
+            )
+            timeout = self.timeout
+            if replayable:
+                # Later attempts only get what is left of the deadline
+                timeout = min(timeout, max(0.1, deadline - time.time()))
+
+            self.rotator.increment_connections(proxy_host, proxy_port)
+            try:
+                exchange = await self._exchange(
+                    client,
+                    proxy,
+                    key,
+                    target_host,
+                    target_port,
+                    method,
+                    initial,
+                    request_framer,
+                    buffered,
+                    timeout,
+                    server.retry_statuses if attempt < max_attempts else (),
+                )
+            except Exception as e:
+                await self.rotator.record_request_result(
+                    proxy_host, proxy_port, False, target_host=target_host
+                )
+                logger.error(f"❌ {method} {target} -> {proxy_host}:{proxy_port} failed: {e}")
+                error = e
+                started = client.exchange is not None and client.exchange.response_started
+                client.exchange = None
+                client.upstream = None
+                if started or client.transport is None:
+                    # Part of the response is out; the client has to see it cut
+                    server.stats["requests_failed"] += 1
+                    if client.transport is not None:
+                        client.transport.abort()
+                    return
+            else:
+                response_time = time.time() - start_time
+                await self.rotator.record_request_result(
+                    proxy_host,
+                    proxy_port,
+                    True,
+                    response_time,
+                    target_host=target_host,
+                    status=exchange.status,
+                )
+                server.stats["requests_success"] += 1
+                if attempt > 1:
+                    server.stats["requests_recovered"] += 1
+                logger.debug(
+                    f"✅ {method} {target} -> {proxy_host}:{proxy_port} "
+                    f"[{exchange.status}] ({response_time:.3f}s)"
+                )
+                # An upstream may answer (401, 413, 417, ...) before the whole
+                # body was sent; the rest of it must not be read as the next
+                # request head
+                client.request_done(
+                    wants_keep_alive(version, fields)
+                    and not exchange.response_framer.until_eof
+                    and request_framer.done
+                )
+                return
+            finally:
+                self.rotator.decrement_connections(proxy_host, proxy_port)
+
+            if attempt < max_attempts:
+                if time.time() >= deadline:
+                    break
+                server.stats["retries"] += 1
+                logger.debug(
+                    f"🔁 Retrying {method} {target} on another proxy "
+                    f"(attempt {attempt + 1}/{max_attempts})"
+                )
+
+        server.stats["requests_failed"] += 1
+        if error is None:
+            self.reply(client, 503, "No available proxy servers", close=True)
+        else:
+            status = 504 if isinstance(error, asyncio.TimeoutError) else 502
+            self.reply(client, status, f"Proxy request failed: {error}", close=True)
+
+    async def _exchange(
+        self,
+        client: FastProxyProtocol,
+        proxy: Dict,
+        key: tuple,
+        target_host: str,
+        target_port: int,
+        method: str,
+        initial: bytes,
+        request_framer: BodyFramer,
+        buffered: bool,
+        timeout: float,
+        retry_statuses: Collection[int] = (),
+    ) -> _Exchange:
+        """
+        Send a request upstream and relay the response to the client
+
+        A request whose body is fully buffered in initial is retried once on
+        a new connection when a reused one turns out to be closed before
+        answering.
+
+        Raises:
+            UpstreamStatusError: If the upstream answered with one of
+                                 retry_statuses; nothing was relayed
+        """
+        for attempt in range(2):
+            upstream = await self._get_upstream(
+                proxy, key, target_host, target_port, fresh=attempt > 0
+            )
+            exchange = _Exchange(method, request_framer, retry_statuses)
+            client.exchange = exchange
+            client.upstream = upstream
+            upstream.attach(client, exchange)
+            upstream.transport.write(initial)
+            if not request_framer.done and client.transport is not None:
+                client.transport.resume_reading()
+
+            try:
+                try:
+                    await asyncio.wait_for(asyncio.shield(exchange.done), timeout)
+                except asyncio.TimeoutError:
+                    if not exchange.response_started:
+                        raise
+                    # The response is streaming; let it finish
+                    await exchange.done
+            except asyncio.TimeoutError:
+                # TimeoutError is an OSError, but a silent upstream is not a
+                # stale one: retrying it would wait the full timeout again
+                upstream.close()
+                raise
+            except (ConnectionError, OSError):
+                upstream.close()
+                stale = (
+                    upstream.reused
+                    and not upstream.received_any
+                    and buffered
+                    and client.transport is not None
+                )
+                if stale and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                upstream.close()
+                raise
+
+            if exchange.upstream_reusable and request_framer.done:
+                self._release(upstream)
+            else:
+                upstream.close()
+            return exchange
+        raise ConnectionResetError("Upstream closed the connection")
+
+    async def _get_upstream(
+        self, proxy: Dict, key: tuple, target_host: str, target_port: int, fresh: bool = False
+    ) -> UpstreamProtocol:
+        """Take an idle upstream connection for key, or open a new one"""
+        idle = self._idle.get(key)
+        while idle and not fresh:
+            upstream = idle.pop()
+            upstream.idle_handle.cancel()
+            if upstream.transport is not None and not upstream.transport.is_closing():
+                upstream.reused = True
+                self.connections_reused += 1
+                return upstream
+
+        if len(key) == 2:
+            sock = await self._connect_proxy(proxy)
+        else:
+            sock = await self.server.open_upstream(proxy, target_host, target_port)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            _, upstream = await asyncio.get_running_loop().create_connection(
+                lambda: UpstreamProtocol(self, key), sock=sock
+            )
+        except BaseException:
+            sock.close()
+            raise
+        self.connections_opened += 1
+        return upstream
+
+    def _release(self, upstream: UpstreamProtocol):
+        """Keep an upstream connection for the next request with the same key"""
+        upstream.detach()
+        idle = self._idle[upstream.key]
+        if upstream.transport is None or len(idle) >= self.max_idle:
+            upstream.close()
+            return
+        # Reading may still be paused by a slow client of the last response
+        upstream.transport.resume_reading()
+        upstream.idle_handle = asyncio.get_running_loop().call_later(
+            self.idle_timeout, upstream.close
+        )
+        idle.append(upstream)
+
+    def discard_idle(self, upstream: UpstreamProtocol):
+        """Forget an idle connection closed by the other side"""
+        idle = self._idle.get(upstream.key)
+        if idle and upstream in idle:
+            idle.remove(upstream)
+            upstream.idle_handle.cancel()
+
+    async def _tunnel(
+        self,
+        client: FastProxyProtocol,
+        proxy: Dict,
+        target_host: str,
+        target_port: int,
+        start_time: float,
+    ):
+        """Answer CONNECT with a tunnel relayed like the aiohttp engine's"""
+        server = self.server
+        proxy_host, proxy_port = proxy["host"], proxy["port"]
+        try:
+            upstream = await server.open_upstream(proxy, target_host, target_port)
+        except Exception as e:
+            await self.rotator.record_request_result(
+                proxy_host, proxy_port, False, target_host=target_host
+            )
+            server.stats["requests_failed"] += 1
+            logger.error(
+                f"❌ CONNECT {target_host}:{target_port} -> {proxy_host}:{proxy_port} failed: {e}"
+            )
+            self.reply(client, 502, f"Connection failed: {e}", close=True)
+            return
+
+        await self.rotator.record_request_result(
+            proxy_host, proxy_port, True, time.time() - start_time, target_host=target_host
+        )
+        server.stats["requests_success"] += 1
+        initial = bytes(client.buffer)
+        client.buffer.clear()
+        try:
+            if client.transport is not None:
+                await server.relay_transport(
+                    client.transport,
+                    upstream,
+                    (proxy_host, proxy_port),
+                    f"{target_host}:{target_port}",
+                    initial=initial,
+                    preamble=b"HTTP/1.1 200 Connection established\r\n\r\n",
+                )
+        finally:
+            upstream.close()
+
+    async def _connect_proxy(self, proxy: Dict) -> socket.socket:
+        """Open a plain TCP connection to an HTTP upstream proxy"""
+        loop = asyncio.get_running_loop()
+        proxy_ip = await get_dns_cache().resolve(proxy["host"])
+        family = socket.AF_INET6 if ":" in proxy_ip else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(
+                loop.sock_connect(sock, (proxy_ip, proxy["port"])), self.timeout
+            )
+        except BaseException:
+            sock.close()
+            raise
+        return sock
@@ -0,0 +1,70 @@
+"""
+Consistent-hash ring for sticky proxy selection.
+
+Each proxy is placed on the ring at `replicas` points. A session key maps to
+the first point clockwise from its own hash; walking on from there gives the
+key's fallback order. Removing a proxy only moves the keys whose walk
+reached it first, and adding one only takes over keys from its neighbours.
+
+Hashes come from blake2b rather than hash(), so every worker process maps a
+key to the same proxy.
+"""
+
+import hashlib
+from bisect import bisect
+from typing import Iterable, Iterator, List, Set
+
+
+def stable_hash(value: str) -> int:
+    """64-bit hash that is the same in every process"""
+    return int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+class ConsistentHashRing:
+    """Ring of node names with virtual replicas"""
+
+    def __init__(self, replicas: int = 64):
+        self.replicas = max(1, replicas)
+        self._nodes: Set[str] = set()
+        self._points: List[int] = []
+        self._owners: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def rebuild(self, nodes: Iterable[str]) -> bool:
+        """
+        Place exactly these nodes on the ring
+
+        Returns:
+            False if the node set was unchanged
+        """
+        nodes = set(nodes)
+        if nodes == self._nodes:
+            return False
+        ring = sorted(
+            (stable_hash(f"{node}#{replica}"), node)
+            for node in nodes
+            for replica in range(self.replicas)
+        )
+        self._nodes = nodes
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
+        return True
+
+    def walk(self, key: str) -> Iterator[str]:
+        """Distinct nodes in ring order from where key hashes to"""
+        if not self._points:
+            return
+        start = bisect(self._points, stable_hash(key))
+        seen: Set[str] = set()
+        total = len(self._points)
+        for offset in range(total):
+            node = self._owners[(start + offset) % total]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self._nodes):
+                    return
@@ -0,0 +1,140 @@
+"""
+Health check leadership across server worker processes.
+
+Without coordination every worker forked by `start_multiprocess` sweeps the
+whole proxy pool, so probe traffic grows with the worker count and each
+worker reaches its own verdicts. `HealthCheckCoordinator` keeps a lease and
+the latest sweep results in a `multiprocessing.Manager` dict owned by the
+master. The worker holding the lease runs the sweeps and publishes results;
+the others only apply them. A leader that stops renewing its lease (crashed
+or stuck worker) is replaced by the next worker that notices.
+"""
+
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Manager connection errors once the master is shutting down
+_MANAGER_ERRORS = (EOFError, ConnectionError, OSError)
+
+
+class HealthCheckCoordinator:
+    """Lease-based health check leader election over a shared dict"""
+
+    def __init__(self, shared: Dict[str, Any], lock, lease_seconds: float = 10.0):
+        """
+        Initialize coordinator
+
+        Args:
+            shared: Manager dict shared by all workers
+            lock: Manager lock guarding lease changes and publishes
+            lease_seconds: Seconds between lease renewals; a lease not
+                           renewed for three periods may be taken over
+        """
+        self.shared = shared
+        self.lock = lock
+        self.lease_seconds = lease_seconds
+        self.worker_id: Optional[int] = None
+        self.is_leader = False
+
+    @classmethod
+    def create(cls, manager, lease_seconds: float = 10.0) -> "HealthCheckCoordinator":
+        """Create a coordinator backed by a started SyncManager"""
+        return cls(manager.dict(), manager.Lock(), lease_seconds)
+
+    def acquire(self) -> bool:
+        """
+        Renew the lease if held, take it if free or expired
+
+        Blocking (manager round trips); call from an executor.
+
+        Returns:
+            True if this process is the leader
+        """
+        pid = os.getpid()
+        now = time.time()
+        try:
+            with self.lock:
+                leader = self.shared.get("leader")
+                expired = leader is None or now - leader["heartbeat"] > 3 * self.lease_seconds
+                if expired or leader["pid"] == pid:
+                    if leader is not None and leader["pid"] != pid:
+                        logger.warning(
+                            f"Health check leader (PID {leader['pid']}) missed its lease, taking over"
+                        )
+                    self.shared["leader"] = {
+                        "pid": pid,
+                        "worker_id": self.worker_id,
+                        "heartbeat": now,
+                    }
+                    is_leader = True
+                else:
+                    is_leader = False
+        except _MANAGER_ERRORS as e:
+            logger.debug(f"Health check lease unavailable: {e}")
+            is_leader = False
+
+        if is_leader and not self.is_leader:
+            logger.info(f"Worker {self.worker_id} (PID {pid}) is the health check leader")
+        self.is_leader = is_leader
+        return is_leader
+
+    def publish(self, health: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Publish the results of a sweep to all workers
+
+        Returns:
+            Version number of the published results, 0 if publishing failed
+        """
+        try:
+            with self.lock:
+                version = self.shared.get("version", 0) + 1
+                self.shared.update(
+                    health=health, version=version, published_at=time.time()
+                )
+            return version
+        except _MANAGER_ERRORS as e:
+            logger.debug(f"Failed to publish health check results: {e}")
+            return 0
+
+    def fetch(self, since_version: int = 0) -> Optional[Tuple[int, Dict[str, Dict[str, Any]]]]:
+        """
+        Get published results newer than since_version
+
+        Returns:
+            (version, health) or None if nothing newer was published
+        """
+        try:
+            version = self.shared.get("version", 0)
+            if version <= since_version:
+                return None
+            return version, self.shared.get("health", {})
+        except _MANAGER_ERRORS as e:
+            logger.debug(f"Failed to fetch health check results: {e}")
+            return None
+
+    def last_published(self) -> float:
+        """time.time() of the last published sweep, 0 if none"""
+        try:
+            return self.shared.get("published_at", 0.0)
+        except _MANAGER_ERRORS:
+            return 0.0
+
+    def get_status(self) -> Dict[str, Any]:
+        """Leader and publish state for /stats"""
+        try:
+            leader = self.shared.get("leader") or {}
+            version = self.shared.get("version", 0)
+            published_at = self.shared.get("published_at")
+        except _MANAGER_ERRORS:
+            leader, version, published_at = {}, 0, None
+        return {
+            "role": "leader" if self.is_leader else "follower",
+            "leader_pid": leader.get("pid"),
+            "leader_worker": leader.get("worker_id"),
+            "results_version": version,
+            "results_age": round(time.time() - published_at, 1) if published_at else None,
+        }
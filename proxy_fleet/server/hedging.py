@@ -0,0 +1,101 @@
+"""
+Hedged request policy for the enhanced proxy server.
+
+With free proxies, tail latency is set by the occasional upstream that
+stalls until `request_timeout`. A hedged request sends a second copy of an
+idempotent request to another proxy when the first has not produced
+response headers within a delay taken from recent latency (p95 by
+default); whichever answers first is used and the other is cancelled.
+
+`HedgePolicy` keeps the latency window that sets the delay and a budget
+that caps how many requests may be hedged. Every eligible request adds
+max_ratio to the budget and every hedge spends one, so at most roughly
+max_ratio of the requests are sent twice, however slow the pool gets.
+"""
+
+import math
+from collections import deque
+from typing import Any, Deque, Dict
+
+
+class HedgePolicy:
+    """Hedge delay from recent latencies and a budget for extra requests"""
+
+    def __init__(
+        self,
+        percentile: float = 95,
+        min_delay: float = 0.05,
+        initial_delay: float = 1.0,
+        max_ratio: float = 0.1,
+        window: int = 1000,
+        min_samples: int = 20,
+    ):
+        """
+        Initialize hedge policy
+
+        Args:
+            percentile: Latency percentile used as the hedge delay
+            min_delay: Lower bound of the delay in seconds
+            initial_delay: Delay used until min_samples latencies are known
+            max_ratio: Largest share of eligible requests that may be hedged
+            window: Number of recent latencies kept
+            min_samples: Latencies needed before percentile is used
+        """
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        # Unused budget is capped so a quiet spell cannot fund a burst
+        self.max_tokens = max(1.0, max_ratio * 100)
+
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._delay = initial_delay
+        self._since_update = 0
+        self._tokens = 0.0
+
+        self.eligible = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_exhausted = 0
+
+    def record(self, latency: float):
+        """Add the time to response headers of a successful upstream request"""
+        self._latencies.append(latency)
+        self._since_update += 1
+        # Sorting the window on every request would be wasteful; a delay a
+        # few samples old is just as good
+        if self._since_update >= 16 and len(self._latencies) >= self.min_samples:
+            self._since_update = 0
+            ordered = sorted(self._latencies)
+            index = min(len(ordered) - 1, math.ceil(len(ordered) * self.percentile / 100) - 1)
+            self._delay = max(self.min_delay, ordered[max(0, index)])
+
+    def delay(self) -> float:
+        """Seconds to wait for the first response before hedging"""
+        return self._delay
+
+    def start(self):
+        """Count an eligible request and fund the budget"""
+        self.eligible += 1
+        self._tokens = min(self.max_tokens, self._tokens + self.max_ratio)
+
+    def acquire(self) -> bool:
+        """Spend budget on a hedge; False if the cap is reached"""
+        if self._tokens < 1.0:
+            self.budget_exhausted += 1
+            return False
+        self._tokens -= 1.0
+        self.hedged += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "delay": round(self._delay, 4),
+            "samples": len(self._latencies),
+            "eligible_requests": self.eligible,
+            "hedged_requests": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "budget_exhausted": self.budget_exhausted,
+            "hedge_rate": round(self.hedged / self.eligible * 100, 2) if self.eligible else 0.0,
+        }
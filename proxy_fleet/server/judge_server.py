@@ -0,0 +1,92 @@
+"""
+Proxy judge server.
+
+A judge is an HTTP endpoint that echoes back what it sees of the requester:
+the peer address and the request headers. Validating proxies against our own
+judge keeps probes off rate-limited third-party services and lets the
+validator tell whether a proxy forwards our address (transparent), announces
+itself as a proxy (anonymous) or hides both (elite). GET /bytes/{n} streams
+n bytes as a local download target for bandwidth measurement.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict
+
+from aiohttp import web
+from aiohttp.web_request import Request
+from aiohttp.web_response import Response
+
+logger = logging.getLogger(__name__)
+
+
+class JudgeServer:
+    """HTTP server that echoes the requester's address and headers"""
+
+    # Upper bound for /bytes/{n} downloads
+    MAX_DOWNLOAD_BYTES = 100 * 1024 * 1024
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8890):
+        self.host = host
+        self.port = port
+        self.request_count = 0
+
+    async def handle_judge(self, request: Request) -> Response:
+        """Echo peer address and headers as JSON"""
+        self.request_count += 1
+        payload: Dict[str, Any] = {
+            "ip": request.remote,
+            "method": request.method,
+            "path": request.path_qs,
+            "headers": dict(request.headers),
+        }
+        return web.json_response(payload, headers={"Cache-Control": "no-store"})
+
+    async def handle_bytes(self, request: Request) -> web.StreamResponse:
+        """Stream n bytes, a local download target for bandwidth tests"""
+        self.request_count += 1
+        try:
+            remaining = int(request.match_info["n"])
+        except ValueError:
+            raise web.HTTPBadRequest(text="byte count must be an integer")
+        if remaining < 0:
+            raise web.HTTPBadRequest(text="byte count must not be negative")
+        remaining = min(remaining, self.MAX_DOWNLOAD_BYTES)
+
+        response = web.StreamResponse(
+            headers={
+                "Content-Type": "application/octet-stream",
+                "Cache-Control": "no-store",
+            }
+        )
+        response.content_length = remaining
+        await response.prepare(request)
+        chunk = b"\x00" * 65536
+        while remaining > 0:
+            await response.write(chunk[:remaining])
+            remaining -= len(chunk)
+        await response.write_eof()
+        return response
+
+    def create_app(self) -> web.Application:
+        """Create the aiohttp application"""
+        app = web.Application()
+        app.router.add_get("/bytes/{n}", self.handle_bytes)
+        app.router.add_route("*", "/{path:.*}", self.handle_judge)
+        return app
+
+    async def start(self):
+        """Start the judge server and serve until cancelled"""
+        runner = web.AppRunner(self.create_app(), access_log=None)
+        await runner.setup()
+
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+
+        logger.info(f"⚖️  Proxy judge running at http://{self.host}:{self.port}/")
+
+        try:
+            while True:
+                await asyncio.sleep(3600)
+        finally:
+            await runner.cleanup()
@@ -21,6 +21,7 @@ from aiohttp.web_response import Response
 from aiohttp_socks import ProxyConnector, ProxyType
 
 from ..cli.main import ProxyStorage
+from ..utils.dns_cache import get_dns_cache
 
 logger = logging.getLogger(__name__)
 
@@ -28,10 +29,11 @@ logger = logging.getLogger(__name__)
 class ProxyRotator:
     """Manages rotation of verified proxy servers"""
 
-    def __init__(self, storage_dir: str = "proxy", proxy_types: List[str] = None, regions: List[str] = None):
+    def __init__(self, storage_dir: str = "proxy", proxy_types: List[str] = None, regions: List[str] = None, anonymity: List[str] = None):
         self.storage = ProxyStorage(storage_dir)
         self.proxy_types = proxy_types or ['socks5']
         self.regions = regions
+        self.anonymity = anonymity
         self.current_index = 0
         self.last_refresh = 0
         self.refresh_interval = 60  # Refresh proxy list every 60 seconds
@@ -46,7 +48,7 @@ class ProxyRotator:
         if current_time - self.last_refresh < self.refresh_interval:
             return self.valid_proxies
 
-        self.valid_proxies = self.storage.get_valid_proxies(proxy_types=self.proxy_types, regions=self.regions)
+        self.valid_proxies = self.storage.get_valid_proxies(proxy_types=self.proxy_types, regions=self.regions, anonymity=self.anonymity)
         self.last_refresh = current_time
 
         # Reset failed proxies if enough time has passed
@@ -113,10 +115,11 @@ class HTTPProxyServer:
         proxy_types: List[str] = None,
         regions: List[str] = None,
         skip_cert_check: bool = False,
+        anonymity: List[str] = None,
     ):
         self.host = host
         self.port = port
-        self.rotator = ProxyRotator(storage_dir, proxy_types=proxy_types, regions=regions)
+        self.rotator = ProxyRotator(storage_dir, proxy_types=proxy_types, regions=regions, anonymity=anonymity)
         self.rotation_mode = rotation_mode  # 'round-robin' or 'random'
         self.skip_cert_check = skip_cert_check
         self.stats = {
@@ -170,20 +173,23 @@ class HTTPProxyServer:
             # Read request body
             body = await request.read()
 
+            # Resolve upstream proxy host through the shared cache
+            proxy_ip = await get_dns_cache().resolve(proxy_host)
+
             # Create proxy connector
             if proxy_protocol in ["socks4", "socks5"]:
                 proxy_type = (
                     ProxyType.SOCKS5 if proxy_protocol == "socks5" else ProxyType.SOCKS4
                 )
                 connector = ProxyConnector(
-                    proxy_type=proxy_type, host=proxy_host, port=proxy_port
+                    proxy_type=proxy_type, host=proxy_ip, port=proxy_port
                 )
                 session_kwargs = {"connector": connector}
             else:  # http proxy
                 connector = aiohttp.TCPConnector()
                 session_kwargs = {
                     "connector": connector,
-                    "proxy": f"http://{proxy_host}:{proxy_port}",
+                    "proxy": f"http://{proxy_ip}:{proxy_port}",
                 }
 
             # Forward request through proxy
@@ -0,0 +1,537 @@
+"""
+Shared HTTP response cache for the enhanced proxy server.
+
+Scrapers behind the server often fetch the same resources (robots.txt,
+static assets, repeated API GETs); without a cache every fetch costs a trip
+through an upstream proxy. `ResponseCache` stores cacheable GET responses
+following the shared-cache rules of RFC 9111:
+
+- Freshness comes from s-maxage, max-age or Expires; a fresh entry is
+  served without contacting any proxy.
+- Stale entries with an ETag or Last-Modified are revalidated with a
+  conditional request; a 304 refreshes the entry without a body transfer.
+- no-store, private and Set-Cookie responses are never stored, Vary
+  selects between stored variants, and Authorization requests are only
+  cached when the response explicitly allows it.
+- Unsafe methods (POST, PUT, DELETE, ...) invalidate the URL.
+
+Entries live in a memory LRU bounded by a byte budget. With disk_path set,
+entries are also written to a directory shared by all workers, bounded by
+its own budget, and read back on memory misses. Each file holds one JSON
+line describing the variants followed by their raw bodies; nothing in it is
+ever executed, and the directory must belong to the server's user and not
+be writable by anyone else.
+"""
+
+import asyncio
+import hashlib
+import logging
+import json
+import os
+import stat
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Statuses cacheable by default (RFC 9110 section 15.1)
+CACHEABLE_STATUSES = {200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501}
+
+# Methods that do not change the resource and so keep cached entries
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS", "TRACE"}
+
+# Headers of a 304 that must not replace the stored ones
+_KEEP_ON_REVALIDATE = {"content-length", "content-encoding", "transfer-encoding", "content-range"}
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Cache-Control directives as {lower-case name: argument or None}"""
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip().strip('"') if argument else None
+    return directives
+
+
+def _seconds(value: Optional[str]) -> Optional[int]:
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_lifetime(headers: Mapping[str, str], now: float) -> Optional[float]:
+    """
+    Seconds a response is fresh for, counted from when it was generated
+
+    Returns:
+        None if the response carries no explicit freshness information
+    """
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            seconds = _seconds(directives[name])
+            if seconds is not None:
+                return float(seconds)
+    if "Expires" in headers:
+        expires = _http_date(headers.get("Expires"))
+        if expires is None:
+            # Invalid dates mean "already expired"
+            return 0.0
+        date = _http_date(headers.get("Date")) or now
+        return max(0.0, expires - date)
+    return None
+
+
+@dataclass
+class CachedResponse:
+    """One stored response variant"""
+
+    status: int
+    headers: Dict[str, str]  # As relayed to clients
+    body: bytes
+    stored_at: float
+    lifetime: float  # Fresh for this many seconds after stored_at
+    vary: Tuple[Tuple[str, str], ...] = ()  # (header name, request value)
+    no_cache: bool = False  # Must be revalidated before every use
+    hits: int = field(default=0, compare=False)
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers.items()) + 64
+
+    def age(self, now: float) -> float:
+        return max(0.0, now - self.stored_at)
+
+    def is_fresh(self, now: float) -> bool:
+        return not self.no_cache and self.age(now) < self.lifetime
+
+    def header(self, name: str) -> Optional[str]:
+        name = name.lower()
+        for key, value in self.headers.items():
+            if key.lower() == name:
+                return value
+        return None
+
+    def matches(self, request_headers: Mapping[str, str]) -> bool:
+        """Whether this variant was selected by the same Vary header values"""
+        return all(request_headers.get(name, "") == value for name, value in self.vary)
+
+
+class ResponseCache:
+    """Memory LRU of HTTP responses with an optional shared disk tier"""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entry_bytes: int = 1024 * 1024,
+        max_variants: int = 8,
+        disk_path: Optional[str] = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+    ):
+        """
+        Initialize response cache
+
+        Args:
+            max_bytes: Memory budget for stored responses
+            max_entry_bytes: Largest response body that is stored
+            max_variants: Most Vary variants kept per URL
+            disk_path: Directory of the disk tier (None: memory only)
+            disk_max_bytes: Disk budget
+        """
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.max_variants = max_variants
+        self.disk_path = disk_path
+        self.disk_max_bytes = disk_max_bytes
+
+        # url -> variants, least recently used first
+        self._memory: "OrderedDict[str, List[CachedResponse]]" = OrderedDict()
+        self._memory_bytes = 0
+        # file name -> size on disk, oldest first
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._disk_tasks: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.disk_hits = 0
+
+        if disk_path:
+            os.makedirs(disk_path, mode=0o700, exist_ok=True)
+            self._check_disk_path()
+            self._scan_disk()
+
+    # Request side
+
+    @staticmethod
+    def is_cacheable_request(method: str, request_headers: Mapping[str, str]) -> bool:
+        """Whether the cache may answer or store this request at all"""
+        if method not in ("GET", "HEAD"):
+            return False
+        return "no-store" not in parse_cache_control(request_headers.get("Cache-Control"))
+
+    @staticmethod
+    def is_fresh_for(cached: CachedResponse, request_headers: Mapping[str, str]) -> bool:
+        """Whether cached may be served to this request without revalidation"""
+        directives = parse_cache_control(request_headers.get("Cache-Control"))
+        if "no-cache" in directives or "no-cache" in request_headers.get("Pragma", "").lower():
+            return False
+        now = time.time()
+        max_age = _seconds(directives.get("max-age")) if "max-age" in directives else None
+        if max_age is not None and cached.age(now) > max_age:
+            return False
+        return cached.is_fresh(now)
+
+    @staticmethod
+    def conditional_headers(cached: CachedResponse) -> Dict[str, str]:
+        """Validators to revalidate cached with; empty if it has none"""
+        headers = {}
+        etag = cached.header("ETag")
+        if etag:
+            headers["If-None-Match"] = etag
+        last_modified = cached.header("Last-Modified")
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    async def lookup(self, url: str, request_headers: Mapping[str, str]) -> Optional[CachedResponse]:
+        """Find the stored variant of url matching the request, if any"""
+        variants = self._memory.get(url)
+        if variants is None and self.disk_path:
+            variants = await self._read_disk(url)
+            if variants:
+                self.disk_hits += 1
+                self._put_memory(url, variants)
+        if not variants:
+            return None
+        self._memory.move_to_end(url)
+        for cached in variants:
+            if cached.matches(request_headers):
+                return cached
+        return None
+
+    def record_hit(self, cached: CachedResponse):
+        self.hits += 1
+        cached.hits += 1
+
+    def record_miss(self):
+        self.misses += 1
+
+    # Response side
+
+    def _storable(
+        self,
+        request_headers: Mapping[str, str],
+        status: int,
+        headers: Mapping[str, str],
+    ) -> bool:
+        if status not in CACHEABLE_STATUSES:
+            return False
+        if "no-store" in parse_cache_control(request_headers.get("Cache-Control")):
+            return False
+        directives = parse_cache_control(headers.get("Cache-Control"))
+        if "no-store" in directives or "private" in directives:
+            return False
+        if "Set-Cookie" in headers or headers.get("Vary", "").strip() == "*":
+            return False
+        if "Authorization" in request_headers and not (
+            {"public", "s-maxage", "must-revalidate"} & directives.keys()
+        ):
+            return False
+        # Without validators, an entry that is stale on arrival is useless
+        return (
+            bool(freshness_lifetime(headers, time.time()))
+            or "ETag" in headers
+            or "Last-Modified" in headers
+        )
+
+    def _build(
+        self,
+        request_headers: Mapping[str, str],
+        status: int,
+        headers: Mapping[str, str],
+        relay_headers: Dict[str, str],
+        body: bytes,
+        now: float,
+    ) -> CachedResponse:
+        lifetime = freshness_lifetime(headers, now)
+        # Time the response already spent in caches upstream
+        age = _seconds(headers.get("Age")) or 0
+        vary_names = sorted(
+            {name.strip().lower() for name in headers.get("Vary", "").split(",") if name.strip()}
+        )
+        return CachedResponse(
+            status=status,
+            headers=relay_headers,
+            body=body,
+            stored_at=now,
+            lifetime=max(0.0, (lifetime or 0.0) - age),
+            vary=tuple((name, request_headers.get(name, "")) for name in vary_names),
+            no_cache="no-cache" in parse_cache_control(headers.get("Cache-Control")),
+        )
+
+    def store(
+        self,
+        url: str,
+        request_headers: Mapping[str, str],
+        status: int,
+        headers: Mapping[str, str],
+        relay_headers: Dict[str, str],
+        body: bytes,
+    ) -> bool:
+        """
+        Store a response if it is cacheable
+
+        Args:
+            url: Request URL
+            request_headers: Headers of the request (for Vary)
+            status: Response status
+            headers: Upstream response headers (case-insensitive mapping)
+            relay_headers: Headers as relayed to the client
+            body: Complete response body
+
+        Returns:
+            True if stored
+        """
+        if len(body) > self.max_entry_bytes or not self._storable(request_headers, status, headers):
+            return False
+        cached = self._build(request_headers, status, headers, relay_headers, body, time.time())
+        variants = [v for v in self._memory.get(url, []) if v.vary != cached.vary]
+        variants.insert(0, cached)
+        self._put_memory(url, variants[: self.max_variants])
+        self.stores += 1
+        self._write_disk_later(url)
+        return True
+
+    def refresh(
+        self, url: str, cached: CachedResponse, headers: Mapping[str, str]
+    ) -> CachedResponse:
+        """Update a stored response after its revalidation returned 304"""
+        merged = dict(cached.headers)
+        for name, value in headers.items():
+            if name.lower() in _KEEP_ON_REVALIDATE:
+                continue
+            for key in [k for k in merged if k.lower() == name.lower()]:
+                del merged[key]
+            merged[name] = value
+        now = time.time()
+        lifetime = freshness_lifetime(merged, now)
+        age = _seconds(headers.get("Age")) or 0
+        # The merged headers change the entry's size
+        stored = any(v is cached for v in self._memory.get(url, ()))
+        if stored:
+            self._memory_bytes -= cached.size
+        cached.headers = merged
+        if stored:
+            self._memory_bytes += cached.size
+        cached.stored_at = now
+        cached.lifetime = max(0.0, (lifetime or 0.0) - age)
+        cached.no_cache = "no-cache" in parse_cache_control(merged.get("Cache-Control"))
+        self.revalidated += 1
+        if url in self._memory:
+            self._memory.move_to_end(url)
+        self._write_disk_later(url)
+        return cached
+
+    def invalidate(self, url: str):
+        """Drop every stored variant of url (after an unsafe request)"""
+        variants = self._memory.pop(url, None)
+        if variants:
+            self._memory_bytes -= sum(v.size for v in variants)
+            self.invalidations += 1
+        if self.disk_path:
+            self._spawn(self._remove_disk(url))
+
+    # Memory tier
+
+    def _put_memory(self, url: str, variants: List[CachedResponse]):
+        old = self._memory.pop(url, None)
+        if old:
+            self._memory_bytes -= sum(v.size for v in old)
+        self._memory[url] = variants
+        self._memory_bytes += sum(v.size for v in variants)
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= sum(v.size for v in evicted)
+            self.evictions += 1
+
+    # Disk tier
+
+    def _file_name(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest() + ".cache"
+
+    def _check_disk_path(self):
+        # Whoever can write here decides what the server answers with
+        info = os.stat(self.disk_path)
+        if hasattr(os, "getuid") and info.st_uid != os.getuid():
+            raise ValueError(
+                f"Response cache directory {self.disk_path} is owned by another user"
+            )
+        if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise ValueError(
+                f"Response cache directory {self.disk_path} is writable by other users; "
+                f"use mode 0700"
+            )
+
+    def _scan_disk(self):
+        entries = []
+        for name in os.listdir(self.disk_path):
+            if not name.endswith(".cache"):
+                continue
+            try:
+                info = os.stat(os.path.join(self.disk_path, name))
+            except OSError:
+                continue
+            entries.append((info.st_mtime, name, info.st_size))
+        for _, name, size in sorted(entries):
+            self._disk_index[name] = size
+            self._disk_bytes += size
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._disk_tasks.add(task)
+        task.add_done_callback(self._disk_tasks.discard)
+
+    def _write_disk_later(self, url: str):
+        if self.disk_path and url in self._memory:
+            # Written off the request path; readers treat a missing file as a miss
+            self._spawn(self._write_disk(url, list(self._memory[url])))
+
+    async def _write_disk(self, url: str, variants: List[CachedResponse]):
+        name = self._file_name(url)
+        loop = asyncio.get_running_loop()
+        try:
+            size = await loop.run_in_executor(None, self._write_file, name, url, variants)
+        except OSError as e:
+            logger.debug(f"Failed to write cache file for {url}: {e}")
+            return
+        self._disk_bytes -= self._disk_index.pop(name, 0)
+        self._disk_index[name] = size
+        self._disk_bytes += size
+        while self._disk_bytes > self.disk_max_bytes and len(self._disk_index) > 1:
+            oldest, oldest_size = self._disk_index.popitem(last=False)
+            self._disk_bytes -= oldest_size
+            await loop.run_in_executor(None, self._unlink, oldest)
+
+    def _write_file(self, name: str, url: str, variants: List[CachedResponse]) -> int:
+        path = os.path.join(self.disk_path, name)
+        header = {
+            "url": url,
+            "variants": [
+                {
+                    "status": v.status,
+                    "headers": list(v.headers.items()),
+                    "stored_at": v.stored_at,
+                    "lifetime": v.lifetime,
+                    "vary": list(v.vary),
+                    "no_cache": v.no_cache,
+                    "length": len(v.body),
+                }
+                for v in variants
+            ],
+        }
+        # A temp file per write: writes of the same URL may overlap
+        fd, temp = tempfile.mkstemp(suffix=".tmp", dir=self.disk_path)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(json.dumps(header).encode("utf-8") + b"\n")
+                for v in variants:
+                    f.write(v.body)
+            os.replace(temp, path)
+        except BaseException:
+            self._unlink(os.path.basename(temp))
+            raise
+        return os.path.getsize(path)
+
+    async def _read_disk(self, url: str) -> Optional[List[CachedResponse]]:
+        name = self._file_name(url)
+        loop = asyncio.get_running_loop()
+        try:
+            stored_url, variants = await loop.run_in_executor(None, self._read_file, name)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.debug(f"Unreadable cache file for {url}: {e}")
+            return None
+        # Another worker may have written it; the index only tracks budget
+        if name not in self._disk_index:
+            size = sum(v.size for v in variants)
+            self._disk_index[name] = size
+            self._disk_bytes += size
+        return variants if stored_url == url else None
+
+    def _read_file(self, name: str) -> Tuple[str, List[CachedResponse]]:
+        with open(os.path.join(self.disk_path, name), "rb") as f:
+            header = json.loads(f.readline())
+            variants = []
+            for entry in header["variants"]:
+                length = int(entry["length"])
+                body = f.read(length)
+                if len(body) != length:
+                    raise ValueError("truncated body")
+                variants.append(
+                    CachedResponse(
+                        status=int(entry["status"]),
+                        headers={str(k): str(v) for k, v in entry["headers"]},
+                        body=body,
+                        stored_at=float(entry["stored_at"]),
+                        lifetime=float(entry["lifetime"]),
+                        vary=tuple((str(k), str(v)) for k, v in entry["vary"]),
+                        no_cache=bool(entry["no_cache"]),
+                    )
+                )
+            if f.read(1):
+                raise ValueError("trailing data")
+        return str(header["url"]), variants
+
+    async def _remove_disk(self, url: str):
+        name = self._file_name(url)
+        self._disk_bytes -= self._disk_index.pop(name, 0)
+        await asyncio.get_running_loop().run_in_executor(None, self._unlink, name)
+
+    def _unlink(self, name: str):
+        try:
+            os.unlink(os.path.join(self.disk_path, name))
+        except OSError:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.revalidated
+        stats = {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.revalidated) / lookups * 100, 1) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "max_bytes": self.max_bytes,
+        }
+        if self.disk_path:
+            stats.update(
+                disk_hits=self.disk_hits,
+                disk_entries=len(self._disk_index),
+                disk_bytes=self._disk_bytes,
+            )
+        return stats
@@ -0,0 +1,208 @@
+"""
+Pooled upstream sessions for the enhanced proxy server.
+
+Building a `ProxyConnector`/`TCPConnector` and a `ClientSession` for every
+client request means no connection is ever reused: each request pays for a
+TCP connect, a SOCKS handshake and session construction. `UpstreamSessionPool`
+keeps one long-lived session per upstream proxy so keep-alive connections
+through it are reused. Sessions are evicted least recently used first when
+the pool is full, after sitting idle for a while, and when their proxy
+leaves the rotation. A session still serving requests is only closed once
+its last request finishes.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import ClientSession, ClientTimeout
+from aiohttp_socks import ProxyConnector, ProxyType
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PooledSession:
+    """A cached session and its usage state"""
+
+    session: ClientSession
+    proxy_url: Optional[str]  # Per-request proxy for HTTP upstreams
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    in_use: int = 0
+    requests: int = 0
+    evicted: bool = False
+
+
+class UpstreamSessionPool:
+    """LRU cache of ClientSessions keyed by upstream proxy"""
+
+    def __init__(
+        self,
+        max_sessions: int = 256,
+        idle_ttl: float = 300.0,
+        keepalive_timeout: float = 30.0,
+        connections_per_proxy: int = 100,
+        request_timeout: float = 30.0,
+    ):
+        """
+        Initialize session pool
+
+        Args:
+            max_sessions: Most cached sessions (least recently used evicted first)
+            idle_ttl: Seconds an unused session is kept
+            keepalive_timeout: Seconds an idle connection inside a session is kept
+            connections_per_proxy: Most open connections per session
+            request_timeout: Time limit for connecting and for each read;
+                             streamed transfers may take longer in total
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.connections_per_proxy = connections_per_proxy
+        self.timeout = ClientTimeout(
+            total=None, connect=request_timeout, sock_read=request_timeout
+        )
+
+        # (protocol, "host:port") -> PooledSession, oldest use first
+        self._sessions: "OrderedDict[Tuple[str, str], PooledSession]" = OrderedDict()
+        self._closing: List[PooledSession] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _create(self, protocol: str, proxy_ip: str, proxy_port: int) -> PooledSession:
+        if protocol in ("socks4", "socks5"):
+            proxy_type = ProxyType.SOCKS5 if protocol == "socks5" else ProxyType.SOCKS4
+            connector = ProxyConnector(
+                proxy_type=proxy_type,
+                host=proxy_ip,
+                port=proxy_port,
+                limit=self.connections_per_proxy,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            proxy_url = None
+        else:  # http proxy
+            connector = aiohttp.TCPConnector(
+                limit=self.connections_per_proxy,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            proxy_url = f"http://{proxy_ip}:{proxy_port}"
+        # Bodies are relayed as received, encoding included. The session is
+        # shared by every client of this upstream, so it must not keep
+        # cookies: they pass through from client to upstream unchanged
+        session = ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            auto_decompress=False,
+            cookie_jar=aiohttp.DummyCookieJar(),
+        )
+        return PooledSession(session=session, proxy_url=proxy_url)
+
+    @asynccontextmanager
+    async def session(
+        self, protocol: str, proxy_host: str, proxy_port: int, proxy_ip: Optional[str] = None
+    ) -> AsyncIterator[PooledSession]:
+        """
+        Borrow the pooled session of an upstream proxy, creating it if needed
+
+        Args:
+            protocol: Upstream protocol (socks4, socks5 or http)
+            proxy_host: Upstream host as stored; part of the cache key
+            proxy_port: Upstream port
+            proxy_ip: Resolved address to connect to (default: proxy_host)
+
+        Yields:
+            PooledSession; pass its proxy_url as the request's proxy
+        """
+        key = (protocol, f"{proxy_host}:{proxy_port}")
+        entry = self._sessions.get(key)
+        if entry is not None and not entry.session.closed:
+            self._sessions.move_to_end(key)
+            self.hits += 1
+        else:
+            entry = self._create(protocol, proxy_ip or proxy_host, proxy_port)
+            self._sessions[key] = entry
+            self.misses += 1
+            await self._evict_overflow()
+
+        entry.in_use += 1
+        entry.requests += 1
+        try:
+            yield entry
+        finally:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            if entry.evicted and entry.in_use == 0:
+                await self._close(entry)
+
+    async def _close(self, entry: PooledSession):
+        if entry in self._closing:
+            self._closing.remove(entry)
+        if not entry.session.closed:
+            await entry.session.close()
+
+    async def _evict(self, key: Tuple[str, str]):
+        entry = self._sessions.pop(key, None)
+        if entry is None:
+            return
+        entry.evicted = True
+        self.evictions += 1
+        if entry.in_use == 0:
+            await self._close(entry)
+        else:
+            # Closed when its last request finishes
+            self._closing.append(entry)
+
+    async def _evict_overflow(self):
+        while len(self._sessions) > self.max_sessions:
+            oldest = next(iter(self._sessions))
+            await self._evict(oldest)
+
+    async def prune(self, active_proxies: Optional[Iterable[str]] = None) -> int:
+        """
+        Evict sessions idle for longer than idle_ttl, and those of proxies
+        missing from active_proxies ("host:port" keys) when given
+
+        Returns:
+            Number of evicted sessions
+        """
+        now = time.monotonic()
+        active = set(active_proxies) if active_proxies is not None else None
+        stale = [
+            key
+            for key, entry in self._sessions.items()
+            if entry.session.closed
+            or (active is not None and key[1] not in active)
+            or (entry.in_use == 0 and now - entry.last_used > self.idle_ttl)
+        ]
+        for key in stale:
+            await self._evict(key)
+        return len(stale)
+
+    async def close(self):
+        """Close every session, including ones still in use"""
+        entries = list(self._sessions.values()) + self._closing
+        self._sessions.clear()
+        self._closing = []
+        for entry in entries:
+            if not entry.session.closed:
+                await entry.session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "in_use": sum(1 for e in self._sessions.values() if e.in_use),
+            "closing": len(self._closing),
+            "max_sessions": self.max_sessions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
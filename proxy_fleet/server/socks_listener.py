@@ -0,0 +1,329 @@
+"""
+SOCKS5 / SOCKS4a front-end for the enhanced proxy server.
+
+Clients that speak SOCKS instead of HTTP connect to `socks_port`. After the
+handshake (no authentication), a CONNECT picks an upstream proxy from the
+same `EnhancedProxyRotator` as HTTP traffic, so circuit breakers, health
+state and statistics are shared, and the connection is relayed through the
+upstream with the same byte relay as HTTP CONNECT tunnels. There is no HTTP
+parsing on this path at all: once the handshake is done, bytes only move
+between sockets.
+"""
+
+import asyncio
+import logging
+import socket
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from python_socks import ProxyTimeoutError
+
+if TYPE_CHECKING:
+    from .enhanced_proxy_server import EnhancedHTTPProxyServer
+
+logger = logging.getLogger(__name__)
+
+SOCKS4_VERSION = 4
+SOCKS5_VERSION = 5
+CMD_CONNECT = 1
+
+# SOCKS5 reply codes
+REP_SUCCEEDED = 0x00
+REP_GENERAL_FAILURE = 0x01
+REP_HOST_UNREACHABLE = 0x04
+REP_CONNECTION_REFUSED = 0x05
+REP_COMMAND_NOT_SUPPORTED = 0x07
+REP_ADDRESS_NOT_SUPPORTED = 0x08
+
+# SOCKS4 reply codes
+REP4_GRANTED = 0x5A
+REP4_REJECTED = 0x5B
+
+# Longest SOCKS4 user id or SOCKS4a hostname accepted
+MAX_FIELD_SIZE = 1024
+
+_GREETING, _REQUEST5, _REQUEST4, _DISPATCHED = range(4)
+
+
+class SocksRequestError(ValueError):
+    """Malformed or unsupported client request, answered with reply code"""
+
+    def __init__(self, message: str, reply: int = REP_GENERAL_FAILURE):
+        super().__init__(message)
+        self.reply = reply
+
+
+def parse_socks5_request(buffer: bytes) -> Optional[Tuple[int, int, str, int]]:
+    """
+    Parse a SOCKS5 request (after the method negotiation)
+
+    Returns:
+        (bytes consumed, command, host, port), or None if incomplete
+
+    Raises:
+        SocksRequestError: If the request is malformed
+    """
+    if len(buffer) < 5:
+        return None
+    version, command, _, address_type = buffer[:4]
+    if version != SOCKS5_VERSION:
+        raise SocksRequestError(f"Unexpected SOCKS version {version}")
+    if address_type == 1:
+        end = 8
+    elif address_type == 3:
+        end = 5 + buffer[4]
+    elif address_type == 4:
+        end = 20
+    else:
+        raise SocksRequestError(
+            f"Unsupported address type {address_type}", REP_ADDRESS_NOT_SUPPORTED
+        )
+    if len(buffer) < end + 2:
+        return None
+
+    if address_type == 1:
+        host = socket.inet_ntop(socket.AF_INET, bytes(buffer[4:8]))
+    elif address_type == 4:
+        host = socket.inet_ntop(socket.AF_INET6, bytes(buffer[4:20]))
+    else:
+        try:
+            host = bytes(buffer[5:end]).decode("ascii")
+        except UnicodeDecodeError:
+            raise SocksRequestError("Hostname is not ASCII", REP_ADDRESS_NOT_SUPPORTED)
+    port = int.from_bytes(buffer[end : end + 2], "big")
+    return end + 2, command, host, port
+
+
+def parse_socks4_request(buffer: bytes) -> Optional[Tuple[int, int, str, int]]:
+    """
+    Parse a SOCKS4 or SOCKS4a request
+
+    Returns:
+        (bytes consumed, command, host, port), or None if incomplete
+
+    Raises:
+        SocksRequestError: If the request is malformed
+    """
+    if len(buffer) < 9:
+        return None
+    command = buffer[1]
+    port = int.from_bytes(buffer[2:4], "big")
+    address = bytes(buffer[4:8])
+
+    user_end = buffer.find(b"\x00", 8)
+    if user_end < 0:
+        if len(buffer) > 8 + MAX_FIELD_SIZE:
+            raise SocksRequestError("User id too long")
+        return None
+    end = user_end + 1
+
+    if address[:3] == b"\x00\x00\x00" and address[3] != 0:
+        # SOCKS4a: the hostname follows the user id
+        host_end = buffer.find(b"\x00", end)
+        if host_end < 0:
+            if len(buffer) > end + MAX_FIELD_SIZE:
+                raise SocksRequestError("Hostname too long")
+            return None
+        try:
+            host = bytes(buffer[end:host_end]).decode("ascii")
+        except UnicodeDecodeError:
+            raise SocksRequestError("Hostname is not ASCII")
+        end = host_end + 1
+    else:
+        host = socket.inet_ntop(socket.AF_INET, address)
+    return end, command, host, port
+
+
+def socks_reply(version: int, reply: int) -> bytes:
+    """Reply with an unspecified bound address"""
+    if version == SOCKS4_VERSION:
+        return bytes([0, reply]) + b"\x00" * 6
+    return bytes([SOCKS5_VERSION, reply, 0, 1]) + b"\x00" * 6
+
+
+class SocksListenerProtocol(asyncio.Protocol):
+    """Client connection: runs the SOCKS handshake, then hands over to the listener"""
+
+    def __init__(self, listener: "SocksListener"):
+        self.listener = listener
+        self.transport: Optional[asyncio.Transport] = None
+        self.buffer = bytearray()
+        self.state = _GREETING
+        self.version = SOCKS5_VERSION
+        self._handshake_timer: Optional[asyncio.TimerHandle] = None
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+        self.listener.connections += 1
+        self._handshake_timer = asyncio.get_running_loop().call_later(
+            self.listener.handshake_timeout, transport.abort
+        )
+
+    def data_received(self, data: bytes):
+        self.buffer += data
+        if self.state == _DISPATCHED:
+            return
+        try:
+            self._advance()
+        except SocksRequestError as e:
+            self.listener.handshake_failures += 1
+            logger.debug(f"❌ SOCKS handshake failed: {e}")
+            self.fail(e.reply)
+
+    def _advance(self):
+        if self.state == _GREETING:
+            if not self.buffer:
+                return
+            version = self.buffer[0]
+            if version == SOCKS4_VERSION:
+                self.version = SOCKS4_VERSION
+                self.state = _REQUEST4
+            elif version == SOCKS5_VERSION:
+                if len(self.buffer) < 2 or len(self.buffer) < 2 + self.buffer[1]:
+                    return
+                methods = self.buffer[2 : 2 + self.buffer[1]]
+                del self.buffer[: 2 + len(methods)]
+                if 0 not in methods:
+                    # Only "no authentication" is offered
+                    self.transport.write(bytes([SOCKS5_VERSION, 0xFF]))
+                    self.transport.close()
+                    return
+                self.transport.write(bytes([SOCKS5_VERSION, 0]))
+                self.state = _REQUEST5
+            else:
+                self.transport.abort()
+                return
+
+        parse = parse_socks5_request if self.state == _REQUEST5 else parse_socks4_request
+        request = parse(self.buffer)
+        if request is None:
+            return
+        consumed, command, host, port = request
+        del self.buffer[:consumed]
+        self.state = _DISPATCHED
+        self._handshake_timer.cancel()
+        self.transport.pause_reading()
+        asyncio.get_running_loop().create_task(
+            self.listener.handle(self, command, host, port)
+        )
+
+    def fail(self, reply: int):
+        """Reject the request and close the connection"""
+        if self.transport is None or self.transport.is_closing():
+            return
+        if self.version == SOCKS4_VERSION:
+            reply = REP4_REJECTED
+        self.transport.write(socks_reply(self.version, reply))
+        self.transport.close()
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self.transport = None
+        if self._handshake_timer is not None:
+            self._handshake_timer.cancel()
+
+
+class SocksListener:
+    """SOCKS front-end sharing the server's rotator, relay and stats"""
+
+    def __init__(self, server: "EnhancedHTTPProxyServer"):
+        self.server = server
+        self.rotator = server.rotator
+        self.handshake_timeout = server.server_config.get("request_timeout", 30)
+
+        self.connections = 0
+        self.handshake_failures = 0
+        self.connects_by_version = {SOCKS4_VERSION: 0, SOCKS5_VERSION: 0}
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        loop = asyncio.get_running_loop()
+        return await loop.create_server(
+            lambda: SocksListenerProtocol(self), host, port, reuse_port=True
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "connections": self.connections,
+            "handshake_failures": self.handshake_failures,
+            "socks4_connects": self.connects_by_version[SOCKS4_VERSION],
+            "socks5_connects": self.connects_by_version[SOCKS5_VERSION],
+        }
+
+    async def handle(self, client: SocksListenerProtocol, command: int, host: str, port: int):
+        """Chain an accepted CONNECT through an upstream proxy"""
+        server = self.server
+        if not server.shutdown_manager.is_accepting_requests():
+            client.fail(REP_GENERAL_FAILURE)
+            return
+        try:
+            await server.shutdown_manager.add_request(asyncio.current_task())
+        except ConnectionRefusedError:
+            client.fail(REP_GENERAL_FAILURE)
+            return
+
+        if command != CMD_CONNECT:
+            self.handshake_failures += 1
+            client.fail(REP_COMMAND_NOT_SUPPORTED)
+            return
+
+        server.stats["requests_total"] += 1
+        self.connects_by_version[client.version] += 1
+        start_time = time.time()
+
+        # No headers here: sticky sessions key on the client or the target
+        peer = client.transport.get_extra_info("peername") if client.transport else None
+        session_key = self.rotator.session_key(None, peer[0] if peer else None, host)
+        proxy_result = await self.rotator.get_next_proxy(
+            session_key=session_key, target_host=host
+        )
+        if not proxy_result:
+            server.stats["requests_failed"] += 1
+            client.fail(REP_GENERAL_FAILURE)
+            return
+        proxy, _ = proxy_result
+        proxy_host, proxy_port = proxy["host"], proxy["port"]
+        description = f"SOCKS{client.version} {host}:{port}"
+
+        self.rotator.increment_connections(proxy_host, proxy_port)
+        try:
+            try:
+                upstream = await server.open_upstream(proxy, host, port)
+            except Exception as e:
+                await self.rotator.record_request_result(
+                    proxy_host, proxy_port, False, target_host=host
+                )
+                server.stats["requests_failed"] += 1
+                logger.error(f"❌ {description} -> {proxy_host}:{proxy_port} failed: {e}")
+                if isinstance(e, (asyncio.TimeoutError, ProxyTimeoutError)):
+                    client.fail(REP_HOST_UNREACHABLE)
+                elif isinstance(e, ConnectionRefusedError):
+                    client.fail(REP_CONNECTION_REFUSED)
+                else:
+                    client.fail(REP_GENERAL_FAILURE)
+                return
+
+            response_time = time.time() - start_time
+            await self.rotator.record_request_result(
+                proxy_host, proxy_port, True, response_time, target_host=host
+            )
+            server.stats["requests_success"] += 1
+            logger.debug(
+                f"✅ {description} -> {proxy_host}:{proxy_port} ({response_time:.3f}s)"
+            )
+
+            initial = bytes(client.buffer)
+            client.buffer.clear()
+            granted = REP4_GRANTED if client.version == SOCKS4_VERSION else REP_SUCCEEDED
+            try:
+                if client.transport is not None:
+                    await server.relay_transport(
+                        client.transport,
+                        upstream,
+                        (proxy_host, proxy_port),
+                        f"{host}:{port}",
+                        initial=initial,
+                        preamble=socks_reply(client.version, granted),
+                    )
+            finally:
+                upstream.close()
+        finally:
+            self.rotator.decrement_connections(proxy_host, proxy_port)
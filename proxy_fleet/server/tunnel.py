@@ -0,0 +1,232 @@
+"""
+CONNECT tunnelling through upstream proxies.
+
+`open_tunnel` asks an upstream SOCKS4, SOCKS5 or HTTP proxy for a connection
+to the CONNECT target and returns the connected socket. `TunnelRelay` then
+pumps bytes between the client and upstream sockets in both directions. On
+Linux the pump moves data with `os.splice` through a pipe, so payload bytes
+never enter user space; elsewhere, or when splice is not supported for the
+sockets, it copies through one fixed buffer per direction. Either way memory
+use does not depend on the amount of data relayed. A tunnel with no traffic
+in either direction for idle_timeout seconds is closed.
+"""
+
+import asyncio
+import errno
+import logging
+import os
+import socket
+import time
+from typing import Optional
+
+from python_socks import ProxyType
+from python_socks.async_.asyncio import Proxy
+
+logger = logging.getLogger(__name__)
+
+HAS_SPLICE = hasattr(os, "splice")
+# SPLICE_F_NONBLOCK only affects the pipe end; the sockets are non-blocking
+_SPLICE_FLAGS = getattr(os, "SPLICE_F_MOVE", 0) | getattr(os, "SPLICE_F_NONBLOCK", 0)
+# Errors meaning splice cannot be used for this pair of descriptors
+_SPLICE_UNSUPPORTED = {errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP}
+
+_PROXY_TYPES = {
+    "socks5": ProxyType.SOCKS5,
+    "socks4": ProxyType.SOCKS4,
+    "http": ProxyType.HTTP,
+}
+
+
+async def open_tunnel(
+    protocol: str,
+    proxy_host: str,
+    proxy_port: int,
+    target_host: str,
+    target_port: int,
+    timeout: float = 30.0,
+) -> socket.socket:
+    """
+    Connect to target_host:target_port through an upstream proxy
+
+    SOCKS5 and HTTP proxies resolve the target themselves; SOCKS4 needs an
+    address, so pass a resolved target_host for it.
+
+    Returns:
+        Connected non-blocking socket
+
+    Raises:
+        python_socks.ProxyError, ProxyConnectionError or ProxyTimeoutError
+    """
+    proxy = Proxy(
+        _PROXY_TYPES.get(protocol, ProxyType.HTTP),
+        proxy_host,
+        proxy_port,
+        rdns=protocol != "socks4",
+    )
+    sock = await proxy.connect(target_host, target_port, timeout=timeout)
+    sock.setblocking(False)
+    return sock
+
+
+class TunnelRelay:
+    """Bidirectional byte pump between a client and an upstream socket"""
+
+    def __init__(
+        self,
+        client: socket.socket,
+        upstream: socket.socket,
+        idle_timeout: float = 300.0,
+        buffer_size: int = 65536,
+        zero_copy: bool = True,
+    ):
+        """
+        Initialize relay
+
+        Args:
+            client: Non-blocking client socket
+            upstream: Non-blocking socket connected through the upstream proxy
+            idle_timeout: Seconds without traffic in either direction before
+                          the tunnel is closed
+            buffer_size: Bytes moved per step
+            zero_copy: Use os.splice where available
+        """
+        self.client = client
+        self.upstream = upstream
+        self.idle_timeout = idle_timeout
+        self.buffer_size = buffer_size
+        self.zero_copy = zero_copy and HAS_SPLICE
+
+        self.bytes_sent = 0  # client -> upstream
+        self.bytes_received = 0  # upstream -> client
+        self.spliced = False
+        self.last_activity = time.monotonic()
+
+    async def _wait(self, sock: socket.socket, writable: bool):
+        """Wait until sock is ready, raising TimeoutError when the tunnel is idle"""
+        loop = asyncio.get_running_loop()
+        fd = sock.fileno()
+        add, remove = (
+            (loop.add_writer, loop.remove_writer)
+            if writable
+            else (loop.add_reader, loop.remove_reader)
+        )
+        while True:
+            remaining = self.idle_timeout - (time.monotonic() - self.last_activity)
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f"Tunnel idle for {self.idle_timeout}s")
+            ready = loop.create_future()
+            add(fd, lambda: ready.done() or ready.set_result(None))
+            try:
+                # Traffic the other way keeps the tunnel alive, so recheck
+                await asyncio.wait_for(ready, remaining)
+                return
+            except asyncio.TimeoutError:
+                continue
+            finally:
+                remove(fd)
+
+    def _count(self, src: socket.socket, n: int):
+        self.last_activity = time.monotonic()
+        if src is self.client:
+            self.bytes_sent += n
+        else:
+            self.bytes_received += n
+
+    async def send_all(self, dst: socket.socket, data: bytes):
+        """Write data to a socket without counting it"""
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[dst.send(view):]
+            except (BlockingIOError, InterruptedError):
+                await self._wait(dst, writable=True)
+
+    async def _pump_splice(self, src: socket.socket, dst: socket.socket) -> bool:
+        """Move bytes through a pipe; False if splice is unsupported here"""
+        read_end, write_end = os.pipe()
+        moved_any = False
+        try:
+            while True:
+                try:
+                    n = os.splice(src.fileno(), write_end, self.buffer_size, flags=_SPLICE_FLAGS)
+                except (BlockingIOError, InterruptedError):
+                    await self._wait(src, writable=False)
+                    continue
+                except OSError as e:
+                    if not moved_any and e.errno in _SPLICE_UNSUPPORTED:
+                        return False
+                    raise
+                if n == 0:
+                    return True
+                moved_any = True
+                left = n
+                while left:
+                    try:
+                        left -= os.splice(read_end, dst.fileno(), left, flags=_SPLICE_FLAGS)
+                    except (BlockingIOError, InterruptedError):
+                        await self._wait(dst, writable=True)
+                self._count(src, n)
+        finally:
+            os.close(read_end)
+            os.close(write_end)
+
+    async def _pump_copy(self, src: socket.socket, dst: socket.socket):
+        """Move bytes through one reused buffer"""
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        while True:
+            try:
+                n = src.recv_into(buffer)
+            except (BlockingIOError, InterruptedError):
+                await self._wait(src, writable=False)
+                continue
+            if n == 0:
+                return
+            sent = 0
+            while sent < n:
+                try:
+                    sent += dst.send(view[sent:n])
+                except (BlockingIOError, InterruptedError):
+                    await self._wait(dst, writable=True)
+            self._count(src, n)
+
+    async def _pump(self, src: socket.socket, dst: socket.socket):
+        if not (self.zero_copy and await self._pump_splice(src, dst)):
+            await self._pump_copy(src, dst)
+        else:
+            self.spliced = True
+        # Pass the end of stream on and keep the other direction open
+        try:
+            dst.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+    async def run(self, initial: bytes = b""):
+        """
+        Relay until both directions reach end of stream
+
+        Args:
+            initial: Client bytes already read, sent upstream first
+
+        Raises:
+            asyncio.TimeoutError: If the tunnel was idle too long
+            OSError: If either connection failed
+        """
+        if initial:
+            await self.send_all(self.upstream, initial)
+            self._count(self.client, len(initial))
+
+        pumps = [
+            asyncio.create_task(self._pump(self.client, self.upstream)),
+            asyncio.create_task(self._pump(self.upstream, self.client)),
+        ]
+        try:
+            done, pending = await asyncio.wait(pumps, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                error: Optional[BaseException] = task.exception()
+                if error is not None:
+                    raise error
+        finally:
+            for task in pumps:
+                task.cancel()
+            await asyncio.gather(*pumps, return_exceptions=True)
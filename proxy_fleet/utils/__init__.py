@@ -2,6 +2,8 @@
 Utilities package initialization.
 """
 
+from .dns_cache import DNSCache, get_dns_cache
+from .geoip import GeoIPDatabase
 from .output import OutputManager, setup_logging
 from .proxy_utils import (create_proxy_from_dict, create_proxy_from_url,
                           filter_healthy_proxies, load_proxies_from_file,
@@ -24,4 +26,7 @@ __all__ = [
     "SocksValidator",
     "ProxyDownloader",
     "SocksVersion",
+    "DNSCache",
+    "get_dns_cache",
+    "GeoIPDatabase",
 ]
@@ -0,0 +1,229 @@
+"""
+Shared DNS resolution cache for validator and server paths.
+
+Validating a large proxy list resolves the same handful of names (the SOCKS4
+test target, hostname-form proxies, upstream proxies in the server) over and
+over again. This module keeps one process-wide cache with a positive TTL and
+a shorter negative TTL, and coalesces concurrent lookups of the same name so
+that a burst of validations costs a single resolution.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DNSCache:
+    """Resolver cache with TTL, negative caching and in-flight coalescing"""
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        negative_ttl: float = 30.0,
+        max_entries: int = 10000,
+    ):
+        """
+        Initialize DNS cache
+
+        Args:
+            ttl: Seconds a successful resolution is reused
+            negative_ttl: Seconds a failed resolution is remembered
+            max_entries: Maximum number of cached names (oldest evicted first)
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+
+        # (host, family) -> (expires_at, address, error)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._sync_key_locks: Dict[Tuple[str, int], threading.Lock] = {}
+        self._inflight: Dict[Tuple[int, str, int], asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    @staticmethod
+    def _is_ip_literal(host: str) -> bool:
+        try:
+            ipaddress.ip_address(host)
+            return True
+        except ValueError:
+            return False
+
+    def _lookup(self, key: Tuple[str, int]) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """Return cached (address, error) for key, or None on miss/expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, address, error = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            if address is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return address, error
+
+    def _store(self, key: Tuple[str, int], address: Optional[str], error: Optional[str]):
+        ttl = self.ttl if address is not None else self.negative_ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, address, error)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _raise_cached_error(host: str, error: Optional[str]):
+        raise socket.gaierror(f"Cannot resolve {host}: {error or 'cached failure'}")
+
+    async def resolve(self, host: str, family: int = socket.AF_INET) -> str:
+        """
+        Resolve host to an address without blocking the event loop
+
+        Args:
+            host: Hostname or IP literal
+            family: Address family to resolve for (AF_INET by default,
+                    since SOCKS4 and the raw validator sockets are IPv4)
+
+        Returns:
+            Address string
+
+        Raises:
+            socket.gaierror: If the name cannot be resolved (possibly cached)
+        """
+        if self._is_ip_literal(host):
+            return host
+
+        key = (host.lower(), family)
+        cached = self._lookup(key)
+        if cached is not None:
+            address, error = cached
+            if address is None:
+                self._raise_cached_error(host, error)
+            return address
+
+        loop = asyncio.get_running_loop()
+        inflight_key = (id(loop), key[0], family)
+        task = self._inflight.get(inflight_key)
+        if task is None:
+            self.misses += 1
+            # Run the lookup as its own task so a cancelled caller does not
+            # abort the resolution other coroutines are waiting on
+            task = loop.create_task(self._resolve_and_store(host, key, family))
+            self._inflight[inflight_key] = task
+
+            def _on_done(t: asyncio.Task):
+                self._inflight.pop(inflight_key, None)
+                if not t.cancelled():
+                    t.exception()  # mark retrieved; waiters re-raise it
+
+            task.add_done_callback(_on_done)
+
+        return await asyncio.shield(task)
+
+    async def _resolve_and_store(self, host: str, key: Tuple[str, int], family: int) -> str:
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(
+                host, None, family=family, type=socket.SOCK_STREAM
+            )
+            address = infos[0][4][0]
+        except (OSError, IndexError) as e:
+            self._store(key, None, str(e))
+            logger.debug(f"DNS resolution failed for {host}: {e}")
+            raise socket.gaierror(f"Cannot resolve {host}: {e}")
+        self._store(key, address, None)
+        return address
+
+    def resolve_sync(self, host: str, family: int = socket.AF_INET) -> str:
+        """
+        Blocking variant of resolve() for validator code running in worker threads
+
+        Concurrent threads asking for the same name wait for a single lookup.
+        """
+        if self._is_ip_literal(host):
+            return host
+
+        key = (host.lower(), family)
+        cached = self._lookup(key)
+        if cached is None:
+            with self._lock:
+                key_lock = self._sync_key_locks.setdefault(key, threading.Lock())
+            with key_lock:
+                cached = self._lookup(key)
+                if cached is None:
+                    self.misses += 1
+                    try:
+                        infos = socket.getaddrinfo(
+                            host, None, family=family, type=socket.SOCK_STREAM
+                        )
+                        address = infos[0][4][0]
+                        self._store(key, address, None)
+                        cached = (address, None)
+                    except (OSError, IndexError) as e:
+                        self._store(key, None, str(e))
+                        logger.debug(f"DNS resolution failed for {host}: {e}")
+                        cached = (None, str(e))
+            with self._lock:
+                self._sync_key_locks.pop(key, None)
+
+        address, error = cached
+        if address is None:
+            self._raise_cached_error(host, error)
+        return address
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "ttl": self.ttl,
+                "negative_ttl": self.negative_ttl,
+            }
+
+
+_shared_cache: Optional[DNSCache] = None
+
+
+def get_dns_cache() -> DNSCache:
+    """Get the process-wide DNS cache"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = DNSCache()
+    return _shared_cache
+
+
+def configure_dns_cache(
+    ttl: Optional[float] = None,
+    negative_ttl: Optional[float] = None,
+    max_entries: Optional[int] = None,
+) -> DNSCache:
+    """Adjust the process-wide DNS cache settings"""
+    cache = get_dns_cache()
+    if ttl is not None:
+        cache.ttl = ttl
+    if negative_ttl is not None:
+        cache.negative_ttl = negative_ttl
+    if max_entries is not None:
+        cache.max_entries = max_entries
+    return cache
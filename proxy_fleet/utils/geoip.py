@@ -0,0 +1,235 @@
+"""
+Offline IP-to-country lookup for region tagging.
+
+`GeoIPDatabase` answers "which country is this address in" from a local file
+instead of an HTTP probe. CSV databases are loaded into sorted arrays of
+range starts, range ends and country indexes and searched with bisect, which
+keeps a full IPv4 country table at a few MB. MMDB files (MaxMind GeoLite2 /
+DB-IP Country) are read through the optional `maxminddb` package.
+
+Supported CSV rows (a header row and "#" comments are skipped):
+    start_ip,end_ip,country[,...]     dotted/colon addresses or integers
+    network/prefix,country[,...]      CIDR notation
+"""
+
+import csv
+import ipaddress
+import logging
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+class GeoIPDatabase:
+    """Country lookup over sorted, non-overlapping IP ranges"""
+
+    def __init__(self, source: str = ""):
+        self.source = source
+        self._countries: List[str] = []
+        self._country_index: Dict[str, int] = {}
+        # IPv4 ranges fit unsigned 32-bit arrays; IPv6 needs Python ints
+        self._v4_starts = array("I")
+        self._v4_ends = array("I")
+        self._v4_countries = array("H")
+        self._v6_starts: List[int] = []
+        self._v6_ends: List[int] = []
+        self._v6_countries = array("H")
+        self._mmdb_reader = None
+
+    @classmethod
+    def from_file(cls, path: str) -> "GeoIPDatabase":
+        """
+        Load a database, picking the format from the file extension
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+            ImportError: For .mmdb files when maxminddb is not installed
+            ValueError: If no usable range was found in a CSV file
+        """
+        if not Path(path).is_file():
+            raise FileNotFoundError(f"GeoIP database not found: {path}")
+        database = cls(source=Path(path).name)
+        if path.lower().endswith(".mmdb"):
+            database._open_mmdb(path)
+        else:
+            database._load_csv(path)
+        return database
+
+    def __len__(self) -> int:
+        return len(self._v4_starts) + len(self._v6_starts)
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """
+        Get the ISO country code for an IP address
+
+        Returns:
+            Upper-case country code, or None for unknown addresses and hostnames
+        """
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+
+        if self._mmdb_reader is not None:
+            return self._lookup_mmdb(address)
+
+        if address.version == 4:
+            starts, ends, countries = self._v4_starts, self._v4_ends, self._v4_countries
+        else:
+            starts, ends, countries = self._v6_starts, self._v6_ends, self._v6_countries
+        value = int(address)
+        index = bisect_right(starts, value) - 1
+        if index >= 0 and value <= ends[index]:
+            return self._countries[countries[index]]
+        return None
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            "source": self.source,
+            "format": "mmdb" if self._mmdb_reader is not None else "csv",
+            "ipv4_ranges": len(self._v4_starts),
+            "ipv6_ranges": len(self._v6_starts),
+            "countries": len(self._countries),
+        }
+
+    def close(self):
+        if self._mmdb_reader is not None:
+            self._mmdb_reader.close()
+            self._mmdb_reader = None
+
+    def _open_mmdb(self, path: str):
+        try:
+            import maxminddb
+        except ImportError:
+            raise ImportError(
+                "maxminddb package required for .mmdb GeoIP databases: pip install maxminddb"
+            )
+        self._mmdb_reader = maxminddb.open_database(path)
+
+    def _lookup_mmdb(self, address: IPAddress) -> Optional[str]:
+        try:
+            record = self._mmdb_reader.get(str(address))
+        except ValueError:
+            return None
+        if not isinstance(record, dict):
+            return None
+        # GeoLite2/DB-IP "Country" layout, then flat "country_code" layouts
+        for field in ("country", "registered_country"):
+            code = (record.get(field) or {}).get("iso_code")
+            if code:
+                return code.upper()
+        code = record.get("country_code")
+        return code.upper() if isinstance(code, str) and code else None
+
+    def _load_csv(self, path: str):
+        v4: List[Tuple[int, int, str]] = []
+        v6: List[Tuple[int, int, str]] = []
+        skipped = 0
+
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.reader(f):
+                if not row or row[0].lstrip().startswith("#"):
+                    continue
+                parsed = self._parse_row(row)
+                if parsed is None:
+                    skipped += 1
+                    continue
+                version, start, end, country = parsed
+                (v4 if version == 4 else v6).append((start, end, country))
+
+        if not v4 and not v6:
+            raise ValueError(f"No IP ranges found in GeoIP database {path}")
+
+        self._build(v4, self._v4_starts, self._v4_ends, self._v4_countries)
+        self._build(v6, self._v6_starts, self._v6_ends, self._v6_countries)
+        logger.info(
+            f"Loaded GeoIP database {self.source}: {len(self._v4_starts)} IPv4 and "
+            f"{len(self._v6_starts)} IPv6 ranges ({skipped} rows skipped)"
+        )
+
+    @staticmethod
+    def _parse_address(value: str) -> Optional[Tuple[int, int]]:
+        """Parse a dotted/colon address or integer into (version, value)"""
+        value = value.strip()
+        if value.isdigit():
+            number = int(value)
+            return (4 if number <= 0xFFFFFFFF else 6), number
+        try:
+            address = ipaddress.ip_address(value)
+        except ValueError:
+            return None
+        return address.version, int(address)
+
+    def _parse_row(self, row: List[str]) -> Optional[Tuple[int, int, int, str]]:
+        if "/" in row[0] and len(row) >= 2:
+            try:
+                network = ipaddress.ip_network(row[0].strip(), strict=False)
+            except ValueError:
+                return None
+            start = int(network.network_address)
+            end = int(network.broadcast_address)
+            version, country = network.version, row[1]
+        elif len(row) >= 3:
+            first = self._parse_address(row[0])
+            last = self._parse_address(row[1])
+            if first is None or last is None or first[0] != last[0]:
+                return None
+            version, start, end, country = first[0], first[1], last[1], row[2]
+        else:
+            return None
+
+        country = country.strip().strip('"').upper()
+        # "-" and "ZZ" mark unassigned space in common databases
+        if len(country) != 2 or not country.isalpha() or country == "ZZ" or start > end:
+            return None
+        return version, start, end, country
+
+    def _build(self, ranges, starts, ends, countries):
+        """Sort ranges, merge adjacent ones of the same country, fill arrays"""
+        ranges.sort()
+        for start, end, country in ranges:
+            index = self._country_index.get(country)
+            if index is None:
+                index = self._country_index[country] = len(self._countries)
+                self._countries.append(country)
+            if starts and countries[-1] == index and start <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], end)
+                continue
+            if starts and start <= ends[-1]:
+                # Overlapping range of another country: keep the first one
+                if end <= ends[-1]:
+                    continue
+                start = ends[-1] + 1
+            starts.append(start)
+            ends.append(end)
+            countries.append(index)
+
+
+async def lookup_host(
+    database: GeoIPDatabase, host: str, dns_cache=None
+) -> Optional[Dict[str, str]]:
+    """
+    Tag a proxy host with its country, resolving hostnames through the DNS cache
+
+    Returns:
+        {"country": code, "source": database file name}, or None if unknown
+    """
+    try:
+        ipaddress.ip_address(host)
+        address = host
+    except ValueError:
+        from .dns_cache import get_dns_cache
+
+        try:
+            address = await (dns_cache or get_dns_cache()).resolve(host)
+        except OSError:
+            return None
+    country = database.lookup(address)
+    if country is None:
+        return None
+    return {"country": country, "source": database.source}
@@ -0,0 +1,294 @@
+"""
+In-process mock proxies for offline validator benchmarks.
+
+`MockProxyFarm` starts asyncio SOCKS4, SOCKS5 and HTTP proxy stand-ins on
+localhost ports. Each one follows a `MockProxyBehavior`: it can add latency
+before replying, refuse connections, accept and never answer (black hole) or
+require credentials. After a successful handshake the stand-in answers the
+tunnelled HTTP request itself with a small JSON body (or n zero bytes for a
+/bytes/{n} path) instead of connecting anywhere, so the whole validation
+path, bandwidth tests included, runs without network access.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import re
+import socket
+import struct
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Request path (absolute URI for plain HTTP proxies) asking for n bytes
+_BYTES_PATH = re.compile(r"/bytes/(\d+)(?:\?|$)")
+
+
+@dataclass
+class MockProxyBehavior:
+    """How a mock proxy responds"""
+
+    protocol: str = "socks5"  # socks4, socks5 or http
+    latency: float = 0.0  # seconds before each reply
+    refuse: bool = False  # port is closed, connections are refused
+    blackhole: bool = False  # accept, read and never answer
+    username: Optional[str] = None  # require credentials when set
+    password: Optional[str] = None
+
+
+class MockProxyFarm:
+    """A set of mock proxies listening on localhost"""
+
+    def __init__(self, host: str = "127.0.0.1"):
+        self.host = host
+        self.proxies: List[Dict[str, Any]] = []
+        self._servers: List[asyncio.AbstractServer] = []
+        self._refusing: List[socket.socket] = []
+        self._handlers: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self.connections = 0
+        self.handshakes = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    async def add(
+        self, behavior: MockProxyBehavior, count: int = 1
+    ) -> List[Dict[str, Any]]:
+        """
+        Start count mock proxies with the given behavior
+
+        Returns:
+            Proxy dicts with host, port, protocol and behavior
+        """
+        added = []
+        for _ in range(count):
+            if behavior.refuse:
+                # A bound but non-listening socket holds the port so that
+                # connects are refused and no later server can reuse it
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.bind((self.host, 0))
+                self._refusing.append(sock)
+                port = sock.getsockname()[1]
+            else:
+                server = await asyncio.start_server(
+                    lambda r, w, b=behavior: self._handle_client(r, w, b),
+                    self.host,
+                    0,
+                )
+                self._servers.append(server)
+                port = server.sockets[0].getsockname()[1]
+            proxy = {
+                "host": self.host,
+                "port": port,
+                "protocol": behavior.protocol,
+                "behavior": behavior,
+            }
+            self.proxies.append(proxy)
+            added.append(proxy)
+        return added
+
+    async def stop(self):
+        """Close every listening mock proxy"""
+        for server in self._servers:
+            server.close()
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers.clear()
+        # Listening sockets are closed, drop connections still being served
+        for writer in list(self._handlers.values()):
+            writer.transport.abort()
+        if self._handlers:
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+        for sock in self._refusing:
+            sock.close()
+        self._refusing.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "proxies": len(self.proxies),
+            "listening": len(self._servers),
+            "connections": self.connections,
+            "handshakes": self.handshakes,
+        }
+
+    async def _handle_client(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        behavior: MockProxyBehavior,
+    ):
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        try:
+            if behavior.blackhole:
+                while await reader.read(4096):
+                    pass
+                return
+            if behavior.latency:
+                await asyncio.sleep(behavior.latency)
+
+            if behavior.protocol == "socks5":
+                ok = await self._socks5_handshake(reader, writer, behavior)
+            elif behavior.protocol == "socks4":
+                ok = await self._socks4_handshake(reader, writer, behavior)
+            else:
+                ok = await self._http_handshake(reader, writer, behavior)
+
+            if ok:
+                await self._serve_origin(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            pass
+        except Exception as e:
+            logger.debug(f"Mock proxy error: {e}")
+        finally:
+            self._handlers.pop(task, None)
+            writer.close()
+
+    async def _socks5_handshake(self, reader, writer, behavior) -> bool:
+        version, nmethods = await reader.readexactly(2)
+        methods = await reader.readexactly(nmethods)
+        if version != 0x05:
+            return False
+
+        if behavior.username is not None:
+            if 0x02 not in methods:
+                writer.write(b"\x05\xff")
+                await writer.drain()
+                return False
+            writer.write(b"\x05\x02")
+            await writer.drain()
+            # RFC 1929 username/password sub-negotiation
+            _, ulen = await reader.readexactly(2)
+            username = (await reader.readexactly(ulen)).decode("utf-8", "replace")
+            (plen,) = await reader.readexactly(1)
+            password = (await reader.readexactly(plen)).decode("utf-8", "replace")
+            if username != behavior.username or password != (behavior.password or ""):
+                writer.write(b"\x01\x01")
+                await writer.drain()
+                return False
+            writer.write(b"\x01\x00")
+        else:
+            if 0x00 not in methods:
+                writer.write(b"\x05\xff")
+                await writer.drain()
+                return False
+            writer.write(b"\x05\x00")
+        await writer.drain()
+        self.handshakes += 1
+
+        # CONNECT request: VER CMD RSV ATYP DST.ADDR DST.PORT
+        _, cmd, _, atyp = await reader.readexactly(4)
+        if atyp == 0x01:
+            await reader.readexactly(4)
+        elif atyp == 0x03:
+            (length,) = await reader.readexactly(1)
+            await reader.readexactly(length)
+        elif atyp == 0x04:
+            await reader.readexactly(16)
+        await reader.readexactly(2)
+        if cmd != 0x01:
+            writer.write(b"\x05\x07\x00\x01" + b"\x00" * 6)
+            await writer.drain()
+            return False
+        writer.write(b"\x05\x00\x00\x01" + b"\x00" * 6)
+        await writer.drain()
+        return True
+
+    async def _socks4_handshake(self, reader, writer, behavior) -> bool:
+        header = await reader.readexactly(8)
+        version, cmd, _ = struct.unpack(">BBH", header[:4])
+        userid = (await reader.readuntil(b"\x00"))[:-1].decode("utf-8", "replace")
+        if header[4:7] == b"\x00\x00\x00" and header[7] != 0:
+            await reader.readuntil(b"\x00")  # SOCKS4a domain name
+        if version != 0x04 or cmd != 0x01:
+            writer.write(b"\x00\x5b" + b"\x00" * 6)
+            await writer.drain()
+            return False
+        if behavior.username is not None and userid != behavior.username:
+            writer.write(b"\x00\x5d" + b"\x00" * 6)
+            await writer.drain()
+            return False
+        writer.write(b"\x00\x5a" + b"\x00" * 6)
+        await writer.drain()
+        self.handshakes += 1
+        return True
+
+    async def _http_handshake(self, reader, writer, behavior) -> bool:
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        method = lines[0].split(" ", 1)[0].upper()
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        if behavior.username is not None:
+            expected = base64.b64encode(
+                f"{behavior.username}:{behavior.password or ''}".encode("utf-8")
+            ).decode("ascii")
+            if headers.get("proxy-authorization") != f"Basic {expected}":
+                writer.write(
+                    b"HTTP/1.1 407 Proxy Authentication Required\r\n"
+                    b'Proxy-Authenticate: Basic realm="mock"\r\n'
+                    b"Content-Length: 0\r\nConnection: close\r\n\r\n"
+                )
+                await writer.drain()
+                return False
+
+        self.handshakes += 1
+        if method == "CONNECT":
+            writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            await writer.drain()
+            return True
+
+        # Plain HTTP proxy request: answer it as the origin would
+        await self._write_origin_response(writer, lines[0])
+        return False
+
+    async def _serve_origin(self, reader, writer):
+        """Answer tunnelled plain-HTTP requests"""
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                return
+            request_line = head.decode("latin-1").split("\r\n", 1)[0]
+            await self._write_origin_response(writer, request_line)
+            if b"\r\nconnection: close\r\n" in head.lower():
+                return
+
+    async def _write_origin_response(self, writer, request_line: str):
+        parts = request_line.split(" ")
+        match = _BYTES_PATH.search(parts[1]) if len(parts) > 1 else None
+        if match:
+            remaining = int(match.group(1))
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/octet-stream\r\n"
+                + f"Content-Length: {remaining}\r\n".encode("ascii")
+                + b"Connection: keep-alive\r\n\r\n"
+            )
+            chunk = b"\x00" * 65536
+            while remaining > 0:
+                writer.write(chunk[:remaining])
+                remaining -= len(chunk)
+                await writer.drain()
+            return
+
+        peer = writer.get_extra_info("peername")
+        body = json.dumps({"ip": peer[0] if peer else self.host}).encode("utf-8")
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\n".encode("ascii")
+            + b"Connection: keep-alive\r\n\r\n"
+            + body
+        )
+        await writer.drain()
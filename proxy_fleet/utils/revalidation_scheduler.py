@@ -0,0 +1,358 @@
+"""
+Continuous revalidation of stored proxies.
+
+`RevalidationScheduler` keeps every stored proxy in a priority queue ordered
+by its next due time instead of sweeping the whole pool at once. Each result
+sets the proxy's next interval: stable proxies are checked less and less
+often, failing proxies back off exponentially and proxies that flip between
+working and failing are rechecked soon. Checks start at a steady rate and
+their results reach storage in batches.
+"""
+
+import asyncio
+import functools
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProxySchedule:
+    """Scheduling state of one proxy"""
+
+    host: str
+    port: int
+    protocol: str
+    due: float = 0.0  # time.time() of the next check
+    interval: float = 0.0
+    consecutive_successes: int = 0
+    consecutive_failures: int = 0
+    history: Deque[bool] = field(default_factory=lambda: deque(maxlen=6))
+
+    @property
+    def proxy_key(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    @property
+    def flips(self) -> int:
+        """Number of valid/invalid changes in the recent history"""
+        outcomes = list(self.history)
+        return sum(1 for a, b in zip(outcomes, outcomes[1:]) if a != b)
+
+
+class RevalidationScheduler:
+    """Rate-limited revalidation of stored proxies ordered by next due time"""
+
+    def __init__(
+        self,
+        storage,
+        validator,
+        rate: float = 5.0,
+        concurrency: int = 50,
+        base_interval: float = 3600.0,
+        min_interval: float = 300.0,
+        max_interval: float = 86400.0,
+        flap_threshold: int = 2,
+        flush_interval: float = 2.0,
+        flush_size: int = 200,
+        refresh_interval: float = 60.0,
+        check_timeout: Optional[float] = None,
+    ):
+        """
+        Initialize revalidation scheduler
+
+        Args:
+            storage: ProxyStorage to read proxies from and write results to
+            validator: SocksValidator used for each check
+            rate: Checks started per second at most
+            concurrency: Checks in flight at most
+            base_interval: Interval after the first success (seconds)
+            min_interval: Shortest interval, used after the first failure
+                          and for flapping proxies
+            max_interval: Longest interval for stable or dead proxies
+            flap_threshold: Valid/invalid flips within the last six checks
+                            that mark a proxy as flapping
+            flush_interval: Seconds between batched storage writes
+            flush_size: Pending results that trigger a write early
+            refresh_interval: Seconds between rescans of storage for added
+                              or removed proxies
+            check_timeout: Time limit per check (default: validator timeout + 5)
+        """
+        self.storage = storage
+        self.validator = validator
+        self.rate = rate
+        self.concurrency = concurrency
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.flap_threshold = flap_threshold
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.refresh_interval = refresh_interval
+        self.check_timeout = check_timeout or validator.timeout + 5
+
+        self.schedules: Dict[str, ProxySchedule] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_refresh = 0.0
+
+        self.checked = 0
+        self.valid = 0
+        self.flushes = 0
+        self.started_at = time.monotonic()
+
+    def next_interval(self, schedule: ProxySchedule, is_valid: bool) -> float:
+        """
+        Record a result and return the seconds until the proxy's next check
+
+        Each success in a row doubles the interval from base_interval. A
+        failure is rechecked after min_interval, doubling with every further
+        failure so dead proxies fade out. Flapping proxies stay at
+        min_interval. Intervals are capped at max_interval, and a ±10% jitter
+        keeps proxies from clumping together.
+        """
+        schedule.history.append(is_valid)
+        if is_valid:
+            schedule.consecutive_successes += 1
+            schedule.consecutive_failures = 0
+            start, streak = self.base_interval, schedule.consecutive_successes
+        else:
+            schedule.consecutive_failures += 1
+            schedule.consecutive_successes = 0
+            start, streak = self.min_interval, schedule.consecutive_failures
+
+        if schedule.flips >= self.flap_threshold:
+            interval = self.min_interval
+        else:
+            interval = start * 2 ** min(streak - 1, 32)
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        schedule.interval = interval
+        return interval * random.uniform(0.9, 1.1)
+
+    def _push(self, schedule: ProxySchedule):
+        heapq.heappush(self._heap, (schedule.due, next(self._sequence), schedule.proxy_key))
+
+    def refresh(self, now: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Sync the schedule with storage
+
+        New proxies are due base_interval (valid) or min_interval (failed)
+        after their last test, right away if never tested; proxies removed
+        from storage are dropped.
+
+        Returns:
+            (added, removed) counts
+        """
+        now = now or time.time()
+        stored = self.storage.load_proxy_data().get("proxies", {})
+        added = 0
+        for proxy_key, record in stored.items():
+            if proxy_key in self.schedules:
+                continue
+            schedule = ProxySchedule(
+                host=record["host"],
+                port=record["port"],
+                protocol=record.get("protocol", "socks5"),
+            )
+            last_test = record.get("last_test_time")
+            if record.get("is_valid"):
+                schedule.consecutive_successes = 1
+                schedule.interval = self.base_interval
+            else:
+                schedule.consecutive_failures = 1 if last_test else 0
+                schedule.interval = self.min_interval
+            schedule.due = now
+            if last_test:
+                try:
+                    tested_at = datetime.fromisoformat(last_test).timestamp()
+                    schedule.due = max(now, tested_at + schedule.interval)
+                except ValueError:
+                    pass
+            self.schedules[proxy_key] = schedule
+            self._push(schedule)
+            added += 1
+
+        removed = [key for key in self.schedules if key not in stored]
+        for proxy_key in removed:
+            # Heap entries of removed proxies are skipped when popped
+            del self.schedules[proxy_key]
+        self._last_refresh = now
+        return added, len(removed)
+
+    def _pop_due(self, now: float) -> Optional[ProxySchedule]:
+        """Pop the next due schedule, skipping stale heap entries"""
+        while self._heap:
+            due, _, proxy_key = self._heap[0]
+            schedule = self.schedules.get(proxy_key)
+            if schedule is None or schedule.due != due:
+                heapq.heappop(self._heap)
+                continue
+            if due > now:
+                return None
+            heapq.heappop(self._heap)
+            return schedule
+        return None
+
+    def seconds_until_due(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds until the earliest scheduled check, None if nothing is scheduled"""
+        now = now or time.time()
+        while self._heap:
+            due, _, proxy_key = self._heap[0]
+            schedule = self.schedules.get(proxy_key)
+            if schedule is None or schedule.due != due:
+                heapq.heappop(self._heap)
+                continue
+            return max(due - now, 0.0)
+        return None
+
+    async def _check(self, schedule: ProxySchedule):
+        host, port, protocol = schedule.host, schedule.port, schedule.protocol
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(
+                self.validator.async_handshake(host, port, protocol),
+                timeout=self.check_timeout,
+            )
+            response_time = time.monotonic() - started
+            if result.is_valid:
+                result = await asyncio.wait_for(
+                    self.validator.async_server_check(result, host, port, protocol),
+                    timeout=self.check_timeout,
+                )
+        except asyncio.TimeoutError:
+            result = None
+        except Exception as e:
+            logger.debug(f"Revalidation of {schedule.proxy_key} failed: {e}")
+            result = None
+
+        is_valid = bool(result is not None and result.is_valid)
+        update: Dict[str, Any] = {
+            "host": host,
+            "port": port,
+            "is_valid": is_valid,
+            "proxy_type": protocol,
+        }
+        if is_valid:
+            update.update(
+                request_test_result=result.ip_info if isinstance(result.ip_info, dict) else None,
+                response_time=response_time,
+                anonymity=result.anonymity,
+                capabilities=result.capabilities,
+            )
+        self._pending.append(update)
+        self.checked += 1
+        self.valid += is_valid
+
+        if schedule.proxy_key in self.schedules:
+            schedule.due = time.time() + self.next_interval(schedule, is_valid)
+            self._push(schedule)
+            # A due time earlier than the dispatcher's sleep target wakes it up
+            self._wakeup.set()
+
+    async def flush(self):
+        """Write pending results to storage in one batch"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        loop = asyncio.get_event_loop()
+        # A proxy removed while it was being checked must stay removed
+        await loop.run_in_executor(
+            None, functools.partial(self.storage.update_proxy_statuses, batch, existing_only=True)
+        )
+        self.flushes += 1
+
+    async def _flush_loop(self):
+        while True:
+            deadline = time.monotonic() + self.flush_interval
+            while time.monotonic() < deadline and len(self._pending) < self.flush_size:
+                await asyncio.sleep(min(0.2, self.flush_interval))
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to write revalidation results: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        due_now = sum(1 for s in self.schedules.values() if s.due <= now)
+        flapping = sum(1 for s in self.schedules.values() if s.flips >= self.flap_threshold)
+        elapsed = time.monotonic() - self.started_at
+        next_due = self.seconds_until_due(now)
+        return {
+            "scheduled": len(self.schedules),
+            "due_now": due_now,
+            "flapping": flapping,
+            "checked": self.checked,
+            "valid": self.valid,
+            "pending_writes": len(self._pending),
+            "flushes": self.flushes,
+            "rate": round(self.checked / elapsed, 2) if elapsed > 0 else 0.0,
+            "next_due_in": round(next_due, 1) if next_due is not None else None,
+        }
+
+    async def run(self, stop_event: Optional[asyncio.Event] = None):
+        """Revalidate until stop_event is set (or forever), then flush results"""
+        stop_event = stop_event or asyncio.Event()
+        self._wakeup = asyncio.Event()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        spacing = 1.0 / self.rate if self.rate > 0 else 0.0
+        next_start = time.monotonic()
+        tasks = set()
+
+        self.refresh()
+        flush_task = asyncio.create_task(self._flush_loop())
+        try:
+            while not stop_event.is_set():
+                now = time.time()
+                if now - self._last_refresh >= self.refresh_interval:
+                    added, removed = self.refresh(now)
+                    if added or removed:
+                        logger.info(f"Revalidation schedule: +{added} / -{removed} proxies")
+
+                schedule = self._pop_due(now)
+                if schedule is None:
+                    wait = self.seconds_until_due(now)
+                    wait = self.refresh_interval if wait is None else min(wait, self.refresh_interval)
+                    self._wakeup.clear()
+                    waiters = [
+                        asyncio.ensure_future(stop_event.wait()),
+                        asyncio.ensure_future(self._wakeup.wait()),
+                    ]
+                    await asyncio.wait(waiters, timeout=max(wait, 0.01), return_when=asyncio.FIRST_COMPLETED)
+                    for waiter in waiters:
+                        waiter.cancel()
+                    continue
+
+                # Steady start rate: one check every 1/rate seconds
+                delay = next_start - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_start = max(next_start, time.monotonic()) + spacing
+
+                await semaphore.acquire()
+                task = asyncio.create_task(self._check(schedule))
+                tasks.add(task)
+
+                def _done(t, task_set=tasks):
+                    task_set.discard(t)
+                    semaphore.release()
+
+                task.add_done_callback(_done)
+        finally:
+            if tasks:
+                await asyncio.wait(tasks, timeout=self.check_timeout)
+            flush_task.cancel()
+            try:
+                await flush_task
+            except asyncio.CancelledError:
+                pass
+            await self.flush()
@@ -11,15 +11,83 @@ Implementation references:
 """
 
 import asyncio
+import hashlib
 import json
 import logging
+import re
 import socket
 import struct
+import time
 from enum import Enum
-from typing import Any, Dict, Optional, Tuple, Union
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from .dns_cache import DNSCache, get_dns_cache
 
 logger = logging.getLogger(__name__)
 
+# Headers a proxy adds when it announces itself or forwards the client address
+PROXY_REVEALING_HEADERS = (
+    "via",
+    "x-forwarded-for",
+    "forwarded",
+    "x-real-ip",
+    "client-ip",
+    "x-client-ip",
+    "x-proxy-id",
+    "proxy-connection",
+    "x-forwarded-host",
+    "x-forwarded-proto",
+)
+
+ANONYMITY_LEVELS = ("transparent", "anonymous", "elite")
+
+# Bandwidth samples timing fewer bytes or less time than this are noise
+MIN_BANDWIDTH_SAMPLE_BYTES = 16 * 1024
+MIN_BANDWIDTH_SAMPLE_TIME = 0.01
+
+_ADDRESS_TOKEN = re.compile(r"[0-9A-Fa-f:.]+")
+
+
+def _header_mentions_ip(value: str, ip: str) -> bool:
+    """Whether a header value contains ip as a whole address (optionally with :port)"""
+    for token in _ADDRESS_TOKEN.findall(value):
+        if token == ip or token.rsplit(":", 1)[0] == ip:
+            return True
+    return False
+
+
+def classify_anonymity(judge_data: Dict[str, Any], real_ip: Optional[str]) -> str:
+    """
+    Classify a proxy from what the judge saw of a request sent through it
+
+    Args:
+        judge_data: Judge response with the peer "ip" and request "headers"
+        real_ip: Our own address as seen by the judge without a proxy
+
+    Returns:
+        "transparent" if our address leaks, "anonymous" if the proxy reveals
+        itself but not our address, "elite" otherwise
+    """
+    headers = {
+        str(name).lower(): str(value)
+        for name, value in (judge_data.get("headers") or {}).items()
+    }
+    if real_ip:
+        if judge_data.get("ip") == real_ip:
+            return "transparent"
+        # Host is set by us, everything else may have been added on the way
+        if any(
+            _header_mentions_ip(value, real_ip)
+            for name, value in headers.items()
+            if name != "host"
+        ):
+            return "transparent"
+    if any(name in headers for name in PROXY_REVEALING_HEADERS):
+        return "anonymous"
+    return "elite"
+
 
 class SocksVersion(Enum):
     """SOCKS protocol versions"""
@@ -38,11 +106,15 @@ class ValidationResult:
         version: Optional[SocksVersion] = None,
         ip_info: Optional[Dict[str, Any]] = None,
         error: Optional[str] = None,
+        anonymity: Optional[str] = None,
     ):
         self.is_valid = is_valid
         self.version = version
         self.ip_info = ip_info
         self.error = error
+        self.anonymity = anonymity  # transparent / anonymous / elite, if judged
+        # HTTP proxies only: {"http": bool, "connect": bool}
+        self.capabilities: Optional[Dict[str, bool]] = None
 
     def __str__(self):
         if not self.is_valid:
@@ -63,11 +135,30 @@ class ValidationResult:
 class SocksValidator:
     """Validates SOCKS proxies using raw socket handshake"""
 
+    PROBE_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+    # Response headers kept in request check results
+    PROBE_HEADER_ALLOWLIST = (
+        "Content-Type",
+        "Content-Length",
+        "Content-Encoding",
+        "Server",
+        "Date",
+        "Location",
+        "Via",
+    )
+
     def __init__(
         self, 
         timeout: float = 10.0, 
         check_server_via_request: bool = False,
-        request_url: Optional[str] = None
+        request_url: Optional[str] = None,
+        dns_cache: Optional[DNSCache] = None,
+        judge_url: Optional[str] = None,
+        real_ip: Optional[str] = None,
+        http_test_url: str = "http://httpbin.org/ip",
+        connect_target: str = "httpbin.org:443",
+        max_probe_bytes: int = 8192,
     ):
         """
         Initialize SOCKS validator
@@ -78,10 +169,28 @@ class SocksValidator:
             request_url: URL to test with for HTTP request validation. If provided and 
                         check_server_via_request is True, the proxy is only considered 
                         valid if this URL returns 2XX or 3XX status codes
+            dns_cache: Resolver cache for proxy hosts and test targets
+                       (defaults to the process-wide shared cache)
+            judge_url: Proxy judge URL (see server.judge_server). When set, a
+                       valid proxy is also classified as transparent,
+                       anonymous or elite
+            real_ip: Our address as seen by the judge; fetched from the judge
+                     directly on first use when not given
+            http_test_url: Plain-HTTP URL fetched through HTTP proxies
+            connect_target: host:port HTTP proxies are asked to CONNECT to
+            max_probe_bytes: Most response body bytes read by any probe; the
+                             transfer is aborted beyond that
         """
         self.timeout = timeout
         self.check_server_via_request = check_server_via_request
         self.request_url = request_url
+        self.dns_cache = dns_cache or get_dns_cache()
+        self.judge_url = judge_url
+        self.real_ip = real_ip
+        self._real_ip_lock = None  # created lazily inside the running loop
+        self.http_test_url = http_test_url
+        self.connect_target = connect_target
+        self.max_probe_bytes = max_probe_bytes
         
         # For backward compatibility, keep the old parameter name
         self.check_ip_info = check_server_via_request and request_url is not None
@@ -126,7 +235,7 @@ class SocksValidator:
             elif protocol in ["socks5"]:
                 return self.validate_socks5(host, port)
             elif protocol in ["http", "https"]:
-                return self.validate_http(host, port)
+                return await self.async_validate_http(host, port)
             else:
                 return ValidationResult(
                     False, error=f"Unsupported protocol: {protocol}"
@@ -153,46 +262,43 @@ class SocksValidator:
             return None
             
         try:
-            import aiohttp
-
-            # 根據代理類型選擇不同的連接方式
-            if protocol in ["socks4", "socks5"]:
-                # 使用 aiohttp-socks 處理 SOCKS 代理
-                from aiohttp_socks import ProxyConnector, ProxyType
-                
-                proxy_type = ProxyType.SOCKS5 if protocol == "socks5" else ProxyType.SOCKS4
-                connector = ProxyConnector(proxy_type=proxy_type, host=host, port=port)
-                session_kwargs = {"connector": connector}
-                
-            elif protocol == "http":
-                # 使用標準 HTTP 代理
-                connector = aiohttp.TCPConnector()
-                proxy_url = f"http://{host}:{port}"
-                session_kwargs = {
-                    "connector": connector,
-                    "proxy": proxy_url
-                }
-                
-            else:
-                logger.warning(f"Unsupported proxy protocol: {protocol}")
+            session_kwargs = await self._proxy_session_kwargs(host, port, protocol)
+            if session_kwargs is None:
                 return None
+            proxy_url = session_kwargs.pop("proxy", None)
+
+            import aiohttp
 
             async with aiohttp.ClientSession(
                 timeout=aiohttp.ClientTimeout(total=self.timeout),
+                **self._probe_session_options(),
                 **session_kwargs
             ) as session:
-                async with session.get(self.request_url) as response:
+                async with session.get(
+                    self.request_url,
+                    proxy=proxy_url,
+                    headers={"Accept-Encoding": "identity"},
+                ) as response:
                     # 只有 2XX 或 3XX 狀態碼才視為成功
                     is_success = 200 <= response.status < 400
                     
-                    response_text = await response.text()
+                    # Only the first max_probe_bytes are read, the rest of the
+                    # transfer is aborted
+                    response_text = (await self._read_capped(response)).decode(
+                        response.get_encoding() if response.charset else "utf-8",
+                        errors="replace",
+                    )
                     
                     result = {
                         "url": self.request_url,
                         "status_code": response.status,
                         "success": is_success,
                         "response_body": response_text[:1024] if response_text else None,
-                        "headers": dict(response.headers)
+                        "headers": {
+                            name: response.headers[name]
+                            for name in self.PROBE_HEADER_ALLOWLIST
+                            if name in response.headers
+                        },
                     }
                     
                     # 嘗試解析 JSON 並提取位置信息
@@ -211,8 +317,8 @@ class SocksValidator:
                                     'ip': response_json.get('ip'),
                                     'full_response': response_json
                                 }
-                        except json.JSONDecodeError:
-                            # 如果不是 JSON 格式，不影響成功狀態
+                        except (json.JSONDecodeError, AttributeError):
+                            # 如果不是 JSON 格式（或被截斷），不影響成功狀態
                             pass
                     
                     if is_success:
@@ -238,6 +344,224 @@ class SocksValidator:
             logger.debug(f"Failed to test {self.request_url} via {protocol.upper()} {host}:{port}: {e}")
             return None
 
+    async def _proxy_session_kwargs(
+        self, host: str, port: int, protocol: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Build aiohttp.ClientSession arguments for requests through a proxy
+
+        Returns:
+            Dict with "connector" and, for HTTP proxies, "proxy" (the proxy URL
+            to pass per request), or None for unsupported protocols
+        """
+        import aiohttp
+
+        # Resolve the proxy host through the shared cache instead of
+        # letting every connector do its own lookup
+        host = await self.dns_cache.resolve(host)
+
+        # 根據代理類型選擇不同的連接方式
+        if protocol in ["socks4", "socks5"]:
+            # 使用 aiohttp-socks 處理 SOCKS 代理
+            from aiohttp_socks import ProxyConnector, ProxyType
+
+            proxy_type = ProxyType.SOCKS5 if protocol == "socks5" else ProxyType.SOCKS4
+            return {
+                "connector": ProxyConnector(proxy_type=proxy_type, host=host, port=port)
+            }
+        elif protocol == "http":
+            # 使用標準 HTTP 代理
+            return {"connector": aiohttp.TCPConnector(), "proxy": f"http://{host}:{port}"}
+
+        logger.warning(f"Unsupported proxy protocol: {protocol}")
+        return None
+
+    def _probe_session_options(self) -> Dict[str, Any]:
+        """ClientSession options that keep probe responses small"""
+        return {
+            # A compressed body could expand far beyond the read cap
+            "auto_decompress": False,
+            "read_bufsize": min(self.max_probe_bytes, 2**16),
+        }
+
+    async def _read_capped(self, response) -> bytes:
+        """
+        Read at most max_probe_bytes of a response body, then abort the transfer
+
+        The connection is closed instead of drained, so a hostile proxy
+        sending an endless body costs no more than the cap.
+        """
+        buffer = bytearray()
+        try:
+            while len(buffer) < self.max_probe_bytes:
+                chunk = await response.content.read(self.max_probe_bytes - len(buffer))
+                if not chunk:
+                    break
+                buffer += chunk
+        finally:
+            if not response.content.at_eof():
+                response.close()
+        return bytes(buffer)
+
+    async def _fetch_judge(self, session_kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """GET the judge URL and return its JSON echo, or None"""
+        import aiohttp
+
+        proxy_url = session_kwargs.pop("proxy", None)
+        async with aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            **self._probe_session_options(),
+            **session_kwargs
+        ) as session:
+            async with session.get(
+                self.judge_url, proxy=proxy_url, headers={"Accept-Encoding": "identity"}
+            ) as response:
+                if response.status != 200:
+                    return None
+                try:
+                    data = json.loads(await self._read_capped(response))
+                except ValueError:
+                    return None
+                return data if isinstance(data, dict) else None
+
+    async def get_real_ip(self) -> Optional[str]:
+        """Our own address as seen by the judge (fetched once, then cached)"""
+        if self.real_ip or not self.judge_url:
+            return self.real_ip
+        if self._real_ip_lock is None:
+            self._real_ip_lock = asyncio.Lock()
+        async with self._real_ip_lock:
+            if self.real_ip is None:
+                try:
+                    import aiohttp
+
+                    data = await self._fetch_judge({"connector": aiohttp.TCPConnector()})
+                    self.real_ip = data.get("ip") if data else None
+                except Exception as e:
+                    logger.warning(f"Cannot reach proxy judge {self.judge_url} directly: {e}")
+        return self.real_ip
+
+    async def check_anonymity(
+        self, host: str, port: int, protocol: str = "socks5"
+    ) -> Optional[str]:
+        """
+        Request the judge through the proxy and classify the proxy's anonymity
+
+        Returns:
+            "transparent", "anonymous" or "elite", or None if the judge could
+            not be reached through the proxy
+        """
+        if not self.judge_url:
+            return None
+        real_ip = await self.get_real_ip()
+        try:
+            session_kwargs = await self._proxy_session_kwargs(host, port, protocol)
+            if session_kwargs is None:
+                return None
+            data = await self._fetch_judge(session_kwargs)
+        except Exception as e:
+            logger.debug(f"Judge request via {protocol.upper()} {host}:{port} failed: {e}")
+            return None
+        if data is None:
+            return None
+        anonymity = classify_anonymity(data, real_ip)
+        logger.debug(f"{protocol.upper()} {host}:{port} - Anonymity: {anonymity}")
+        return anonymity
+
+    async def measure_bandwidth(
+        self,
+        host: str,
+        port: int,
+        protocol: str,
+        url: str,
+        max_bytes: int,
+        timeout: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Download up to max_bytes from url through the proxy and time it
+
+        A "{bytes}" placeholder in url is replaced with max_bytes, so the same
+        setting works for endpoints like /bytes/{bytes} or ?bytes={bytes}.
+
+        Args:
+            host: Proxy host
+            port: Proxy port
+            protocol: Proxy protocol ('socks4', 'socks5', or 'http')
+            url: Download URL
+            max_bytes: Bytes to read before stopping the transfer
+            timeout: Total time allowed (default: three times the validator timeout)
+
+        Returns:
+            Dict with "bandwidth_kbps" (sustained rate after the first byte),
+            "ttfb" (seconds until the first body byte) and "bytes" read, or
+            None if the download failed or was too small to time
+        """
+        import aiohttp
+
+        url = url.replace("{bytes}", str(max_bytes))
+        try:
+            session_kwargs = await self._proxy_session_kwargs(host, port, protocol)
+            if session_kwargs is None:
+                return None
+            proxy_url = session_kwargs.pop("proxy", None)
+
+            async with aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=timeout or self.timeout * 3),
+                auto_decompress=False,
+                **session_kwargs
+            ) as session:
+                started = time.monotonic()
+                async with session.get(
+                    url, proxy=proxy_url, headers={"Accept-Encoding": "identity"}
+                ) as response:
+                    if response.status != 200:
+                        logger.debug(
+                            f"Bandwidth test via {protocol.upper()} {host}:{port} -> {url}: {response.status}"
+                        )
+                        return None
+
+                    received = 0
+                    first_chunk = 0
+                    first_byte_at = None
+                    try:
+                        while received < max_bytes:
+                            chunk = await response.content.readany()
+                            if not chunk:
+                                break
+                            if first_byte_at is None:
+                                first_byte_at = time.monotonic()
+                                first_chunk = len(chunk)
+                            received += len(chunk)
+                    finally:
+                        if not response.content.at_eof():
+                            response.close()
+                    finished = time.monotonic()
+        except Exception as e:
+            logger.debug(f"Bandwidth test via {protocol.upper()} {host}:{port} failed: {e}")
+            return None
+
+        if first_byte_at is None:
+            return None
+        ttfb = first_byte_at - started
+        # Time to first byte is mostly connection setup, leave it out of the
+        # rate, together with the bytes that arrived in that first read
+        transferred = received - first_chunk
+        transfer_time = finished - first_byte_at
+        if (
+            transferred < MIN_BANDWIDTH_SAMPLE_BYTES
+            or transfer_time < MIN_BANDWIDTH_SAMPLE_TIME
+        ):
+            logger.debug(
+                f"Bandwidth test via {protocol.upper()} {host}:{port}: "
+                f"{transferred} bytes in {transfer_time:.4f}s is too small to measure"
+            )
+            return None
+        return {
+            "bandwidth_kbps": round(transferred / 1024 / transfer_time, 2),
+            "ttfb": round(ttfb, 4),
+            "bytes": received,
+        }
+
     def validate_socks4(
         self, host: str, port: int, target_host: str = "8.8.8.8", target_port: int = 80
     ) -> ValidationResult:
@@ -264,16 +588,13 @@ class SocksValidator:
             # Create socket and connect to SOCKS proxy
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(self.timeout)
-            sock.connect((host, port))
+            sock.connect((self.dns_cache.resolve_sync(host), port))
 
             # Prepare SOCKS4 request packet (following socker's approach)
             # Format: VER(1) + CMD(1) + DSTPORT(2) + DSTIP(4) + USERID(variable) + NULL(1)
             try:
-                # For SOCKS4, target must be an IP address, try to resolve if it's a hostname
-                if not target_host.replace(".", "").isdigit():
-                    target_ip = socket.gethostbyname(target_host)
-                else:
-                    target_ip = target_host
+                # For SOCKS4, target must be an IP address, resolve through the shared cache
+                target_ip = self.dns_cache.resolve_sync(target_host)
                 target_ip_bytes = socket.inet_aton(target_ip)
             except socket.error:
                 logger.debug(
@@ -360,7 +681,7 @@ class SocksValidator:
             # Create socket and connect to SOCKS proxy
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(self.timeout)
-            sock.connect((host, port))
+            sock.connect((self.dns_cache.resolve_sync(host), port))
 
             # Send SOCKS5 authentication request (following socker's approach)
             # Format: VER(1) + NMETHODS(1) + METHODS(variable)
@@ -434,9 +755,10 @@ class SocksValidator:
         sock = None
         try:
             # Create socket and connect (following socker's approach)
+            host_ip = self.dns_cache.resolve_sync(host)
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(self.timeout)
-            sock.connect((host, port_int))
+            sock.connect((host_ip, port_int))
 
             # Try SOCKS4 first (simpler handshake, like socker does)
             if self._test_socks4_on_socket(sock, host, port_int):
@@ -446,7 +768,7 @@ class SocksValidator:
             sock.close()
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(self.timeout)
-            sock.connect((host, port_int))
+            sock.connect((host_ip, port_int))
 
             # Try SOCKS5
             if self._test_socks5_on_socket(sock):
@@ -483,10 +805,7 @@ class SocksValidator:
         try:
             # Prepare target IP (SOCKS4 requires IP, not hostname)
             try:
-                if not target_host.replace(".", "").replace(":", "").isdigit():
-                    target_ip = socket.gethostbyname(target_host)
-                else:
-                    target_ip = target_host
+                target_ip = self.dns_cache.resolve_sync(target_host)
                 target_ip_bytes = socket.inet_aton(target_ip)
             except socket.error:
                 return False
@@ -534,62 +853,244 @@ class SocksValidator:
             return False
 
     def validate_http(
-        self, host: str, port: int, test_url: str = "http://httpbin.org/ip"
+        self, host: str, port: int, test_url: Optional[str] = None
     ) -> ValidationResult:
         """
         驗證 HTTP 代理伺服器
 
+        Blocking wrapper around async_probe_http_proxy for callers without a
+        running event loop (e.g. worker threads).
+
         Args:
             host: Proxy host
             port: Proxy port
-            test_url: URL to test with the proxy
+            test_url: Plain-HTTP URL to fetch through the proxy
 
         Returns:
             ValidationResult with validation status
         """
         try:
-            import urllib.error
-            import urllib.request
+            return asyncio.run(self.async_probe_http_proxy(host, port, test_url))
+        except Exception as e:
+            return ValidationResult(is_valid=False, error=str(e))
 
-            proxy_url = f"http://{host}:{port}"
-            proxy_handler = urllib.request.ProxyHandler(
-                {"http": proxy_url, "https": proxy_url}
-            )
-            opener = urllib.request.build_opener(proxy_handler)
+    async def _open_proxy_stream(
+        self, host: str, port: int
+    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        host_ip = await self.dns_cache.resolve(host)
+        return await asyncio.wait_for(
+            asyncio.open_connection(host_ip, port), timeout=self.timeout
+        )
 
-            request = urllib.request.Request(
-                test_url,
-                headers={
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                },
-            )
+    @staticmethod
+    async def _read_status_line(reader: asyncio.StreamReader) -> int:
+        """Read an HTTP status line and return the status code"""
+        line = await reader.readline()
+        parts = line.decode("latin-1").split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise ValueError(f"Not an HTTP response: {line[:64]!r}")
+        return int(parts[1])
+
+    async def async_probe_http(
+        self, host: str, port: int, test_url: Optional[str] = None
+    ) -> ValidationResult:
+        """
+        Plain-HTTP forwarding check over a raw stream
 
-            with opener.open(request, timeout=self.timeout) as response:
-                if response.getcode() == 200:
-                    return ValidationResult(is_valid=True, version=None)
-                else:
-                    return ValidationResult(
-                        is_valid=False, error=f"HTTP {response.getcode()}"
-                    )
+        Sends one absolute-form GET, reads the status line, skips the headers
+        and reads at most max_probe_bytes of body before closing.
+        """
+        test_url = test_url or self.http_test_url
+        parsed = urlsplit(test_url)
+        request = (
+            f"GET {test_url} HTTP/1.1\r\n"
+            f"Host: {parsed.netloc}\r\n"
+            f"User-Agent: {self.PROBE_USER_AGENT}\r\n"
+            "Accept: */*\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("ascii")
+
+        writer = None
+        try:
+            reader, writer = await self._open_proxy_stream(host, port)
 
-        except urllib.error.URLError as e:
+            async def exchange():
+                writer.write(request)
+                await writer.drain()
+                status = await self._read_status_line(reader)
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                if status == 200:
+                    await reader.read(self.max_probe_bytes)
+                return status
+
+            status = await asyncio.wait_for(exchange(), timeout=self.timeout)
+            if status == 200:
+                return ValidationResult(is_valid=True, version=None)
+            return ValidationResult(is_valid=False, error=f"HTTP {status}")
+        except asyncio.TimeoutError:
+            logger.debug(f"HTTP {host}:{port} - Connection timeout")
+            return ValidationResult(is_valid=False, error="Connection timeout")
+        except (OSError, ValueError) as e:
+            logger.debug(f"HTTP {host}:{port} - Probe failed: {e}")
             return ValidationResult(is_valid=False, error=str(e))
-        except Exception as e:
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def async_probe_connect(
+        self, host: str, port: int, target: Optional[str] = None
+    ) -> ValidationResult:
+        """
+        HTTPS tunnelling check: does the proxy accept CONNECT to target?
+
+        Only the proxy's reply to CONNECT is checked, no TLS handshake is made.
+        """
+        target = target or self.connect_target
+        request = (
+            f"CONNECT {target} HTTP/1.1\r\n"
+            f"Host: {target}\r\n"
+            f"User-Agent: {self.PROBE_USER_AGENT}\r\n\r\n"
+        ).encode("ascii")
+
+        writer = None
+        try:
+            reader, writer = await self._open_proxy_stream(host, port)
+
+            async def exchange():
+                writer.write(request)
+                await writer.drain()
+                return await self._read_status_line(reader)
+
+            status = await asyncio.wait_for(exchange(), timeout=self.timeout)
+            if 200 <= status < 300:
+                return ValidationResult(is_valid=True, version=None)
+            return ValidationResult(is_valid=False, error=f"CONNECT {status}")
+        except asyncio.TimeoutError:
+            logger.debug(f"HTTP {host}:{port} - CONNECT timeout")
+            return ValidationResult(is_valid=False, error="CONNECT timeout")
+        except (OSError, ValueError) as e:
+            logger.debug(f"HTTP {host}:{port} - CONNECT failed: {e}")
             return ValidationResult(is_valid=False, error=str(e))
+        finally:
+            if writer is not None:
+                writer.close()
 
-    async def async_validate_http(
-        self, host: str, port: int, test_url: str = "http://httpbin.org/ip"
+    async def async_probe_http_proxy(
+        self, host: str, port: int, test_url: Optional[str] = None
     ) -> ValidationResult:
-        """Async wrapper for HTTP proxy validation with server request check"""
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None, self.validate_http, host, port, test_url
+        """
+        Validate an HTTP proxy natively: plain-HTTP forwarding and CONNECT
+
+        Both probes run concurrently and are recorded separately in
+        result.capabilities. The proxy counts as valid when plain-HTTP
+        forwarding works, as before; CONNECT support is what HTTPS traffic
+        through the server needs.
+        """
+        http_result, connect_result = await asyncio.gather(
+            self.async_probe_http(host, port, test_url),
+            self.async_probe_connect(host, port),
         )
+        http_result.capabilities = {
+            "http": http_result.is_valid,
+            "connect": connect_result.is_valid,
+        }
+        if http_result.is_valid:
+            logger.debug(
+                f"HTTP {host}:{port} - Forwarding OK, CONNECT "
+                f"{'OK' if connect_result.is_valid else 'unsupported'}"
+            )
+        return http_result
+
+    async def async_tcp_connect(
+        self, host: str, port: int, timeout: Optional[float] = None
+    ) -> ValidationResult:
+        """
+        Cheap prefilter: only check that the proxy port accepts a TCP connection
+
+        Args:
+            host: Proxy host
+            port: Proxy port
+            timeout: Connect timeout (defaults to the validator timeout)
+
+        Returns:
+            ValidationResult, valid if the connection was accepted
+        """
+        try:
+            host_ip = await self.dns_cache.resolve(host)
+        except socket.error as e:
+            return ValidationResult(is_valid=False, error=f"Cannot resolve proxy host: {e}")
+
+        writer = None
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host_ip, port),
+                timeout=timeout if timeout is not None else self.timeout,
+            )
+            return ValidationResult(is_valid=True)
+        except asyncio.TimeoutError:
+            logger.debug(f"TCP {host}:{port} - Connect timeout")
+            return ValidationResult(is_valid=False, error="Connection timeout")
+        except (OSError, ValueError) as e:
+            logger.debug(f"TCP {host}:{port} - Connection refused: {e}")
+            return ValidationResult(is_valid=False, error=f"Connection refused: {e}")
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def async_handshake(
+        self, host: str, port: int, protocol: str = "socks5", executor=None
+    ) -> ValidationResult:
+        """
+        Protocol handshake stage only, without the HTTP request check
+
+        Args:
+            host: Proxy host
+            port: Proxy port
+            protocol: Proxy protocol ('socks4', 'socks5', or 'http')
+            executor: Thread pool for the blocking SOCKS handshakes
+                      (default: the event loop's default executor)
+
+        Returns:
+            ValidationResult of the handshake
+        """
+        try:
+            host_ip = await self.dns_cache.resolve(host)
+        except socket.error as e:
+            return ValidationResult(is_valid=False, error=f"Cannot resolve proxy host: {e}")
 
+        loop = asyncio.get_event_loop()
+        if protocol == "socks4":
+            # Resolve off the worker threads so lookups never block a pool slot
+            target_host, target_port = "8.8.8.8", 80
+            try:
+                target_ip = await self.dns_cache.resolve(target_host)
+            except socket.error:
+                logger.debug(f"SOCKS4 {host}:{port} - Cannot resolve target host: {target_host}")
+                return ValidationResult(is_valid=False, error="Cannot resolve target host")
+            return await loop.run_in_executor(
+                executor, self.validate_socks4, host_ip, port, target_ip, target_port
+            )
+        elif protocol == "socks5":
+            return await loop.run_in_executor(executor, self.validate_socks5, host_ip, port)
+        elif protocol in ["http", "https"]:
+            return await self.async_probe_http_proxy(host_ip, port)
+        else:
+            return ValidationResult(False, error=f"Unsupported protocol: {protocol}")
+
+    async def async_server_check(
+        self, result: ValidationResult, host: str, port: int, protocol: str = "socks5"
+    ) -> ValidationResult:
+        """
+        HTTP request check stage, run on a result that passed the handshake
+
+        Does nothing unless check_server_via_request and request_url, or
+        judge_url, are set.
+        """
         # 如果基本驗證成功且啟用了服務器請求檢查，進行額外的 HTTP 請求驗證
         if result.is_valid and self.check_server_via_request and self.request_url:
             try:
-                server_response = await self.check_server_via_proxy(host, port, "http")
+                server_response = await self.check_server_via_proxy(host, port, protocol)
                 if server_response:
                     result.ip_info = server_response
                 else:
@@ -597,69 +1098,81 @@ class SocksValidator:
                     result.is_valid = False
                     result.error = f"Server request to {self.request_url} failed"
             except Exception as e:
-                logger.debug(f"HTTP {host}:{port} - Server request failed: {e}")
+                logger.debug(f"{protocol.upper()} {host}:{port} - Server request failed: {e}")
                 # 如果啟用了服務器請求檢查但失敗了，則整個驗證失敗
                 result.is_valid = False
                 result.error = f"Server request error: {e}"
 
+        # Anonymity classification against our own judge
+        if result.is_valid and self.judge_url:
+            anonymity = await self.check_anonymity(host, port, protocol)
+            if anonymity is None:
+                result.is_valid = False
+                result.error = f"Judge request to {self.judge_url} failed"
+            else:
+                result.anonymity = anonymity
+
         return result
 
+    async def async_validate_http(
+        self, host: str, port: int, test_url: Optional[str] = None
+    ) -> ValidationResult:
+        """Async HTTP proxy validation with server request check"""
+        try:
+            host_ip = await self.dns_cache.resolve(host)
+        except socket.error as e:
+            return ValidationResult(is_valid=False, error=f"Cannot resolve proxy host: {e}")
+
+        result = await self.async_probe_http_proxy(host_ip, port, test_url)
+        return await self.async_server_check(result, host, port, "http")
+
     async def async_validate_socks4(
         self, host: str, port: int, target_host: str = "8.8.8.8", target_port: int = 80
     ) -> ValidationResult:
         """Async wrapper for SOCKS4 validation with server request check"""
+        # Resolve off the worker threads so lookups never block a pool slot
+        try:
+            host_ip = await self.dns_cache.resolve(host)
+        except socket.error as e:
+            return ValidationResult(is_valid=False, error=f"Cannot resolve proxy host: {e}")
+        try:
+            target_ip = await self.dns_cache.resolve(target_host)
+        except socket.error:
+            logger.debug(f"SOCKS4 {host}:{port} - Cannot resolve target host: {target_host}")
+            return ValidationResult(is_valid=False, error="Cannot resolve target host")
+
         loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
-            None, self.validate_socks4, host, port, target_host, target_port
+            None, self.validate_socks4, host_ip, port, target_ip, target_port
         )
-
-        # 如果基本驗證成功且啟用了服務器請求檢查，進行額外的 HTTP 請求驗證
-        if result.is_valid and self.check_server_via_request and self.request_url:
-            try:
-                server_response = await self.check_server_via_proxy(host, port, "socks4")
-                if server_response:
-                    result.ip_info = server_response
-                else:
-                    # 如果服務器請求失敗，則整個驗證失敗
-                    result.is_valid = False
-                    result.error = f"Server request to {self.request_url} failed"
-            except Exception as e:
-                logger.debug(f"SOCKS4 {host}:{port} - Server request failed: {e}")
-                result.is_valid = False
-                result.error = f"Server request error: {e}"
-
-        return result
+        return await self.async_server_check(result, host, port, "socks4")
 
     async def async_validate_socks5(self, host: str, port: int) -> ValidationResult:
         """Async wrapper for SOCKS5 validation with server request check"""
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, self.validate_socks5, host, port)
-
-        # 如果基本驗證成功且啟用了服務器請求檢查，進行額外的 HTTP 請求驗證
-        if result.is_valid and self.check_server_via_request and self.request_url:
-            try:
-                server_response = await self.check_server_via_proxy(host, port, "socks5")
-                if server_response:
-                    result.ip_info = server_response
-                else:
-                    # 如果服務器請求失敗，則整個驗證失敗
-                    result.is_valid = False
-                    result.error = f"Server request to {self.request_url} failed"
-            except Exception as e:
-                logger.debug(f"SOCKS5 {host}:{port} - Server request failed: {e}")
-                result.is_valid = False
-                result.error = f"Server request error: {e}"
-
-        return result
+        result = await self.async_handshake(host, port, "socks5")
+        return await self.async_server_check(result, host, port, "socks5")
 
     async def async_detect_socks_version(self, host: str, port: int) -> SocksVersion:
         """Async wrapper for SOCKS version detection"""
+        try:
+            host = await self.dns_cache.resolve(host)
+        except socket.error:
+            logger.debug(f"Cannot resolve proxy host: {host}")
+            return SocksVersion.UNKNOWN
+
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(None, self.detect_socks_version, host, port)
 
 
 class ProxyDownloader:
-    """Downloads proxy lists from TheSpeedX/PROXY-List project"""
+    """Downloads proxy lists from TheSpeedX/PROXY-List project and other sources
+
+    Every source of a proxy type is fetched concurrently. Lines are parsed as
+    they stream in and deduplicated across sources. With a cache_dir, each
+    source's last body is kept on disk together with its ETag and
+    Last-Modified, so an unchanged list is answered with 304 Not Modified and
+    read back from disk instead of being downloaded again.
+    """
 
     # Public proxy list URLs from TheSpeedX/PROXY-List
     PROXY_SOURCES = {
@@ -668,68 +1181,222 @@ class ProxyDownloader:
         "socks5": "https://raw.githubusercontent.com/TheSpeedX/SOCKS-List/master/socks5.txt",
     }
 
-    def __init__(self, timeout: float = 30.0):
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        sources: Optional[Dict[str, List[str]]] = None,
+        cache_dir: Optional[str] = None,
+    ):
+        """
+        Initialize proxy list downloader
+
+        Args:
+            timeout: Per-source download timeout in seconds
+            sources: Source URLs per proxy type; types not listed use
+                     PROXY_SOURCES
+            cache_dir: Directory for conditional-GET caching (default: off)
+        """
         self.timeout = timeout
+        self.sources = {ptype: [url] for ptype, url in self.PROXY_SOURCES.items()}
+        if sources:
+            self.sources.update({ptype: list(urls) for ptype, urls in sources.items()})
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Per-source outcome of the last download: "downloaded", "not_modified",
+        # "stale_cache" or "failed", with line and byte counts
+        self.last_results: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def parse_line(line: str) -> Optional[Tuple[str, int]]:
+        """Parse a "host:port" (optionally "scheme://host:port") list line"""
+        line = line.strip()
+        if not line or line.startswith("#"):
+            return None
+        if "://" in line:
+            line = line.split("://", 1)[1]
+        host, sep, port_str = line.partition(":")
+        if not sep or not host.strip():
+            return None
+        try:
+            port = int(port_str.split()[0].split(":")[0])
+        except (ValueError, IndexError):
+            return None
+        if not 0 < port < 65536:
+            return None
+        return host.strip(), port
+
+    def _cache_paths(self, url: str) -> Tuple[Path, Path]:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+        return self.cache_dir / f"{key}.txt", self.cache_dir / f"{key}.json"
+
+    def _load_cache_meta(self, url: str) -> Dict[str, Any]:
+        if self.cache_dir is None:
+            return {}
+        body_path, meta_path = self._cache_paths(url)
+        if not body_path.exists() or not meta_path.exists():
+            return {}
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return meta if meta.get("url") == url else {}
+
+    def _read_cached_lines(self, url: str, on_line) -> int:
+        body_path, _ = self._cache_paths(url)
+        count = 0
+        with open(body_path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                count += 1
+                if on_line(line):
+                    break
+        return count
+
+    async def _fetch_source(self, session, url: str, on_line) -> Dict[str, Any]:
+        """
+        Stream one source into on_line, using and refreshing the cache
+
+        on_line returns True once enough proxies were collected; the download
+        then stops early and the partial body is not cached.
+        """
+        meta = self._load_cache_meta(url)
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and meta:
+                    lines = self._read_cached_lines(url, on_line)
+                    return {"status": "not_modified", "lines": lines, "bytes": 0}
+                if response.status != 200:
+                    raise Exception(f"HTTP {response.status}")
+
+                tmp_file = None
+                if self.cache_dir is not None:
+                    body_path, meta_path = self._cache_paths(url)
+                    tmp_path = body_path.with_suffix(".tmp")
+                    tmp_file = open(tmp_path, "wb")
+                lines = 0
+                received = 0
+                complete = False
+                try:
+                    # StreamReader yields complete lines as data arrives
+                    async for raw_line in response.content:
+                        received += len(raw_line)
+                        if tmp_file is not None:
+                            tmp_file.write(raw_line)
+                        lines += 1
+                        if on_line(raw_line.decode("utf-8", errors="replace")):
+                            break
+                    else:
+                        complete = True
+                finally:
+                    if tmp_file is not None:
+                        tmp_file.close()
+                        # Stopped early, failed or cancelled partway
+                        if not complete:
+                            tmp_path.unlink(missing_ok=True)
+
+                if tmp_file is not None and complete:
+                    tmp_path.replace(body_path)
+                    with open(meta_path, "w", encoding="utf-8") as f:
+                        json.dump(
+                            {
+                                "url": url,
+                                "etag": response.headers.get("ETag"),
+                                "last_modified": response.headers.get("Last-Modified"),
+                                "fetched_at": time.time(),
+                            },
+                            f,
+                        )
+                return {"status": "downloaded", "lines": lines, "bytes": received}
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if meta:
+                logger.warning(f"Failed to download {url} ({e}), using cached copy")
+                lines = self._read_cached_lines(url, on_line)
+                return {"status": "stale_cache", "lines": lines, "bytes": 0, "error": str(e)}
+            logger.warning(f"Failed to download {url}: {e}")
+            return {"status": "failed", "lines": 0, "bytes": 0, "error": str(e)}
 
     async def download_proxy_list(
         self, proxy_type: str, limit: Optional[int] = None
     ) -> list:
         """
-        Download proxy list from public source
+        Download proxy list from every source of a proxy type
 
         Args:
             proxy_type: Type of proxy ('http', 'socks4', 'socks5')
             limit: Maximum number of proxies to return
 
         Returns:
-            List of proxy dictionaries with 'host', 'port', 'protocol' keys
+            List of proxy dictionaries with 'host', 'port', 'protocol' keys,
+            deduplicated across sources
         """
-        if proxy_type not in self.PROXY_SOURCES:
+        if proxy_type not in self.sources:
             raise ValueError(f"Unsupported proxy type: {proxy_type}")
 
-        url = self.PROXY_SOURCES[proxy_type]
+        urls = self.sources[proxy_type]
         proxies = []
+        seen = set()
+
+        def on_line(line: str) -> bool:
+            parsed = self.parse_line(line)
+            if parsed is not None and parsed not in seen:
+                seen.add(parsed)
+                proxies.append(
+                    {"host": parsed[0], "port": parsed[1], "protocol": proxy_type}
+                )
+            return bool(limit) and len(proxies) >= limit
 
-        try:
-            import aiohttp
-
-            async with aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=self.timeout)
-            ) as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        content = await response.text()
-                        lines = content.strip().split("\n")
-
-                        for line in lines:
-                            line = line.strip()
-                            if ":" in line and not line.startswith("#"):
-                                try:
-                                    host, port_str = line.split(":", 1)
-                                    port = int(port_str.strip())
-
-                                    proxy_config = {
-                                        "host": host.strip(),
-                                        "port": port,
-                                        "protocol": proxy_type,
-                                    }
-                                    proxies.append(proxy_config)
-
-                                    if limit and len(proxies) >= limit:
-                                        break
-
-                                except (ValueError, IndexError):
-                                    continue
-                    else:
-                        raise Exception(f"HTTP {response.status}")
+        import aiohttp
 
-        except Exception as e:
-            logger.error(f"Failed to download {proxy_type} proxy list: {e}")
-            raise
+        async with aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        ) as session:
+            results = await asyncio.gather(
+                *(self._fetch_source(session, url, on_line) for url in urls)
+            )
 
-        logger.info(f"Downloaded {len(proxies)} {proxy_type} proxies from {url}")
+        for url, result in zip(urls, results):
+            self.last_results[url] = result
+        if all(result["status"] == "failed" for result in results):
+            error = "; ".join(result["error"] for result in results)
+            logger.error(f"Failed to download {proxy_type} proxy list: {error}")
+            raise Exception(error)
+
+        if limit:
+            proxies = proxies[:limit]
+        logger.info(
+            f"Downloaded {len(proxies)} unique {proxy_type} proxies from {len(urls)} source(s)"
+        )
         return proxies
 
+    async def download_proxy_lists(
+        self, proxy_types: List[str], limit: Optional[int] = None
+    ) -> Dict[str, list]:
+        """
+        Download several proxy types concurrently
+
+        Returns:
+            Mapping of proxy type to its proxy list; types whose sources all
+            failed map to an empty list
+        """
+        results = await asyncio.gather(
+            *(self.download_proxy_list(ptype, limit) for ptype in proxy_types),
+            return_exceptions=True,
+        )
+        return {
+            ptype: [] if isinstance(result, Exception) else result
+            for ptype, result in zip(proxy_types, results)
+        }
+
 
 # Quick test function
 async def test_socks_validation():
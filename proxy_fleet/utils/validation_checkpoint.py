@@ -0,0 +1,144 @@
+"""
+On-disk checkpoints for long proxy validation runs.
+
+A checkpoint records how far a `--test-proxy-server` run got through its
+input: the offset below which every entry has been validated, the completed
+entries beyond that offset, and the entries that were still in flight when
+the checkpoint was written. `--resume` uses it to skip finished work.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+logger = logging.getLogger(__name__)
+
+
+class ValidationCheckpoint:
+    """Tracks and persists progress of a proxy validation run"""
+
+    FILENAME = "validation-checkpoint.json"
+
+    def __init__(
+        self,
+        storage_dir: str,
+        source: str,
+        proxies: List[Dict[str, Any]],
+        proxy_type: str,
+    ):
+        """
+        Initialize checkpoint for a validation run
+
+        Args:
+            storage_dir: Proxy storage directory the checkpoint is written to
+            source: Input source the proxies were read from (file path or "-")
+            proxies: Parsed proxy list, in input order
+            proxy_type: Proxy type being validated
+        """
+        self.path = Path(storage_dir) / self.FILENAME
+        self.source = source
+        self.proxy_type = proxy_type
+        self.total = len(proxies)
+        self.fingerprint = self._fingerprint(proxies, proxy_type)
+
+        self.offset = 0  # every index below offset is done
+        self.done: Set[int] = set()  # done indices at or above offset
+        self.pending: Set[int] = set()  # started but not finished
+        self.valid_count = 0
+        self.failed_count = 0
+        self.started_at = datetime.now().isoformat()
+
+    @staticmethod
+    def _fingerprint(proxies: List[Dict[str, Any]], proxy_type: str) -> str:
+        digest = hashlib.sha1(proxy_type.encode("utf-8"))
+        for proxy in proxies:
+            digest.update(f"{proxy['host']}:{proxy['port']}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    @property
+    def completed_count(self) -> int:
+        return self.offset + len(self.done)
+
+    def load(self) -> bool:
+        """
+        Load a previous checkpoint for the same input
+
+        Returns:
+            True if a matching checkpoint was restored
+        """
+        if not self.path.exists():
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Failed to load validation checkpoint: {e}")
+            return False
+
+        if data.get("fingerprint") != self.fingerprint:
+            logger.warning(
+                f"Validation checkpoint {self.path} belongs to a different input, ignoring it"
+            )
+            return False
+
+        self.offset = data.get("offset", 0)
+        self.done = set(data.get("done", []))
+        # In-flight entries were never finished, they are simply re-run
+        self.pending = set()
+        self.valid_count = data.get("valid_count", 0)
+        self.failed_count = data.get("failed_count", 0)
+        self.started_at = data.get("started_at", self.started_at)
+        return True
+
+    def is_done(self, index: int) -> bool:
+        return index < self.offset or index in self.done
+
+    def mark_started(self, index: int):
+        self.pending.add(index)
+
+    def mark_done(self, index: int, is_valid: bool):
+        self.pending.discard(index)
+        if self.is_done(index):
+            return
+        self.done.add(index)
+        if is_valid:
+            self.valid_count += 1
+        else:
+            self.failed_count += 1
+        # Advance the contiguous offset so the done set stays small
+        while self.offset in self.done:
+            self.done.remove(self.offset)
+            self.offset += 1
+
+    def save(self):
+        """Write checkpoint atomically"""
+        data = {
+            "source": self.source,
+            "proxy_type": self.proxy_type,
+            "fingerprint": self.fingerprint,
+            "total": self.total,
+            "offset": self.offset,
+            "done": sorted(self.done),
+            "pending": sorted(self.pending),
+            "valid_count": self.valid_count,
+            "failed_count": self.failed_count,
+            "started_at": self.started_at,
+            "updated_at": datetime.now().isoformat(),
+        }
+        temp_file = self.path.with_suffix(".tmp")
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            temp_file.replace(self.path)
+        except IOError as e:
+            logger.error(f"Failed to save validation checkpoint: {e}")
+            if temp_file.exists():
+                temp_file.unlink()
+
+    def clear(self):
+        """Remove checkpoint once the run has covered the whole input"""
+        if self.path.exists():
+            self.path.unlink()
@@ -0,0 +1,115 @@
+"""
+Progress and throughput tracking for proxy validation runs.
+
+`ValidationProgress` keeps the counters a validation run needs to report on
+itself (completed, in flight, valid), the handshake latencies seen so far and
+the timing needed for a rate and an ETA. `snapshot()` returns a plain dict
+that the CLI prints as one JSON line per `--progress-interval`.
+"""
+
+import time
+from array import array
+from typing import Any, Dict, Optional
+
+
+class ValidationProgress:
+    """Counters, handshake latency percentiles, rate and ETA for a validation run"""
+
+    def __init__(self, total: int):
+        """
+        Initialize progress tracker
+
+        Args:
+            total: Number of proxies this run will validate
+        """
+        self.total = total
+        self.completed = 0
+        self.in_flight = 0
+        self.valid = 0
+        self.failed = 0
+        self.cancelled = 0
+
+        # Handshake latencies in seconds; array keeps large runs compact
+        self._latencies = array("d")
+
+        self.started_at = time.monotonic()
+        self._last_snapshot_at = self.started_at
+        self._last_snapshot_completed = 0
+
+    def start(self):
+        """A proxy entered the validation pipeline"""
+        self.in_flight += 1
+
+    def finish(self, is_valid: Optional[bool]):
+        """
+        A proxy left the pipeline
+
+        Args:
+            is_valid: Validation outcome, None if the validation was cancelled
+        """
+        self.in_flight -= 1
+        if is_valid is None:
+            self.cancelled += 1
+            return
+        self.completed += 1
+        if is_valid:
+            self.valid += 1
+        else:
+            self.failed += 1
+
+    def cancel_queued(self):
+        """A proxy was cancelled before it entered the pipeline"""
+        self.cancelled += 1
+
+    def record_handshake(self, seconds: float):
+        """Record the latency of a successful protocol handshake"""
+        self._latencies.append(seconds)
+
+    def _percentile(self, ordered, pct: float) -> Optional[float]:
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get current progress as a JSON-serializable dict
+
+        The rate is averaged over the whole run, interval_rate covers the time
+        since the previous snapshot. ETA is based on the overall rate.
+        """
+        now = time.monotonic()
+        elapsed = now - self.started_at
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+
+        interval = now - self._last_snapshot_at
+        interval_rate = (
+            (self.completed - self._last_snapshot_completed) / interval
+            if interval > 0
+            else 0.0
+        )
+        self._last_snapshot_at = now
+        self._last_snapshot_completed = self.completed
+
+        remaining = max(self.total - self.completed - self.cancelled, 0)
+        eta = remaining / rate if rate > 0 else None
+
+        ordered = sorted(self._latencies)
+        p50 = self._percentile(ordered, 50)
+        p95 = self._percentile(ordered, 95)
+
+        return {
+            "timestamp": time.time(),
+            "elapsed": round(elapsed, 3),
+            "total": self.total,
+            "completed": self.completed,
+            "in_flight": self.in_flight,
+            "valid": self.valid,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "rate": round(rate, 2),
+            "interval_rate": round(interval_rate, 2),
+            "handshake_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "handshake_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+        }
@@ -102,6 +102,9 @@ setup(
             "prometheus-client>=0.14.0",
             "psutil>=5.9.0",
         ],
+        "geoip": [
+            "maxminddb>=2.0.0",
+        ],
         "all": [
             "pytest>=7.0.0",
             "pytest-asyncio>=0.21.0", 
@@ -112,6 +115,7 @@ setup(
             "pre-commit>=2.20.0",
             "prometheus-client>=0.14.0",
             "psutil>=5.9.0",
+            "maxminddb>=2.0.0",
         ],
     },
     entry_points={
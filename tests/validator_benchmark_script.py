@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmark for SocksValidator and --test-proxy-server.
+Starts a farm of local mock proxies (see proxy_fleet.utils.mock_proxy_farm),
+validates them and reports validations per second, peak RSS and fd usage.
+
+Examples:
+    python tests/validator_benchmark_script.py --count 2000 --protocol socks5
+    python tests/validator_benchmark_script.py --count 2000 --latency 0.2 \\
+        --refuse-ratio 0.5 --blackhole-ratio 0.1 --timeout 2
+    python tests/validator_benchmark_script.py --count 2000 --mode cli --concurrent 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+try:
+    from proxy_fleet.utils.mock_proxy_farm import MockProxyBehavior, MockProxyFarm
+    from proxy_fleet.utils.socks_validator import SocksValidator
+except ImportError as e:
+    print(f"❌ Import error: {e}")
+    print("Make sure proxy-fleet is installed: pip install -e .")
+    sys.exit(1)
+
+
+def count_open_fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return rss / (1024 * 1024)
+    return rss / 1024
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+class FarmThread:
+    """Runs the mock proxy farm on its own event loop thread"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.farm = self.call(self._create())
+
+    async def _create(self):
+        return MockProxyFarm()
+
+    def call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def close(self):
+        self.call(self.farm.stop())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class FdSampler:
+    """Samples the open fd count in the background and keeps the peak"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = count_open_fds()
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, count_open_fds())
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self.thread.join()
+
+
+def build_farm(args) -> FarmThread:
+    farm_thread = FarmThread()
+    rng = random.Random(args.seed)
+    counts = {"ok": 0, "refuse": 0, "blackhole": 0, "auth": 0}
+    for _ in range(args.count):
+        roll = rng.random()
+        behavior = MockProxyBehavior(protocol=args.protocol, latency=args.latency)
+        if roll < args.refuse_ratio:
+            behavior.refuse = True
+            counts["refuse"] += 1
+        elif roll < args.refuse_ratio + args.blackhole_ratio:
+            behavior.blackhole = True
+            counts["blackhole"] += 1
+        elif roll < args.refuse_ratio + args.blackhole_ratio + args.auth_ratio:
+            behavior.username, behavior.password = "user", "pass"
+            counts["auth"] += 1
+        else:
+            counts["ok"] += 1
+        farm_thread.call(farm_thread.farm.add(behavior))
+    print(
+        f"🏭 Mock farm: {args.count} {args.protocol} proxies "
+        f"({counts['ok']} ok, {counts['refuse']} refusing, "
+        f"{counts['blackhole']} black-holed, {counts['auth']} requiring auth)"
+    )
+    return farm_thread
+
+
+async def run_validator_benchmark(proxies, args):
+    validator = SocksValidator(timeout=args.timeout)
+    semaphore = asyncio.Semaphore(args.concurrent)
+    valid = 0
+
+    async def validate(proxy):
+        nonlocal valid
+        async with semaphore:
+            if args.protocol == "socks4":
+                result = await validator.async_validate_socks4(proxy["host"], proxy["port"])
+            elif args.protocol == "socks5":
+                result = await validator.async_validate_socks5(proxy["host"], proxy["port"])
+            else:
+                result = await validator.async_validate_http(proxy["host"], proxy["port"])
+            if result.is_valid:
+                valid += 1
+
+    await asyncio.gather(*(validate(proxy) for proxy in proxies))
+    return valid
+
+
+def run_cli_benchmark(proxies, args):
+    from proxy_fleet.cli.main import main as cli_main
+
+    with tempfile.TemporaryDirectory() as tmp:
+        proxy_file = Path(tmp) / "proxies.txt"
+        proxy_file.write_text(
+            "".join(f"{p['host']}:{p['port']}\n" for p in proxies), encoding="utf-8"
+        )
+        cli_args = [
+            "--test-proxy-server", str(proxy_file),
+            "--test-proxy-type", args.protocol,
+            # --test-proxy-timeout takes whole seconds
+            "--test-proxy-timeout", str(max(1, round(args.timeout))),
+            "--concurrent", str(args.concurrent),
+            "--proxy-storage", str(Path(tmp) / "storage"),
+        ]
+        if args.prefilter_timeout:
+            cli_args += ["--prefilter-timeout", str(args.prefilter_timeout)]
+        try:
+            cli_main.main(cli_args, standalone_mode=False)
+        except SystemExit:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--protocol", choices=["socks4", "socks5", "http"], default="socks5")
+    parser.add_argument("--latency", type=float, default=0.0, help="Reply delay per proxy (s)")
+    parser.add_argument("--refuse-ratio", type=float, default=0.0)
+    parser.add_argument("--blackhole-ratio", type=float, default=0.0)
+    parser.add_argument("--auth-ratio", type=float, default=0.0)
+    parser.add_argument("--concurrent", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=3.0)
+    parser.add_argument("--prefilter-timeout", type=float, default=None, help="cli mode only")
+    parser.add_argument("--mode", choices=["validator", "cli"], default="validator")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    fd_limit = raise_fd_limit()
+    print(f"🚀 Proxy Fleet - Validator Benchmark (fd limit {fd_limit})")
+    print("=" * 50)
+
+    farm_thread = build_farm(args)
+    proxies = list(farm_thread.farm.proxies)
+    fds_before = count_open_fds()
+    rss_before = peak_rss_mb()
+
+    try:
+        with FdSampler() as sampler:
+            started = time.perf_counter()
+            if args.mode == "validator":
+                valid = asyncio.run(run_validator_benchmark(proxies, args))
+            else:
+                run_cli_benchmark(proxies, args)
+                valid = None
+            elapsed = time.perf_counter() - started
+    finally:
+        farm_stats = farm_thread.farm.get_stats()
+        farm_thread.close()
+
+    print("\n📊 Benchmark results")
+    print(f"   Mode: {args.mode}, concurrency: {args.concurrent}")
+    print(f"   Validations: {len(proxies)} in {elapsed:.2f}s")
+    print(f"   Throughput: {len(proxies) / elapsed:.1f} validations/s")
+    if valid is not None:
+        print(f"   Valid: {valid}")
+    print(f"   Farm connections: {farm_stats['connections']}, handshakes: {farm_stats['handshakes']}")
+    print(f"   Peak RSS: {peak_rss_mb():.1f} MB (farm setup: {rss_before:.1f} MB)")
+    print(f"   Open fds: {fds_before} with farm listening, peak {sampler.peak} during run")
+    print("   Note: the farm runs in-process, its sockets count towards RSS and fds")
+
+
+if __name__ == "__main__":
+    main()